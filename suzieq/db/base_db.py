@@ -1,6 +1,6 @@
 import logging
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Hashable, List, Optional
 from dataclasses import dataclass
 
 import pandas as pd
@@ -77,6 +77,18 @@ class SqDB(SqPlugin, ABC):
         """
         raise NotImplementedError
 
+    # pylint: disable=unused-argument
+    def get_table_fingerprint(self, table_name: str) -> Optional[Hashable]:
+        """Return a value changing whenever the data of the table changes,
+        to know when the data derived from the table must be recomputed
+
+        :param table_name: str, Name of the table
+        :returns: the fingerprint of the data, None if the DB cannot tell
+                  when the data changes
+        :rtype: Optional[Hashable]
+        """
+        return None
+
 
 @dataclass
 class SqCoalesceStats:
@@ -0,0 +1,18 @@
+import logging
+
+from suzieq.db.live.livedb import SqLiveDB
+
+
+def get_sqdb(cfg: dict, logger: logging.Logger) -> SqLiveDB:
+    """Return the live db engine, reading the latest state from the poller
+
+    :param cfg: dict, Suzieq configuration dictionary
+    :param logger: logging.Logger, logger to hook into for logging, can be None
+    :returns: a live database engine to use for read/wr, other DB ops
+    :rtype: SqLiveDB
+
+    """
+    return SqLiveDB(cfg, logger)
+
+
+__all__ = ['get_sqdb']
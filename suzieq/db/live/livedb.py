@@ -0,0 +1,216 @@
+import http.client
+import logging
+import os
+import re
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from glob import glob
+from typing import List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from suzieq.db.base_db import SqDB
+from suzieq.db.parquet.parquetdb import SqParquetDB
+from suzieq.shared.schema import SchemaForTable
+
+# How long to wait for the state of a worker (in secs)
+STATE_TIMEOUT = 5
+# Header telling if every node of the worker was polled at least once
+COMPLETE_HEADER = 'X-Sq-Complete'
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    '''HTTP connection over a Unix socket'''
+
+    def __init__(self, path: str, timeout: float):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class SqLiveDB(SqDB):
+    '''Class reading the latest state directly from the poller workers, and
+    everything else, i.e. history, from the Parquet backend.
+
+    The workers serve the state they keep in memory on the Unix sockets in
+    poller.state-socket-dir. If any worker cannot serve it, for instance
+    because it has not polled all its nodes yet, the data is read from
+    Parquet.
+    '''
+
+    def __init__(self, cfg: dict, logger: logging.Logger) -> None:
+        '''Init the Live DB object'''
+        self.cfg = cfg
+        self.logger = logger or logging.getLogger()
+        self.socket_dir = cfg.get('poller', {}).get('state-socket-dir')
+        self._parquet = SqParquetDB(cfg, logger)
+
+    def supported_data_formats(self):
+        '''What formats are supported as return types by DB'''
+        return self._parquet.supported_data_formats()
+
+    def get_tables(self):
+        """Return list of tables known to the datastore
+        """
+        return self._parquet.get_tables()
+
+    def read(self, table_name: str, data_format: str,
+             **kwargs) -> pd.DataFrame:
+        """Read the latest state from the poller workers if possible,
+        otherwise from parquet. The arguments are the ones of
+        SqParquetDB.read()
+        """
+        if (data_format in self.supported_data_formats() and
+                kwargs.get('view') == 'latest' and
+                not kwargs.get('start_time') and
+                not kwargs.get('end_time') and
+                not kwargs.get('sqvers')):
+            table = self._get_latest(table_name)
+            if table is not None:
+                return self._read_table(table, **kwargs)
+
+        return self._parquet.read(table_name, data_format, **kwargs)
+
+    def write(self, table_name: str, data_format: str,
+              data, coalesced: bool, schema: pa.lib.Schema,
+              basename_template: str = None, **kwargs) -> int:
+        """Write the data in parquet"""
+        return self._parquet.write(table_name, data_format, data, coalesced,
+                                   schema, basename_template, **kwargs)
+
+    def coalesce(self, tables: List[str] = None, period: str = '',
+                 ign_sqpoller: bool = False) -> None:
+        """Coalesce the parquet data"""
+        return self._parquet.coalesce(tables, period, ign_sqpoller)
+
+    def migrate(self, table_name: str, schema: SchemaForTable) -> None:
+        """Migrate the parquet data"""
+        return self._parquet.migrate(table_name, schema)
+
+    def get_table_fingerprint(self, table_name: str) -> Optional[Tuple]:
+        """The latest state changes at every poll without notice, the
+        fingerprint of the parquet data is returned only if the poller
+        does not serve its state
+        """
+        if self.socket_dir:
+            return None
+        return self._parquet.get_table_fingerprint(table_name)
+
+    def _get_latest(self, table_name: str) -> Optional[pa.Table]:
+        """Get the latest state of the table from all the workers
+
+        :param table_name: str, the name of the table
+        :returns: the records of the table, None if not available
+        :rtype: Optional[pa.Table]
+        """
+        if not self.socket_dir:
+            return None
+        sockets = sorted(glob(os.path.join(self.socket_dir,
+                                           'worker_*.sock')))
+        if not sockets:
+            return None
+
+        try:
+            with ThreadPoolExecutor(len(sockets)) as pool:
+                tables = list(pool.map(
+                    partial(self._fetch_state, table_name), sockets))
+        except (OSError, http.client.HTTPException, pa.ArrowInvalid) as e:
+            self.logger.warning(
+                f'Unable to get the latest {table_name} from the poller: {e}')
+            return None
+
+        if any(t is None for t in tables):
+            return None
+        return pa.concat_tables(tables, promote=True)
+
+    def _fetch_state(self, table_name: str, path: str) -> Optional[pa.Table]:
+        '''Get the state of the table from the worker listening on path'''
+        conn = _UnixHTTPConnection(path, STATE_TIMEOUT)
+        try:
+            conn.request('GET', f'/state/{table_name}')
+            resp = conn.getresponse()
+            body = resp.read()
+            if resp.status == 404:
+                return None
+            if resp.status != 200:
+                raise http.client.HTTPException(
+                    f'{path} returned {resp.status}')
+            if resp.getheader(COMPLETE_HEADER) != '1':
+                self.logger.debug(f'{path} has not polled all its nodes yet')
+                return None
+        finally:
+            conn.close()
+
+        return pa.ipc.open_stream(body).read_all()
+
+    def _read_table(self, table: pa.Table, **kwargs) -> pd.DataFrame:
+        '''Filter the records of the table like SqParquetDB.read()'''
+        start = kwargs.pop("start_time")
+        end = kwargs.pop("end_time")
+        kwargs.pop("view")
+        fields = kwargs.pop("columns")
+        key_fields = kwargs.pop("key_fields")
+        query_str = kwargs.pop("add_filter", None) or "timestamp != 0"
+        merge_fields = kwargs.pop('merge_fields', {})
+        _ = kwargs.pop('hostname', [])  # This should never be passed
+        namespace = kwargs.pop('namespace', [])
+        kwargs.pop('sqvers', None)
+
+        if not all(x in fields for x in key_fields):
+            raise ValueError('Key fields MUST be included in columns list')
+
+        final_df = self._parquet.dataset_to_df(
+            ds.dataset(table), start, end, fields, merge_fields, query_str,
+            **kwargs)
+
+        if namespace and not final_df.empty:
+            final_df = final_df[self._match_namespace(final_df.namespace,
+                                                      namespace)]
+
+        if not final_df.empty:
+            final_df = final_df.sort_values(by=['timestamp']) \
+                .set_index(key_fields) \
+                .query('~index.duplicated(keep="last")')
+
+        if 'sqvers' in fields:
+            # Same as parquet, the version is returned as the first column
+            fields = ['sqvers'] + [x for x in fields if x != 'sqvers']
+            if not final_df.empty:
+                final_df['sqvers'] = final_df.sqvers.astype(float).max()
+
+        cols = set(final_df.columns.tolist() + final_df.index.names)
+        for fld in [x for x in fields if x not in cols]:
+            final_df[fld] = None
+        return final_df.reset_index()[fields]
+
+    @staticmethod
+    def _match_namespace(ns_col: pd.Series, namespaces: List[str]) \
+            -> pd.Series:
+        '''Return the mask of the namespaces matching the filters, with the
+        same rules of the parquet backend'''
+        match_filters = []
+        not_filters = []
+        for ns_match in namespaces:
+            if ns_match.startswith('!~'):
+                not_filters.append(ns_match[2:])
+            elif ns_match.startswith('~'):
+                match_filters.append(ns_match[1:])
+            elif ns_match.startswith('!'):
+                not_filters.append(re.escape(ns_match[1:]))
+            else:
+                match_filters.append(re.escape(ns_match))
+
+        mask = pd.Series(True, index=ns_col.index)
+        if match_filters:
+            mask = ns_col.str.fullmatch(
+                '|'.join(f'(?:{x})' for x in match_filters))
+        for ns_not in not_filters:
+            mask &= ~ns_col.str.match(ns_not)
+        return mask
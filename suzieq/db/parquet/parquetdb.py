@@ -1,7 +1,7 @@
 import os
 import re
 from time import time
-from typing import Any, Callable, List, Optional
+from typing import Any, Callable, List, Optional, Tuple
 import logging
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
@@ -436,6 +436,24 @@ class SqParquetDB(SqDB):
                     f'{self._get_table_directory(table_name, True)}/'
                     f'sqvers={sqvers}', ignore_errors=True)
 
+    def get_table_fingerprint(self, table_name: str) -> Optional[Tuple]:
+        """Return the modification time and the number of files of each
+        directory of the table, raw and coalesced. The files are only added
+        to and removed from the directories, never rewritten
+
+        :param table_name: str, Name of the table
+        :returns: the fingerprint of the data of the table
+        :rtype: Optional[Tuple]
+        """
+        fingerprint = []
+        for coalesced in [False, True]:
+            folder = self._get_table_directory(table_name, coalesced)
+            for root, _, files in os.walk(folder):
+                with suppress(FileNotFoundError):
+                    fingerprint.append(
+                        (root, os.stat(root).st_mtime_ns, len(files)))
+        return tuple(fingerprint)
+
     def _get_avail_sqvers(self, table_name: str, coalesced: bool) -> List[str]:
         """Get list of DB versions for a given table.
 
@@ -466,6 +484,20 @@ class SqParquetDB(SqDB):
                          **kwargs) -> pd.DataFrame:
         '''Process provided dataset and return a pandas DF'''
 
+        filtered_dataset = self._get_filtered_fileset(dataset, namespace)
+
+        if not filtered_dataset.files:
+            return pd.DataFrame()
+
+        return self.dataset_to_df(filtered_dataset, start, end, fields,
+                                  merge_fields, query_str, **kwargs)
+
+    def dataset_to_df(self, dataset: ds.Dataset, start: str, end: str,
+                      fields: List[str], merge_fields: List[str],
+                      query_str: str, **kwargs) -> pd.DataFrame:
+        '''Read the fields of the records of the dataset matching the
+        filters, in a pandas DF'''
+
         # Build the filters for predicate pushdown
         master_schema = dataset.schema
 
@@ -474,12 +506,7 @@ class SqParquetDB(SqDB):
             start, end, master_schema, merge_fields=merge_fields,
             **kwargs)
 
-        filtered_dataset = self._get_filtered_fileset(dataset, namespace)
-
-        if not filtered_dataset.files:
-            return pd.DataFrame()
-
-        tmp_df = filtered_dataset \
+        tmp_df = dataset \
             .to_table(filter=filters, columns=avail_fields) \
             .to_pandas(self_destruct=True) \
             .query(query_str)
@@ -2,7 +2,7 @@ import numpy as np
 import pandas as pd
 
 from suzieq.engines.pandas.engineobj import SqPandasEngine
-from suzieq.shared.utils import build_query_str, humanize_timestamp
+from suzieq.shared.utils import build_query_mask, humanize_timestamp
 
 
 class BgpObj(SqPandasEngine):
@@ -64,9 +64,6 @@ class BgpObj(SqPandasEngine):
 
         if afi_safi or 'afiSafi' in fields or (columns == ['*']):
             df['afiSafi'] = df['afi'] + ' ' + df['safi']
-        query_str = build_query_str([], sch, vrf=vrf, peer=peer,
-                                    hostname=hostname, afiSafi=afi_safi,
-                                    ignore_regex=False)
         if 'peer' in df.columns:
             df['peer'] = np.where(df['origPeer'] != "",
                                   df['origPeer'], df['peer'])
@@ -86,10 +83,10 @@ class BgpObj(SqPandasEngine):
 
         mdf = self._handle_user_query_str(mdf, user_query)
 
-        if query_str:
-            return mdf.query(query_str).reset_index(drop=True)[fields]
-        else:
-            return mdf.reset_index(drop=True)[fields]
+        mdf = mdf[build_query_mask(mdf, [], sch, vrf=vrf, peer=peer,
+                                   hostname=hostname, afiSafi=afi_safi,
+                                   ignore_regex=False)]
+        return mdf.reset_index(drop=True)[fields]
 
     def summarize(self, **kwargs) -> pd.DataFrame:
         """Summarize key information about BGP"""
@@ -1,13 +1,13 @@
 from typing import List
 import re
-from ipaddress import ip_address, ip_network
 
 import dateparser
 import numpy as np
 import pandas as pd
 from pandas.core.groupby import DataFrameGroupBy
 
-from suzieq.shared.utils import build_query_str, humanize_timestamp
+from suzieq.shared.utils import (addr_in_subnets, addrs_in_subnet,
+                                 build_query_mask, humanize_timestamp)
 from suzieq.shared.schema import Schema, SchemaForTable
 from suzieq.engines.base_engine import SqEngineObj
 from suzieq.sqobjects import get_sqobject
@@ -115,17 +115,7 @@ class SqPandasEngine(SqEngineObj):
         Returns:
             pd.Series: A collection of bool reporting the result
         """
-        network = ip_network(net)
-        if isinstance(addr.iloc[0], np.ndarray):
-            return addr.apply(lambda x, network:
-                              False if not x.any()
-                              else any(ip_address(a.split("/")[0]) in network
-                                       for a in x),
-                              args=(network,))
-        else:
-            return addr.apply(lambda a: (
-                False if not a else ip_address(a.split("/")[0]) in network)
-            )
+        return addrs_in_subnet(addr, net)
 
     def _in_subnet_series(self, addr: str, net: pd.Series) -> pd.Series:
         """Check if an addr is in any of series' subnets
@@ -142,18 +132,7 @@ class SqPandasEngine(SqEngineObj):
         Returns:
             pd.Series: A collection of bool reporting the result
         """
-        address = ip_address(addr)
-        if isinstance(net.iloc[0], np.ndarray):
-            return net.apply(lambda x, network:
-                             False if not x.any()
-                             else any(address in ip_network(a, strict=False)
-                                      for a in x if a != '0.0.0.0/0'),
-                             args=(address,))
-        else:
-            return net.apply(lambda a: (
-                False if not a or a == '0.0.0.0/0'
-                else address in ip_network(a, strict=False))
-            )
+        return addr_in_subnets(addr, net)
 
     def _check_ipvers(self,  addr: pd.Series, version: int) -> pd.Series:
         """Check if the IP version of addresses in a Pandas dataframe
@@ -316,12 +295,8 @@ class SqPandasEngine(SqEngineObj):
         if not hostname or df.empty:
             return df
 
-        hostname_filter = build_query_str(
-            [], self.schema, False, hostname=hostname)
-
-        res_df = df.query(hostname_filter)
-
-        return res_df
+        return df[build_query_mask(df, [], self.schema, False,
+                                   hostname=hostname)]
 
     def get(self, **kwargs) -> pd.DataFrame:
         """The default get method for all tables
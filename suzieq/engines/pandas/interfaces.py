@@ -10,7 +10,7 @@ from ciscoconfparse import CiscoConfParse
 from suzieq.engines.pandas.engineobj import SqPandasEngine
 from suzieq.shared.confutils import (get_access_port_interfaces,
                                      get_trunk_port_interfaces)
-from suzieq.shared.utils import build_query_str
+from suzieq.shared.utils import build_query_mask
 
 
 class InterfacesObj(SqPandasEngine):
@@ -105,10 +105,9 @@ class InterfacesObj(SqPandasEngine):
             df = self._add_vlanlist(df, **kwargs)
 
         if state or portmode or macaddr:
-            query_str = build_query_str([], self.schema, state=state,
-                                        portmode=portmode, macaddr=macaddr)
-
-            df = df.query(query_str).reset_index(drop=True)
+            df = df[build_query_mask(df, [], self.schema, state=state,
+                                     portmode=portmode, macaddr=macaddr)] \
+                .reset_index(drop=True)
 
         if vlan:
             df = self._check_vlan_match(vlan, df).reset_index(drop=True)
@@ -73,27 +73,28 @@ class PathObj(SqPandasEngine):
         self._mlag_peers = mlag_peers
         self._mlag_peerlink = mlag_peerlink
 
+        # Look up both addresses at once, access-internal is an internal
+        # Junos route we want to ignore
         try:
-            # access-internal is an internal Junos route we want to
-            # ignore
-            self._rdf = self._get_table_sqobj('routes') \
-                .lpm(namespace=namespace, address=dest) \
-                .query('protocol != "access-internal"') \
-                .reset_index(drop=True)
-            if self._rdf.empty:
-                raise EmptyDataframeError
-        except (KeyError, EmptyDataframeError):
+            lpm_df = self._get_table_sqobj('routes') \
+                .lpm(namespace=namespace, address=[dest, source])
+        except KeyError:
             raise EmptyDataframeError("No Routes information found for {}".
                                       format(dest))
+        if 'protocol' in lpm_df.columns:
+            lpm_df = lpm_df.query('protocol != "access-internal"')
 
-        try:
-            self._rpf_df = self._get_table_sqobj('routes') \
-                .lpm(namespace=namespace, address=source) \
-                .query('protocol != "access-internal"') \
-                .reset_index(drop=True)
-            if self._rpf_df.empty:
-                raise EmptyDataframeError
-        except (KeyError, EmptyDataframeError):
+        self._rdf = lpm_df.query('address == @dest') \
+            .drop(columns=['address']) \
+            .reset_index(drop=True)
+        if self._rdf.empty:
+            raise EmptyDataframeError("No Routes information found for {}".
+                                      format(dest))
+
+        self._rpf_df = lpm_df.query('address == @source') \
+            .drop(columns=['address']) \
+            .reset_index(drop=True)
+        if self._rpf_df.empty:
             raise EmptyDataframeError("No Routes information found for {}".
                                       format(source))
 
@@ -1,11 +1,20 @@
-from typing import List
-from ipaddress import ip_address, ip_network
-from collections import defaultdict
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
+from ipaddress import ip_address
 
 import numpy as np
 import pandas as pd
 
 from suzieq.engines.pandas.engineobj import SqPandasEngine
+from suzieq.shared.utils import PrefixIndex
+
+# How many routes, of the routing tables indexed for lpm, are kept
+LPM_CACHE_ROWS = 1000000
+
+# The routes indexed for lpm, by query and fingerprint of the data
+_lpm_indexes: OrderedDict = OrderedDict()
+_lpm_lock = threading.Lock()
 
 
 class RoutesObj(SqPandasEngine):
@@ -170,15 +179,20 @@ class RoutesObj(SqPandasEngine):
         return self.ns_df.convert_dtypes()
 
     def lpm(self, **kwargs):
-        '''Run longest prefix match on routing table for specified addr'''
+        '''Run longest prefix match on routing table for specified addr.
+        With a list of addresses, the matches of all of them are returned,
+        with the address matched in the address column'''
 
         addr = kwargs.pop('address')
         kwargs.pop('ipvers', None)
         df = kwargs.pop('cached_df', pd.DataFrame())
 
+        addrs = list(dict.fromkeys(addr)) if isinstance(addr, list) \
+            else [addr]
+        for ipaddr in addrs:
+            ip_address(ipaddr)  # raises ValueError if not valid
+
         addnl_fields = []
-        ipaddr = ip_address(addr)
-        ipvers = ipaddr._version
 
         # User may specify a different set of columns than what we're after
         usercols = kwargs.pop('columns', ['default'])
@@ -196,47 +210,65 @@ class RoutesObj(SqPandasEngine):
         addnl_fields = self._cons_addnl_fields(
             cols, addnl_fields, True)
         cols += addnl_fields
-        rslt = pd.DataFrame()
 
         # if not using a pre-populated dataframe
         if df.empty:
-            df = self.get(ipvers=ipvers, columns=cols, **kwargs)
+            df, index = self._get_lpm_index(cols, **kwargs)
         else:
-            df = df.query(f'ipvers=={ipvers}')
+            index = self._build_lpm_index(df)
 
         if df.empty:
-            return df
+            # Do not hand out the dataframe cached
+            return df.copy()
+
+        addr_pos, rows = index.lookup(addrs)
+        if not rows.size:
+            return pd.DataFrame()
+
+        rslt = df.iloc[rows].reset_index(drop=True)[usercols]
+        if isinstance(addr, list):
+            rslt.insert(0, 'address', np.array(addrs, dtype=object)[addr_pos])
+        return rslt
+
+    def _get_lpm_index(self, columns: List[str], **kwargs) \
+            -> Tuple[pd.DataFrame, PrefixIndex]:
+        '''Return the routes for the given filters and their index, reusing
+        the ones of a previous call until the data of the table changes'''
+        fingerprint = self._dbeng.get_table_fingerprint(self.table)
+        if fingerprint is None:
+            df = self.get(columns=columns, **kwargs)
+            return df, self._build_lpm_index(df)
+
+        key = (fingerprint, tuple(columns), self.iobj.view,
+               self.iobj.start_time, self.iobj.end_time,
+               self.cfg.get('analyzer', {}).get('timezone'),
+               tuple(sorted((k, tuple(v) if isinstance(v, list) else v)
+                            for k, v in kwargs.items())))
+        with _lpm_lock:
+            entry = _lpm_indexes.get(key)
+            if entry:
+                _lpm_indexes.move_to_end(key)
+                return entry
+
+        df = self.get(columns=columns, **kwargs)
+        entry = (df, self._build_lpm_index(df))
+        if len(df) > LPM_CACHE_ROWS:
+            # Too large to be kept
+            return entry
+        with _lpm_lock:
+            _lpm_indexes[key] = entry
+            rows = sum(len(x[0]) for x in _lpm_indexes.values())
+            while rows > LPM_CACHE_ROWS:
+                _, (old_df, _) = _lpm_indexes.popitem(last=False)
+                rows -= len(old_df)
+        return entry
 
-        # Vectorized operation for faster results with IPv4:
-        if ipvers == 4:
-            intaddr = df.prefix.str.split('/').str[0] \
-                .map(lambda y: int(''.join(['%02x' % int(x)
-                                            for x in y.split('.')]),
-                                   16))
-            netmask = df.prefixlen \
-                .map(lambda x: (0xffffffff << (32 - x)) & 0xffffffff)
-
-            match = (ipaddr._ip & netmask) == (intaddr & netmask)
-            rslt = df.loc[match.loc[match].index] \
-                .sort_values('prefixlen', ascending=False) \
-                .drop_duplicates(['namespace', 'hostname', 'vrf'])
-        else:
-            selected_entries = {}
-            max_plens = defaultdict(int)
-            for row in df.itertuples():
-                rtentry = ip_network(row.prefix)
-                if ipaddr in rtentry:
-                    key = f'{row.namespace}-{row.hostname}-{row.vrf}'
-                    if rtentry.prefixlen > max_plens[key]:
-                        max_plens[key] = rtentry.prefixlen
-                        selected_entries[key] = row
-            if selected_entries:
-                rslt = pd.DataFrame(list(selected_entries.values())) \
-                    .drop(columns=['Index'], errors='ignore')
-            else:
-                rslt = pd.DataFrame()
-
-        if rslt.empty:
-            return rslt
-
-        return rslt[usercols]
+    @staticmethod
+    def _build_lpm_index(df: pd.DataFrame) -> PrefixIndex:
+        '''Index the prefixes of each routing table, i.e. of each
+        namespace, hostname and vrf'''
+        if df.empty:
+            return PrefixIndex([])
+        tables = df.groupby(['namespace', 'hostname', 'vrf'], sort=False,
+                            dropna=False).ngroup().values
+        return PrefixIndex(df.prefix.values, tables)
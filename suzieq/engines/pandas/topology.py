@@ -6,7 +6,7 @@ import numpy as np
 import pandas as pd
 
 from suzieq.engines.pandas.engineobj import SqPandasEngine
-from suzieq.shared.utils import build_query_str
+from suzieq.shared.utils import build_query_mask
 
 # TODO:
 # topology for different VRFs?
@@ -203,13 +203,10 @@ class TopologyObj(SqPandasEngine):
         # Apply the appropriate filters
         if not self.lsdb.empty:
             self.lsdb = self.lsdb.fillna('')
-            query_str = build_query_str([], self.schema, ignore_regex=False,
-                                        hostname=hostname,
-                                        peerHostname=peerHostname,
-                                        ifname=ifname, asn=asn, area=area,
-                                        vrf=vrf)
-            if query_str:
-                self.lsdb = self.lsdb.query(query_str)
+            self.lsdb = self.lsdb[build_query_mask(
+                self.lsdb, [], self.schema, ignore_regex=False,
+                hostname=hostname, peerHostname=peerHostname, ifname=ifname,
+                asn=asn, area=area, vrf=vrf)]
 
         if user_query and not self.lsdb.empty:
             self.lsdb = self._handle_user_query_str(self.lsdb, user_query)
@@ -7,11 +7,23 @@ Classes:
                    in chunks
 
 """
+import heapq
+import logging
 from typing import Dict, List
 import numpy as np
+import pandas as pd
 from suzieq.poller.controller.chunker.base_chunker \
     import Chunker
 from suzieq.shared.exceptions import SqPollerConfError
+from suzieq.sqobjects import get_sqobject
+
+logger = logging.getLogger(__name__)
+
+# Default poll period of the services (in secs)
+DEFAULT_POLL_PERIOD = 60
+# With the cost policy, the devices are moved between the chunks only when
+# the load of two chunks differs by more than this fraction of the average
+COST_TOLERANCE = 0.2
 
 
 class StaticChunker(Chunker):
@@ -20,12 +32,14 @@ class StaticChunker(Chunker):
     The StaticChunker supports policies for splitting:
     - sequential (default): splits the global inventory as is in chunks
     - namespace: splits the global inventory without splitting namespaces
+    - cost: splits the global inventory so that every chunk has a similar
+      polling load, according to the history of the polls in sqPoller
     """
 
     def __init__(self, config_data: dict = None, validate: bool = True):
         super().__init__(config_data, validate)
 
-        self.policies_list = ['sequential', 'namespace']
+        self.policies_list = ['sequential', 'namespace', 'cost']
         self.policies_fn = {}
 
         for pol_name in self.policies_list:
@@ -42,6 +56,15 @@ class StaticChunker(Chunker):
         else:
             self.policy = self.policies_list[0]
 
+        config_data = config_data or {}
+        # The configuration file, to read the polling history
+        self._config_file = config_data.get('config')
+        # The cost of the devices without history, by devtype, relative to
+        # the average device
+        self._devtype_cost = config_data.get('devtype-cost', {})
+        # The chunk of each device in the last split by cost
+        self._cost_assignment: Dict[str, int] = {}
+
     @classmethod
     def get_data_model(cls):
         """This is only temporary. In future release I will add chunker
@@ -60,7 +83,7 @@ class StaticChunker(Chunker):
 
         inv_chunks = [c for c in chunk_fun(glob_inv, n_chunks) if c]
         if len(inv_chunks) < n_chunks:
-            if self.policy == 'sequential':
+            if self.policy in ['sequential', 'cost']:
                 raise SqPollerConfError(
                     'Not enough devices to split the inventory'
                     f'into {n_chunks} chunks'
@@ -159,3 +182,175 @@ class StaticChunker(Chunker):
             inventory_namespaces[namespace][dev_name] = device
 
         return get_chunked_inventory(inventory_namespaces, n_pollers)
+
+    def split_cost(self, glob_inv: dict, n_chunks: int) -> List[Dict]:
+        """Split the global inventory so that every chunk has a similar
+        expected polling load. Each device is weighted with its cost.
+
+        The devices keep the chunk they got in the previous split, so that
+        an inventory change moves the fewest devices across the workers.
+        The new devices are placed from the most expensive one, each in the
+        least loaded chunk, then the chunks still unbalanced hand over some
+        of their devices to the least loaded ones.
+
+        Args:
+            glob_inv (dict): global inventory to split
+            n_chunks (int): number of chunks to calculate
+
+        Returns:
+            List[Dict]: list of global_inventory chunks
+        """
+        costs = self._get_device_costs(glob_inv)
+
+        assignment = {dev_name: i
+                      for dev_name, i in self._cost_assignment.items()
+                      if dev_name in glob_inv and i < n_chunks}
+        chunk_loads = [0.0] * n_chunks
+        for dev_name, i in assignment.items():
+            chunk_loads[i] += costs[dev_name]
+
+        # Heap of (load, chunk index)
+        loads = [(load, i) for i, load in enumerate(chunk_loads)]
+        heapq.heapify(loads)
+        new_devices = [x for x in glob_inv if x not in assignment]
+        for dev_name in sorted(new_devices, key=lambda x: -costs[x]):
+            load, i = heapq.heappop(loads)
+            assignment[dev_name] = i
+            heapq.heappush(loads, (load + costs[dev_name], i))
+
+        self._rebalance(assignment, costs, n_chunks)
+        self._cost_assignment = assignment
+
+        # Keep the order of the global inventory inside the chunks
+        inv_chunks = [{} for _ in range(n_chunks)]
+        for dev_name, device in glob_inv.items():
+            inv_chunks[assignment[dev_name]][dev_name] = device
+        return inv_chunks
+
+    @staticmethod
+    def _rebalance(assignment: Dict[str, int], costs: Dict[str, float],
+                   n_chunks: int) -> None:
+        """Move the devices from the most loaded chunk to the least loaded
+        one, till their loads are within COST_TOLERANCE of the average.
+
+        Args:
+            assignment (Dict[str, int]): the chunk of each device, updated
+                with the moves
+            costs (Dict[str, float]): the cost of each device
+            n_chunks (int): the number of chunks
+        """
+        loads = [0.0] * n_chunks
+        members = [set() for _ in range(n_chunks)]
+        for dev_name, i in assignment.items():
+            loads[i] += costs[dev_name]
+            members[i].add(dev_name)
+        max_gap = COST_TOLERANCE * sum(loads) / n_chunks
+
+        # Every move lowers the sum of the squared loads, still bound the
+        # number of moves
+        for _ in range(len(assignment)):
+            src = max(range(n_chunks), key=loads.__getitem__)
+            dst = min(range(n_chunks), key=loads.__getitem__)
+            gap = loads[src] - loads[dst]
+            if gap <= max_gap:
+                break
+            # Only moving a device costing less than the gap narrows it,
+            # the closer to half of the gap the better
+            movable = [x for x in members[src] if costs[x] < gap]
+            if not movable:
+                break
+            dev_name = min(sorted(movable),
+                           key=lambda x: abs(gap / 2 - costs[x]))
+            members[src].remove(dev_name)
+            members[dst].add(dev_name)
+            loads[src] -= costs[dev_name]
+            loads[dst] += costs[dev_name]
+            assignment[dev_name] = dst
+
+    def _get_device_costs(self, glob_inv: dict) -> Dict[str, float]:
+        """Return the cost of polling each device of the inventory, relative
+        to the average device.
+
+        The devices without history get the average cost of the devices
+        with the same devtype, or the cost configured for their devtype in
+        devtype-cost, or the average cost.
+
+        Args:
+            glob_inv (dict): the global inventory
+
+        Returns:
+            Dict[str, float]: the cost of each device of the inventory
+        """
+        stats = self._get_poll_stats()
+        measured = {}
+        devtype_costs = {}
+        if not stats.empty:
+            measured = stats.set_index(['namespace', 'address'])['cost'] \
+                .to_dict()
+            devtype_costs = stats.groupby('devtype')['cost'].mean().to_dict()
+
+        costs = {}
+        for dev_name, device in glob_inv.items():
+            cost = measured.get((device.get('namespace'),
+                                 device.get('address')))
+            if cost is None:
+                devtype = device.get('devtype')
+                cost = devtype_costs.get(devtype,
+                                         self._devtype_cost.get(devtype, 1))
+            costs[dev_name] = cost
+
+        return costs
+
+    def _get_poll_stats(self) -> pd.DataFrame:
+        """Compute the cost of polling the devices from the latest sqPoller
+        records. The cost is the sum of the time spent polling and
+        processing, and of the data received, per second, each normalized
+        over the average device, so that CPU and I/O have the same weight.
+
+        Returns:
+            pd.DataFrame: the namespace, address, devtype and cost of each
+                device polled, empty if there is no history
+        """
+        try:
+            poll_df = get_sqobject('sqPoller')(
+                config_file=self._config_file).get(
+                    columns=['namespace', 'hostname', 'service',
+                             'totalTime', 'rxBytes', 'pollPeriod'])
+            dev_df = get_sqobject('device')(
+                config_file=self._config_file).get(
+                    columns=['namespace', 'hostname', 'address', 'devtype'])
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning(f'Unable to read the polling history: {e}')
+            return pd.DataFrame()
+
+        if (poll_df.empty or dev_df.empty or 'error' in poll_df.columns or
+                'error' in dev_df.columns):
+            logger.info('No polling history, splitting by devtype')
+            return pd.DataFrame()
+
+        def _avg(col: pd.Series) -> pd.Series:
+            # The stats are [min, max, avg]
+            return col.apply(
+                lambda x: x[-1] if x is not None and len(x) else 0) \
+                .astype(float)
+
+        period = poll_df.pollPeriod.where(poll_df.pollPeriod > 0,
+                                          DEFAULT_POLL_PERIOD)
+        poll_df['cpu'] = _avg(poll_df.totalTime) / 1000 / period
+        poll_df['io'] = _avg(poll_df.rxBytes) / period
+        stats = poll_df.groupby(['namespace', 'hostname'])[['cpu', 'io']] \
+            .sum().reset_index() \
+            .merge(dev_df, on=['namespace', 'hostname'])
+        if stats.empty:
+            return pd.DataFrame()
+
+        stats['cost'] = 0.0
+        for col in ['cpu', 'io']:
+            if stats[col].mean() > 0:
+                stats['cost'] += stats[col] / stats[col].mean()
+        # The average device costs 1
+        if stats.cost.mean() > 0:
+            stats['cost'] /= stats.cost.mean()
+        else:
+            stats['cost'] = 1.0
+        return stats[['namespace', 'address', 'devtype', 'cost']]
@@ -12,6 +12,7 @@ import argparse
 import asyncio
 import logging
 import signal
+import time
 from collections import defaultdict
 from pathlib import Path
 from typing import Dict, List
@@ -22,12 +23,21 @@ from suzieq.poller.controller.inventory_async_plugin import \
     InventoryAsyncPlugin
 from suzieq.poller.worker.services.service_manager import ServiceManager
 from suzieq.shared.exceptions import InventorySourceError, SqPollerConfError
+from suzieq.shared.metrics import REGISTRY, start_metrics_server
 from suzieq.shared.utils import sq_get_config_file
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_INVENTORY_PATH = 'suzieq/config/etc/inventory.yaml'
 
+INVENTORY_FETCH_TIME = REGISTRY.histogram(
+    'sq_poller_inventory_fetch_seconds',
+    'Time for a source to return its inventory', ['source'])
+INVENTORY_NODES = REGISTRY.gauge(
+    'sq_poller_inventory_nodes', 'Nodes in the inventory of each source',
+    ['source'])
+WORKERS = REGISTRY.gauge('sq_poller_workers', 'Workers polling the nodes')
+
 
 class Controller:
     """This class manages all the plugins set on the configuration files
@@ -109,7 +119,9 @@ class Controller:
 
         # Get the maximum number of commands per second
         max_cmd_pipeline = self._config.get('max-cmd-pipeline', 0)
-        if ((max_cmd_pipeline != 0) and
+        # With the autoscaling, the manager splits the pipeline across the
+        # maximum number of workers and checks the pipeline on its own
+        if ((max_cmd_pipeline != 0) and self._n_workers != 'auto' and
                 (max_cmd_pipeline % self._n_workers != 0)):
             raise SqPollerConfError(
                 f'max-cmd-pipeline ({max_cmd_pipeline}) has to be a '
@@ -147,6 +159,8 @@ class Controller:
 
         if not self._config['chunker'].get('type'):
             self._config['chunker']['type'] = 'static'
+        # The chunker might need to read the polling history
+        self._config['chunker']['config'] = sq_get_config_file(args.config)
 
     @property
     def single_run_mode(self) -> str:
@@ -256,6 +270,8 @@ class Controller:
             loop.add_signal_handler(
                 s, lambda s=s: asyncio.create_task(self._stop()))
 
+        start_metrics_server(self._config)
+
         # Start collecting the tasks to launch
         source_tasks = [s.run() for s in self.sources
                         if isinstance(s, InventoryAsyncPlugin)]
@@ -303,10 +319,26 @@ class Controller:
             await self.manager.launch_with_dir()
             return
 
+        # The versions of the inventories of the sources, the inventory and
+        # the number of workers last applied
+        applied_versions = None
+        applied_inventory = {}
+        applied_workers = 0
         while True:
             global_inventory = {}
 
+            versions = [src.inventory_version for src in self.sources]
+            if applied_versions == versions:
+                # No source changed its inventory, no need to split and
+                # apply it again, unless the number of workers changes
+                n_pollers = self.manager.get_n_workers(applied_inventory)
+                if n_pollers == applied_workers:
+                    logger.debug('Inventory not changed')
+                    await asyncio.sleep(self._period)
+                    continue
+
             for inv_src in self.sources:
+                start = time.perf_counter()
                 try:
                     cur_inv = deepcopy(await asyncio.wait_for(
                         inv_src.get_inventory(),
@@ -319,6 +351,9 @@ class Controller:
                     )
 
                 logger.debug(f'Received inventory from {inv_src.name}')
+                INVENTORY_FETCH_TIME.observe(time.perf_counter() - start,
+                                             source=inv_src.name)
+                INVENTORY_NODES.set(len(cur_inv or {}), source=inv_src.name)
                 if cur_inv:
                     cur_inv_count = len(cur_inv)
                     duplicated_devices = [x for x in cur_inv
@@ -339,10 +374,18 @@ class Controller:
                 raise InventorySourceError('No devices to poll')
 
             n_pollers = self.manager.get_n_workers(global_inventory)
+            WORKERS.set(n_pollers)
 
-            inventory_chunks = self.chunker.chunk(global_inventory, n_pollers)
+            # The chunker might read the polling history from the datastore,
+            # keep the event loop free meanwhile
+            inventory_chunks = await asyncio.get_running_loop() \
+                .run_in_executor(None, self.chunker.chunk, global_inventory,
+                                 n_pollers)
 
             await self.manager.apply(inventory_chunks)
+            applied_versions = versions
+            applied_inventory = global_inventory
+            applied_workers = n_pollers
 
             if self._single_run_mode:
                 break
@@ -368,7 +411,7 @@ class Controller:
                 'Invalid period: at least one second required'
             )
 
-        if self._n_workers < 0:
+        if self._n_workers != 'auto' and self._n_workers < 0:
             raise SqPollerConfError(
                 'At least a worker is required'
             )
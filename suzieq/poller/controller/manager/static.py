@@ -6,13 +6,17 @@
 """
 import asyncio
 import copy
+import hashlib
 import logging
+import math
 import os
 import shlex
+import signal
+import time
 from asyncio.subprocess import Process
 from collections import defaultdict
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import aiofiles
 import yaml
@@ -27,6 +31,14 @@ from suzieq.shared.utils import get_sq_install_dir
 
 logger = logging.getLogger(__name__)
 
+# How long to wait for a worker to apply an inventory update (in secs)
+INVENTORY_UPDATE_TIMEOUT = 60
+# The load reports of the workers older than this are ignored (in secs)
+LOAD_REPORT_MAX_AGE = 120
+# Below these values a worker is considered idle
+IDLE_MISS_RATE = 0.01
+IDLE_FIRE_LAG = 0.1  # secs
+
 
 class StaticManager(Manager, InventoryAsyncPlugin):
     """The StaticPollerManager writes the inventory chunks on files
@@ -41,12 +53,31 @@ class StaticManager(Manager, InventoryAsyncPlugin):
 
         self._workers_count = config_data.get("workers", 1)
 
+        # With workers set to auto, the number of workers is sized on the
+        # inventory and on the load of the workers
+        self._autoscale = self._workers_count == 'auto'
+        self._min_workers = config_data.get('min-workers', 1)
+        self._max_workers = config_data.get('max-workers') or \
+            os.cpu_count() or 1
+        self._devices_per_worker = config_data.get('devices-per-worker', 40)
+        if self._autoscale:
+            self._workers_count = 0
+
         # We need a pipeline thats at least as big as the number of workers
         # We need a pipeline that is at least as big as the number of workers
         self._max_cmd_pipeline = config_data.get('max-cmd-pipeline', 0)
 
         if self._max_cmd_pipeline:
-            worker_cmd = int(self._max_cmd_pipeline / self._workers_count)
+            # When autoscaling, the pipeline is split across the maximum
+            # number of workers, so that it is never exceeded
+            pipeline_workers = self._max_workers if self._autoscale \
+                else self._workers_count
+            if self._max_cmd_pipeline % pipeline_workers != 0:
+                raise SqPollerConfError(
+                    f'max-cmd-pipeline ({self._max_cmd_pipeline}) has to be '
+                    'a multiple of the maximum number of workers '
+                    f'({pipeline_workers})')
+            worker_cmd = self._max_cmd_pipeline // pipeline_workers
             os.environ['SQ_MAX_OUTSTANDING_CMD'] = str(worker_cmd)
 
         # Workers we are already monitoring
@@ -54,6 +85,8 @@ class StaticManager(Manager, InventoryAsyncPlugin):
 
         # Workers we do not monitor yet
         self._waiting_workers = defaultdict(None)
+        # Set when a worker is launched, to start monitoring it right away
+        self._workers_launched = asyncio.Event()
 
         # The currently applied chunks
         self._active_chunks = []
@@ -128,19 +161,39 @@ class StaticManager(Manager, InventoryAsyncPlugin):
         # the new inventory
         pollers_to_launch = []
         n_chunks = len(inventory_chunks)
-        if n_chunks != self._workers_count:
+        if self._autoscale:
+            inventory_chunks = self._match_chunks(inventory_chunks)
+        elif n_chunks != self._workers_count:
             raise PollingError(
                 'The number of chunks is different than the number of workers'
             )
 
         if not self._active_chunks:
             pollers_to_launch = [*range(n_chunks)]
+            self._workers_count = n_chunks
         else:
+            # The workers added by the autoscaling start with no devices,
+            # the ones in excess are retired
+            active_chunks = self._active_chunks + \
+                [{}] * (n_chunks - len(self._active_chunks))
+            retired = [*range(n_chunks, len(self._active_chunks))]
             for i, chunk in enumerate(inventory_chunks):
-                if chunk != self._active_chunks[i]:
+                if chunk != active_chunks[i]:
                     logger.info(f'Updating worker {i} chunk')
                     pollers_to_launch.append(i)
 
+            if ((pollers_to_launch or retired) and
+                    self._single_run_mode != 'debug'):
+                if n_chunks != self._workers_count:
+                    logger.info(f'Scaling from {self._workers_count} to '
+                                f'{n_chunks} workers')
+                # The running workers apply the changes without restarting
+                await self._update_chunks(inventory_chunks,
+                                          pollers_to_launch, retired)
+                self._active_chunks = copy.deepcopy(inventory_chunks)
+                self._workers_count = n_chunks
+                return
+
         # Create the inventory chunks and stop the pollers
         if pollers_to_launch:
             self._poller_tasks_ready.clear()
@@ -174,6 +227,188 @@ class StaticManager(Manager, InventoryAsyncPlugin):
                 self._print_poller_launch_instructions(n_chunks)
             self._poller_tasks_ready.set()
 
+    async def _update_chunks(self, inventory_chunks: List[Dict],
+                             changed: List[int], retired: List[int] = None):
+        """Update the inventory of the running workers, so that they only
+        start polling the added devices and stop polling the removed ones.
+
+        In order to prevent a device to be polled by two workers at the same
+        time, first the workers losing devices apply their removals, then
+        the workers gaining devices apply their additions.
+
+        Args:
+            inventory_chunks (List[Dict]): the new inventory chunks
+            changed (List[int]): the ids of the workers whose chunk changed
+            retired (List[int]): the ids of the workers to stop for good
+        """
+        self._poller_tasks_ready.clear()
+        removals = {}
+        for i in changed:
+            old = self._active_chunks[i] \
+                if i < len(self._active_chunks) else {}
+            new = inventory_chunks[i]
+            if any(k not in new or new[k] != v for k, v in old.items()):
+                # Only keep the devices left untouched
+                removals[i] = {k: v for k, v in new.items()
+                               if old.get(k) == v}
+
+        logger.info(f'Updating the inventory of the workers {changed}')
+        # Workers also gaining devices are not relaunched if they are not
+        # able to apply the removals, they are in the next step
+        await asyncio.gather(
+            *[self._push_chunk(i, c, launch=c == inventory_chunks[i])
+              for i, c in removals.items()],
+            *[self._retire_worker(i) for i in retired or []])
+        await asyncio.gather(*[self._push_chunk(i, inventory_chunks[i])
+                               for i in changed
+                               if removals.get(i) != inventory_chunks[i]])
+        self._poller_tasks_ready.set()
+
+    async def _push_chunk(self, poller_id: int, chunk: Dict,
+                          launch: bool = True):
+        """Write the chunk of a running worker and signal it to apply it,
+        waiting until the worker acknowledges it. If the worker is not able
+        to apply it, it is restarted.
+
+        Args:
+            poller_id (int): the id of the worker
+            chunk (Dict): the new inventory chunk of the worker
+            launch (bool): whether to launch the worker again if it had to
+                be stopped
+        """
+        applied_file = self._inventory_path / f'applied_{poller_id}'
+        process = self._get_worker_process(poller_id)
+
+        digest = await self._write_chunk(poller_id, chunk)
+        # The worker writes the applied file once it is ready
+        if process and process.returncode is None and applied_file.exists():
+            process.send_signal(signal.SIGHUP)
+            try:
+                await asyncio.wait_for(
+                    self._wait_applied(applied_file, digest),
+                    INVENTORY_UPDATE_TIMEOUT)
+                return
+            except asyncio.TimeoutError:
+                logger.warning(f'Worker {poller_id} did not apply the '
+                               'inventory update, restarting it')
+
+        await self._stop_poller(poller_id)
+        if launch:
+            await self._launch_poller(poller_id)
+
+    async def _retire_worker(self, poller_id: int):
+        """Stop a worker no longer needed, removing its files
+
+        Args:
+            poller_id (int): the id of the worker
+        """
+        logger.info(f'Retiring worker {poller_id}')
+        process = self._get_worker_process(poller_id)
+        self._running_workers.pop(poller_id, None)
+        self._waiting_workers.pop(poller_id, None)
+        if process:
+            await self._stop_process(process)
+        for name in [f'{self._inventory_file_name}_{poller_id}.yml',
+                     f'cred_{poller_id}', f'applied_{poller_id}',
+                     f'load_{poller_id}']:
+            self._inventory_path.joinpath(name).unlink(missing_ok=True)
+
+    def _match_chunks(self, inventory_chunks: List[Dict]) -> List[Dict]:
+        """Assign the chunks to the workers so that the fewest devices move
+        from a worker to another. The workers sharing the most devices with
+        a chunk are assigned first.
+
+        Args:
+            inventory_chunks (List[Dict]): the new inventory chunks
+
+        Returns:
+            List[Dict]: the chunks, in the order of the workers
+        """
+        if not self._active_chunks:
+            return inventory_chunks
+
+        n_chunks = len(inventory_chunks)
+        shared = sorted(
+            ((len(new.keys() & old.keys()), i, j)
+             for i, old in enumerate(self._active_chunks[:n_chunks])
+             for j, new in enumerate(inventory_chunks)),
+            key=lambda x: -x[0])
+        assigned = [None] * n_chunks
+        for n_shared, i, j in shared:
+            if not n_shared:
+                break
+            if assigned[i] is None and j not in assigned:
+                assigned[i] = j
+        free = iter([j for j in range(n_chunks) if j not in assigned])
+        return [inventory_chunks[j if j is not None else next(free)]
+                for j in assigned]
+
+    def _size_workers(self, n_devices: int) -> int:
+        """Compute the number of workers needed to poll the devices.
+
+        The number of workers is at least the one needed to have at most
+        devices-per-worker devices in each worker. A worker is added for
+        each worker falling behind, while a worker is removed when all of
+        them are idle. The result is between min-workers and max-workers,
+        by default the number of CPU cores.
+
+        Args:
+            n_devices (int): the number of devices in the inventory
+
+        Returns:
+            int: the number of workers
+        """
+        target = math.ceil(n_devices / self._devices_per_worker)
+        current = self._workers_count
+        if current:
+            loads = self._get_worker_loads()
+            saturated = sum(bool(x.get('falling-behind'))
+                            for x in loads.values())
+            if saturated:
+                logger.info(f'{saturated} workers falling behind')
+                target = max(target, current + saturated)
+            elif len(loads) == current and all(
+                    x.get('miss-rate', 0) < IDLE_MISS_RATE and
+                    x.get('fire-lag', 0) < IDLE_FIRE_LAG
+                    for x in loads.values()):
+                target = max(target, current - 1)
+            else:
+                target = max(target, current)
+
+        target = min(max(target, self._min_workers), self._max_workers)
+        return max(min(target, n_devices), 1)
+
+    def _get_worker_loads(self) -> Dict[int, Dict]:
+        """Read the latest load reported by the running workers
+
+        Returns:
+            Dict[int, Dict]: the load of each worker with a recent report
+        """
+        loads = {}
+        for i in range(self._workers_count):
+            load_file = self._inventory_path / f'load_{i}'
+            try:
+                if time.time() - load_file.stat().st_mtime > \
+                        LOAD_REPORT_MAX_AGE:
+                    continue
+                load = yaml.safe_load(load_file.read_text())
+            except (OSError, yaml.YAMLError):
+                continue
+            if isinstance(load, dict):
+                loads[i] = load
+        return loads
+
+    @staticmethod
+    async def _wait_applied(applied_file: Path, digest: str):
+        """Wait until the worker acknowledges the inventory with the given
+        digest
+        """
+        while True:
+            async with aiofiles.open(str(applied_file), 'r') as in_file:
+                if (await in_file.read()) == digest:
+                    return
+            await asyncio.sleep(0.5)
+
     async def launch_with_dir(self):
         """Launch a single poller writing the content of and input directory
         produced with the run-once=gather mode
@@ -184,19 +419,19 @@ class StaticManager(Manager, InventoryAsyncPlugin):
             await self._launch_poller(0)
         self._poller_tasks_ready.set()
 
-    def get_n_workers(self, _) -> int:
+    def get_n_workers(self, inventory: Dict) -> int:
         """returns the content of self._workers_count statically loaded from
-           the configuration file
-
-        Attention: This function doesn't use the inventory
+           the configuration file, or, with workers set to auto, the number
+           of workers sized on the inventory and on the load of the workers
 
         Args:
             inventory (dict, optional): The global inventory.
 
         Returns:
-            int: number of desired workers configured in the configuration
-                 file
+            int: number of desired workers
         """
+        if self._autoscale:
+            return self._size_workers(len(inventory))
         return self._workers_count
 
     async def _execute(self):
@@ -213,78 +448,118 @@ class StaticManager(Manager, InventoryAsyncPlugin):
             tasks.append(coalescer_task)
 
         # pylint: disable=too-many-nested-blocks
-        while self._waiting_workers or self._running_workers:
-            if self._waiting_workers:
-                # The list of tasks might contain some already terminated
-                # workers, remove them before proceeding
-                dead_workers = [w for k, w in poller_wait_tasks.items()
-                                if k in self._waiting_workers]
-                tasks = [t for t in tasks if t not in dead_workers]
-
-                self._running_workers.update(self._waiting_workers)
-                new_ptasks = {i: asyncio.create_task(
-                    monitor_process(p, f'WORKER {i}'))
-                    for i, p in self._waiting_workers.items()}
-                poller_wait_tasks.update(new_ptasks)
-                tasks += list(new_ptasks.values())
-                self._waiting_workers = {}
-            # Wait for the tasks
-            done, pending = await asyncio.wait(
-                tasks,
-                return_when=asyncio.FIRST_COMPLETED
-            )
-            await self._poller_tasks_ready.wait()
-
-            # Check if someone died and investigate why
-            for d in done:
-                if not self._no_coalescer and d == coalescer_task:
-                    # Coalescer died
-                    raise PollingError('Unexpected coalescer death')
-                # Search for the poller who died
-                poller_id = -1
-                for i, p in poller_wait_tasks.items():
-                    if p == d:
-                        poller_id = i
-                        break
-                if poller_id >= 0:
-                    if poller_id not in self._waiting_workers:
-                        # Probably unexpected poller died
-                        process = self._running_workers[poller_id]
-
-                        if self._single_run_mode and process.returncode == 0:
-                            # Worker natural death
-                            del self._running_workers[poller_id]
-                        else:
-                            try:
-                                d.result()
-                                err = None
-                            # pylint: disable=broad-except
-                            except Exception as e:
-                                err = str(e)
-
-                            if self._single_run_mode:
-                                logger.error(
-                                    f'Unexpected worker {poller_id} death: '
-                                    f'{err}')
+        launched_task = None
+        try:
+            while self._waiting_workers or self._running_workers:
+                if self._waiting_workers:
+                    tasks = self._monitor_waiting_workers(tasks,
+                                                          poller_wait_tasks)
+                # Wake up as soon as a new worker is launched, so that it is
+                # monitored without waiting for another task to end
+                self._workers_launched.clear()
+                if not launched_task or launched_task.done():
+                    launched_task = asyncio.create_task(
+                        self._workers_launched.wait())
+                    tasks.append(launched_task)
+                # Wait for the tasks
+                done, pending = await asyncio.wait(
+                    tasks,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                await self._poller_tasks_ready.wait()
+
+                # Check if someone died and investigate why
+                for d in done:
+                    if d == launched_task:
+                        continue
+                    if not self._no_coalescer and d == coalescer_task:
+                        # Coalescer died
+                        raise PollingError('Unexpected coalescer death')
+                    # Search for the poller who died
+                    poller_id = -1
+                    for i, p in poller_wait_tasks.items():
+                        if p == d:
+                            poller_id = i
+                            break
+                    if poller_id >= 0 and \
+                            poller_id not in self._waiting_workers and \
+                            poller_id not in self._running_workers:
+                        # Worker retired by the autoscaling
+                        del poller_wait_tasks[poller_id]
+                    elif poller_id >= 0:
+                        if poller_id not in self._waiting_workers:
+                            # Probably unexpected poller died
+                            process = self._running_workers[poller_id]
+
+                            if (self._single_run_mode
+                                    and process.returncode == 0):
+                                # Worker natural death
                                 del self._running_workers[poller_id]
                             else:
-                                # We want gray failures to be hard failures in
-                                # non-run-once mode
-                                raise PollingError(
-                                    f'Unexpected worker {poller_id} death:'
-                                    f'{err}')
-                else:
-                    # Someone else died
-                    raise PollingError('Unexpected task death')
-
-            tasks = list(pending)
-
-    async def _write_chunk(self, poller_id: int, chunk: Dict):
+                                try:
+                                    d.result()
+                                    err = None
+                                # pylint: disable=broad-except
+                                except Exception as e:
+                                    err = str(e)
+
+                                if self._single_run_mode:
+                                    logger.error(
+                                        f'Unexpected worker {poller_id} '
+                                        f'death: {err}')
+                                    del self._running_workers[poller_id]
+                                else:
+                                    # We want gray failures to be hard
+                                    # failures in non-run-once mode
+                                    raise PollingError(
+                                        f'Unexpected worker {poller_id} death:'
+                                        f'{err}')
+                    else:
+                        # Someone else died
+                        raise PollingError('Unexpected task death')
+
+                tasks = list(pending)
+        finally:
+            if launched_task:
+                launched_task.cancel()
+
+    def _monitor_waiting_workers(self, tasks: List[asyncio.Task],
+                                 poller_wait_tasks: Dict) \
+            -> List[asyncio.Task]:
+        """Start monitoring the waiting workers
+
+        Args:
+            tasks (List[asyncio.Task]): the tasks currently monitored
+            poller_wait_tasks (Dict): the monitoring task of each worker,
+                updated with the ones of the waiting workers
+
+        Returns:
+            List[asyncio.Task]: the new list of tasks to monitor
+        """
+        # The list of tasks might contain some already terminated
+        # workers, remove them before proceeding
+        dead_workers = [w for k, w in poller_wait_tasks.items()
+                        if k in self._waiting_workers]
+        tasks = [t for t in tasks if t not in dead_workers]
+
+        self._running_workers.update(self._waiting_workers)
+        new_ptasks = {i: asyncio.create_task(
+            monitor_process(p, f'WORKER {i}'))
+            for i, p in self._waiting_workers.items()}
+        poller_wait_tasks.update(new_ptasks)
+        self._waiting_workers = {}
+        return tasks + list(new_ptasks.values())
+
+    async def _write_chunk(self, poller_id: int, chunk: Dict) -> str:
         """Write the chunk into an output file
 
         Args:
             id (int): id of the inventory chunk
             chunk (Dict): chunk of the inventory containing the dictionary
+
+        Returns:
+            str: the digest of the inventory file, the workers acknowledge
+                the inventory they apply with it
         """
         confidential_data = ['password', 'passphrase',
                              'ssh_keyfile', 'jump_host_key_file',
@@ -305,9 +580,6 @@ class StaticManager(Manager, InventoryAsyncPlugin):
             raise PollingError(
                 f'Unable to generate inventory file for worker {poller_id}'
             )
-        async with aiofiles.open(out_name['inv'], "w") as out_file:
-            await out_file.write(inv_data)
-
         credential_dict = {
             i: {k: v[k] for k in v if k in confidential_data}
             for i, v in chunk.items()
@@ -320,8 +592,16 @@ class StaticManager(Manager, InventoryAsyncPlugin):
             )
         # Encrypt credential data
         enc_cred_data = self._encryptor.encrypt(cred_data.encode('utf-8'))
-        async with aiofiles.open(out_name['cred'], "w") as out_file:
-            await out_file.write(enc_cred_data.decode())
+        # Replace the files atomically, the workers might be reading them,
+        # the credentials first since they are read with the inventory
+        for name, data in [('cred', enc_cred_data.decode()),
+                           ('inv', inv_data)]:
+            async with aiofiles.open(f'{out_name[name]}.tmp', "w") \
+                    as out_file:
+                await out_file.write(data)
+            os.replace(f'{out_name[name]}.tmp', out_name[name])
+
+        return hashlib.sha256(inv_data.encode()).hexdigest()
 
     async def _launch_poller(self, poller_id: int):
         """Launch a poller with the provided id and chunk, if a poller with
@@ -332,6 +612,11 @@ class StaticManager(Manager, InventoryAsyncPlugin):
         """
         curr_args = [*self._args_to_pass, '--worker-id', str(poller_id)]
 
+        # The new worker acknowledges the inventory once ready
+        if not self._input_dir:
+            for name in [f'applied_{poller_id}', f'load_{poller_id}']:
+                self._inventory_path.joinpath(name).unlink(missing_ok=True)
+
         # Launch the process
         process = await asyncio.create_subprocess_exec(
             *curr_args,
@@ -341,6 +626,7 @@ class StaticManager(Manager, InventoryAsyncPlugin):
         if not process:
             raise PollingError('Unable to start the poller process')
         self._waiting_workers[poller_id] = process
+        self._workers_launched.set()
 
     def _print_poller_launch_instructions(self, n_chunks: int = 1):
         """Print the commands to execute in order to manually launch
@@ -382,8 +668,14 @@ class StaticManager(Manager, InventoryAsyncPlugin):
         Args:
             poller_id (int): the poller id
         """
-        current_poller = self._running_workers[poller_id]
-        await self._stop_process(current_poller)
+        current_poller = self._get_worker_process(poller_id)
+        if current_poller:
+            await self._stop_process(current_poller)
+
+    def _get_worker_process(self, poller_id: int) -> Optional[Process]:
+        """Return the process of the worker with the given id, if any"""
+        return (self._waiting_workers.get(poller_id) or
+                self._running_workers.get(poller_id))
 
     async def _stop_process(self, process: Process):
         """Stop a process
@@ -28,6 +28,9 @@ class SourceModel(InventoryPluginModel):
 class Source(ControllerPlugin):
     """Base class for plugins which reads inventories"""
 
+    # Incremented every time the inventory changes
+    _inventory_version = 0
+
     def __init__(self, input_data, validate: bool = True) -> None:
         super().__init__(input_data, validate)
 
@@ -56,6 +59,17 @@ class Source(ControllerPlugin):
 
         self._load(input_data)
 
+    @property
+    def inventory_version(self) -> int:
+        """The version of the inventory, incremented every time the
+        inventory changes. It allows to cheaply know if the inventory
+        changed since the last time it was read.
+
+        Returns:
+            int: the version of the inventory
+        """
+        return self._inventory_version
+
     @property
     def name(self) -> str:
         """Name of the source set in the inventory file
@@ -119,6 +133,8 @@ class Source(ControllerPlugin):
             raise InventorySourceError(
                 f'{self.name} missing informations: {missing_keys}')
 
+        if new_inventory != self._inventory or not self._inv_is_set:
+            self._inventory_version += 1
         self._inventory = new_inventory
 
         # If the inventory has been set for the first time, we need to
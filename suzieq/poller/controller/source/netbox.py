@@ -11,6 +11,9 @@ Classes:
 
 import asyncio
 import logging
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 from typing import Any, Dict, List, Optional, Tuple, Union
 from urllib.parse import urlparse
 
@@ -24,6 +27,9 @@ from suzieq.shared.utils import get_sensitive_data
 from suzieq.shared.exceptions import InventorySourceError, SensitiveLoadError
 
 _DEFAULT_PORTS = {'http': 80, 'https': 443}
+# How frequently all the devices are retrieved again, instead of only the
+# ones changed since the previous retrieval (in secs)
+FULL_SYNC_PERIOD = 24 * 3600
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +56,8 @@ class NetboxSourceModel(SourceModel):
     ssl_verify: Optional[bool] = Field(alias='ssl-verify')
     server: Union[str, NetboxServerModel] = Field(alias='url')
     run_once: Optional[bool] = Field(default=False, alias='run_once')
+    page_size: Optional[int] = Field(default=1000, alias='page-size')
+    max_requests: Optional[int] = Field(default=4, alias='max-requests')
 
     @validator('server', pre=True)
     def validate_and_set(cls, url, values):
@@ -119,6 +127,15 @@ class Netbox(Source, InventoryAsyncPlugin):
         self._status = 'init'
         self._session: aiohttp.ClientSession = None
         self._server: NetboxServerModel = None
+        # Bounds the number of requests in flight
+        self._requests_sem: asyncio.Semaphore = None
+        # The devices retrieved, by netbox id
+        self._devices: Dict[int, Dict] = {}
+        # The server time when the devices were last retrieved
+        self._last_sync: Optional[datetime] = None
+        self._last_full_sync = 0
+        # The earliest server time of the responses of the current sync
+        self._sync_time: Optional[datetime] = None
 
         super().__init__(config_data, validate)
 
@@ -194,6 +211,12 @@ class Netbox(Source, InventoryAsyncPlugin):
         Devices with more than one tag may appear duplicated. It's also
         necessary to drop duplicates.
 
+        After the first retrieval, only the devices changed since the
+        previous one are retrieved, together with the brief list of the ids
+        of the devices, to know which devices were removed. All the devices
+        are retrieved again every FULL_SYNC_PERIOD, since not all the
+        changes, like the change of an IP address, update the devices.
+
         Raises:
             RuntimeError: Unable to connect to the REST server
 
@@ -204,28 +227,142 @@ class Netbox(Source, InventoryAsyncPlugin):
         if not self._session:
             headers = self._token_auth_header()
             self._init_session(headers)
+        if not self._requests_sem:
+            self._requests_sem = asyncio.Semaphore(self._data.max_requests)
 
-        # devices is a dictionary to avoid duplicated devices. The key of the
-        # dictionary is the device netbox id.
-        devices = {}
+        self._sync_time = None
+        urls = self._get_url_list()
+        devices = None
         try:
-            for url in self._get_url_list():
-                logger.debug(f"Netbox: Retrieving url '{url}'")
-                url_devices, next_url = await self._get_devices(url)
-                while next_url:
-                    logger.debug(f"Netbox: Retrieving url '{next_url}'")
-                    cur_devices, next_url = await self._get_devices(next_url)
-                    url_devices.extend(cur_devices)
-                devices.update({device['id']: device for device in url_devices
-                                if device.get('id') is not None})
+            if (self._last_sync and
+                    time.time() - self._last_full_sync < FULL_SYNC_PERIOD):
+                devices = await self._get_changed_devices(urls)
+            if devices is None:
+                url_devices = await asyncio.gather(
+                    *[self._get_all_devices(url) for url in urls])
+                # devices is a dictionary to avoid duplicated devices. The key
+                # of the dictionary is the device netbox id.
+                devices = {device['id']: device
+                           for dev_list in url_devices for device in dev_list
+                           if device.get('id') is not None}
+                self._last_full_sync = time.time()
         except Exception as e:
             raise InventorySourceError(f'{self.name}: error while '
                                        f'getting devices: {e}')
 
+        self._devices = devices
+        # The server date has a resolution of a second
+        self._last_sync = self._sync_time - timedelta(seconds=1) \
+            if self._sync_time else None
+
         logger.info(
             f'Netbox: Retrieved inventory list of {len(devices)} devices')
         return list(devices.values())
 
+    async def _get_changed_devices(self, urls: List[str]) \
+            -> Optional[Dict[int, Dict]]:
+        """Retrieve the devices changed since the previous retrieval, and
+        the ids of all the devices, to rebuild the full list of devices
+
+        Args:
+            urls (List[str]): the urls of the devices, one per tag
+
+        Returns:
+            Optional[Dict[int, Dict]]: the devices by netbox id, None if the
+                previous retrieval does not have all the devices needed
+        """
+        since = self._last_sync.astimezone(timezone.utc) \
+            .strftime('%Y-%m-%dT%H:%M:%SZ')
+        url_ids, url_changed = await asyncio.gather(
+            asyncio.gather(*[self._get_all_devices(f'{url}&brief=1')
+                             for url in urls]),
+            asyncio.gather(*[
+                self._get_all_devices(f'{url}&last_updated__gte={since}')
+                for url in urls]))
+
+        known = {**self._devices,
+                 **{device['id']: device
+                    for dev_list in url_changed for device in dev_list
+                    if device.get('id') is not None}}
+        ids = {device['id'] for dev_list in url_ids for device in dev_list
+               if device.get('id') is not None}
+        if not ids.issubset(known):
+            logger.info(f'{self.name}: unknown devices, retrieving all of '
+                        'them')
+            return None
+
+        logger.debug(f'{self.name}: {sum(len(x) for x in url_changed)} '
+                     f'devices changed since {since}')
+        return {i: known[i] for i in ids}
+
+    async def _get_all_devices(self, url: str) -> List[Dict]:
+        """Retrieve all the devices of <url>. The first page tells how many
+        devices there are, then the remaining pages are retrieved
+        concurrently, with at most max-requests requests at a time.
+
+        Args:
+            url (str): devices url
+
+        Returns:
+            List[Dict]: the devices
+        """
+        page_url = f'{url}&limit={self._data.page_size}'
+        res = await self._get_page(f'{page_url}&offset=0')
+        devices = res.get('results', [])
+        count = res.get('count')
+        if count is None or not devices:
+            # Not able to compute the pages, follow the next urls
+            next_url = self._get_next_url(url, res.get('next'))
+            while next_url:
+                logger.debug(f"Netbox: Retrieving url '{next_url}'")
+                cur_devices, next_url = await self._get_devices(next_url)
+                devices.extend(cur_devices)
+            return devices
+
+        # The server might return less devices than requested
+        step = len(devices)
+        pages = await asyncio.gather(
+            *[self._get_page(f'{page_url}&offset={offset}')
+              for offset in range(step, count, step)])
+        for page in pages:
+            devices.extend(page.get('results', []))
+        return devices
+
+    async def _get_page(self, url: str) -> Dict:
+        """Retrieve a page of devices from netbox using an HTTP GET over <url>
+
+        Args:
+            url (str): devices url
+
+        Raises:
+            InventorySourceError: Response error
+
+        Returns:
+            Dict: the content of the response
+        """
+        async with self._requests_sem:
+            logger.debug(f"Netbox: Retrieving url '{url}'")
+            async with self._session.get(url) as response:
+                if int(response.status) != 200:
+                    raise InventorySourceError(
+                        f'{self.name}: error in inventory get '
+                        f'{await response.text()}')
+                self._update_sync_time(response.headers.get('Date'))
+                return await response.json()
+
+    def _update_sync_time(self, date: Optional[str]):
+        """Keep the earliest server time of the responses of the current
+        retrieval, next time the devices changed since then are retrieved
+        """
+        try:
+            server_time = parsedate_to_datetime(date) if date else None
+        except (TypeError, ValueError):
+            server_time = None
+        if not server_time:
+            server_time = datetime.now(timezone.utc)
+        if not self._sync_time or server_time < self._sync_time:
+            self._sync_time = server_time
+
     async def _get_devices(self, url: str) -> Tuple[List, str]:
         """Retrieve devices from netbox using an HTTP GET over <url>
 
@@ -239,67 +376,74 @@ class Netbox(Source, InventoryAsyncPlugin):
             Tuple[List, str]: returns the list of devices and the url to get
             the remaining devices
         """
-        async with self._session.get(url) as response:
-            if int(response.status) == 200:
-                res = await response.json()
-                next_url = res.get('next')
-                if next_url:
-                    # The next url might contain a different url if netbox is
-                    # behind a reverse proxy.
-                    # The code below sets the protocol, the host and the port
-                    # of the next request to the same parameters of the
-                    # previous request which was successful
-
-                    logger.debug(f'Parsing next page url {next_url}')
-
-                    # parse urls
-                    url_data = urlparse(url)
-                    next_url_data = urlparse(next_url)
-
-                    # retrieve protocol, host and port from the urls
-                    host = url_data.hostname
-                    protocol = url_data.scheme or 'http'
-                    port = url_data.port or _DEFAULT_PORTS.get(protocol)
-
-                    next_host = next_url_data.hostname
-                    next_protocol = next_url_data.scheme or 'http'
-                    next_port = (next_url_data.port or
-                                 _DEFAULT_PORTS.get(next_protocol))
-
-                    # verify if the two elements are different. If so, log
-                    # what's different and set the value to content of the
-                    # previous url
-                    if host != next_host:
-                        logger.debug(
-                            'Detected a different host in response: original '
-                            f'host "{host}", received host "{next_host}". '
-                            f'Setting the request host to "{host}"'
-                        )
-                        next_host = host
-                    if protocol != next_protocol:
-                        logger.debug(
-                            'Detected a different protocol in response: '
-                            f'original protocol "{protocol}", received '
-                            f'protocol "{next_protocol}". Setting the request '
-                            f'protocol to "{protocol}"'
-                        )
-                        next_protocol = protocol
-                    if port != next_port:
-                        logger.debug(
-                            'Detected a different port in response: original '
-                            f'port "{port}", received port "{next_port}". '
-                            f'Setting the request port to "{port}"'
-                        )
-                        next_port = port
-
-                    # build the next_url
-                    next_url = (f'{next_protocol}://{next_host}:{next_port}'
-                                f'{next_url_data.path}?{next_url_data.query}')
-                return res.get('results', []), next_url
-            else:
-                raise InventorySourceError(
-                    f'{self.name}: error in inventory get '
-                    f'{await response.text()}')
+        res = await self._get_page(url)
+        return res.get('results', []), self._get_next_url(url,
+                                                          res.get('next'))
+
+    @staticmethod
+    def _get_next_url(url: str, next_url: Optional[str]) -> Optional[str]:
+        """Return the url of the next page of devices
+
+        Args:
+            url (str): the url of the current page
+            next_url (Optional[str]): the next url returned by netbox
+
+        Returns:
+            Optional[str]: the url of the next page, None if it is the last
+        """
+        if next_url:
+            # The next url might contain a different url if netbox is
+            # behind a reverse proxy.
+            # The code below sets the protocol, the host and the port
+            # of the next request to the same parameters of the
+            # previous request which was successful
+
+            logger.debug(f'Parsing next page url {next_url}')
+
+            # parse urls
+            url_data = urlparse(url)
+            next_url_data = urlparse(next_url)
+
+            # retrieve protocol, host and port from the urls
+            host = url_data.hostname
+            protocol = url_data.scheme or 'http'
+            port = url_data.port or _DEFAULT_PORTS.get(protocol)
+
+            next_host = next_url_data.hostname
+            next_protocol = next_url_data.scheme or 'http'
+            next_port = (next_url_data.port or
+                         _DEFAULT_PORTS.get(next_protocol))
+
+            # verify if the two elements are different. If so, log
+            # what's different and set the value to content of the
+            # previous url
+            if host != next_host:
+                logger.debug(
+                    'Detected a different host in response: original '
+                    f'host "{host}", received host "{next_host}". '
+                    f'Setting the request host to "{host}"'
+                )
+                next_host = host
+            if protocol != next_protocol:
+                logger.debug(
+                    'Detected a different protocol in response: '
+                    f'original protocol "{protocol}", received '
+                    f'protocol "{next_protocol}". Setting the request '
+                    f'protocol to "{protocol}"'
+                )
+                next_protocol = protocol
+            if port != next_port:
+                logger.debug(
+                    'Detected a different port in response: original '
+                    f'port "{port}", received port "{next_port}". '
+                    f'Setting the request port to "{port}"'
+                )
+                next_port = port
+
+            # build the next_url
+            next_url = (f'{next_protocol}://{next_host}:{next_port}'
+                        f'{next_url_data.path}?{next_url_data.query}')
+        return next_url
 
     def parse_inventory(self, inventory_list: list) -> Dict:
         """parse the raw inventory collected from the server and generates
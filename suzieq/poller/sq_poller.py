@@ -173,8 +173,9 @@ def controller_main():
     parser.add_argument(
         '-w',
         '--workers',
-        type=int,
-        help='The number of workers polling the nodes',
+        type=lambda x: x if x == 'auto' else int(x),
+        help='The number of workers polling the nodes, auto to size them on '
+        'the inventory and on the load of the workers',
     )
 
     parser.add_argument(
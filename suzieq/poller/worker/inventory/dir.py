@@ -4,7 +4,7 @@ in charge of creating fake nodes returning
 the the data inside an input directory
 """
 
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 from suzieq.poller.worker.inventory.inventory import Inventory
 from suzieq.poller.worker.nodes.files import FileNode
@@ -37,5 +37,9 @@ class InputDirInventory(Inventory):
 
         return self._nodes
 
+    async def update_inventory(self) -> Tuple[Dict[str, Dict], List[str]]:
+        # The content of the input directory never changes
+        return {}, []
+
     async def _get_device_list(self) -> List[Dict]:
         return []
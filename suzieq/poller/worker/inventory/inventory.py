@@ -5,17 +5,101 @@ Suzieq poller inventory sources
 import abc
 import asyncio
 import logging
-from collections import defaultdict
+import time
+from collections import OrderedDict, defaultdict, deque
 from contextlib import asynccontextmanager
-from typing import Callable, Coroutine, Dict, List
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional, Tuple
 
 from suzieq.poller.worker.nodes.node import Node
+from suzieq.poller.worker.nodes.discovery_cache import DiscoveryCache
+from suzieq.poller.worker.nodes.rest_pool import RestPool
+from suzieq.poller.worker.nodes.tunnel_pool import TunnelPool
 from suzieq.shared.exceptions import SqPollerConfError
 from suzieq.shared.sq_plugin import SqPlugin
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class PacerStats:
+    '''Time spent by the commands waiting for the pacer'''
+    count: int = 0
+    total_wait: float = 0  # secs
+    max_wait: float = 0    # secs
+
+    @property
+    def avg_wait(self) -> float:
+        '''Average time (secs) a command waits for the pacer'''
+        return self.total_wait / self.count if self.count else 0
+
+
+class TokenBucket:
+    """Token bucket allowing on average `rate` commands per second, with
+    bursts of up to `burst` commands when the budget has not been used.
+
+    When there are no tokens left, the commands waiting are served one node
+    at a time in round robin, so that a node with many commands cannot
+    starve the others.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        # Commands waiting for a token, per node in round robin order
+        self._waiters: Dict[str, Deque[asyncio.Future]] = OrderedDict()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst,
+                           self._tokens + (now - self._last_refill)*self.rate)
+        self._last_refill = now
+
+    async def acquire(self, node_key: str = ''):
+        """Wait for a token to be available
+
+        Args:
+            node_key (str): the node issuing the command
+        """
+        self._refill()
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(node_key, deque()).append(fut)
+        if not self._dispatcher or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        try:
+            await fut
+        except asyncio.CancelledError:
+            queue = self._waiters.get(node_key)
+            if queue and fut in queue:
+                queue.remove(fut)
+                if not queue:
+                    del self._waiters[node_key]
+            raise
+
+    async def _dispatch(self):
+        while self._waiters:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                continue
+            node_key, queue = next(iter(self._waiters.items()))
+            fut = queue.popleft()
+            # Move the node at the end of the round
+            del self._waiters[node_key]
+            if queue:
+                self._waiters[node_key] = queue
+            if not fut.done():
+                self._tokens -= 1
+                fut.set_result(None)
+
+
 class CommandPacer:
     """In many networks, backend authentication servers such as TACACS which
     handle authentication of logins and even command execution, cannot
@@ -25,17 +109,25 @@ class CommandPacer:
     handle this, we add a user-specified maximum of rate of cmds/sec
     that the authentication can handle, and we pace it out. This code
     implements that pacer.
+
+    Each authentication server gets its own budget of commands, since we
+    do not know the real server behind a device, the commands are grouped
+    by jump host or by the credentials used for the login.
     """
-    def __init__(self, max_cmds: int):
+    def __init__(self, max_cmds: int, burst: int = 0):
+        """Instantiate the command pacer
+
+        Args:
+            max_cmds (int): the max number of commands per second for each
+                authentication server, 0 means no limit
+            burst (int): the max number of commands that can be issued at
+                once if the budget was not used, defaults to max_cmds
+        """
         self._max_cmds = max_cmds
-        if max_cmds > 0:
-            self._cmd_semaphore = asyncio.Semaphore(max_cmds)
-            self._cmd_mutex = asyncio.Lock()
-            self._cmd_pacer_sleep = float(1 / self.max_cmds)
-        else:
-            self._cmd_semaphore = None
-            self._cmd_mutex = None
-            self._cmd_pacer_sleep = 0
+        self._burst = burst or max_cmds
+        self._cmd_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._cmd_buckets: Dict[str, TokenBucket] = {}
+        self.wait_stats: Dict[str, PacerStats] = defaultdict(PacerStats)
 
     @property
     def max_cmds(self) -> int:
@@ -47,8 +139,27 @@ class CommandPacer:
         """
         return self._max_cmds
 
+    @property
+    def burst(self) -> int:
+        """Get the maximum number of commands the worker can issue at once
+
+        Returns:
+            int: the size of the burst
+        """
+        return self._burst
+
+    def _get_limiters(self, auth_key: str) \
+            -> Tuple[asyncio.Semaphore, TokenBucket]:
+        if auth_key not in self._cmd_buckets:
+            self._cmd_semaphores[auth_key] = asyncio.Semaphore(
+                self._max_cmds)
+            self._cmd_buckets[auth_key] = TokenBucket(self._max_cmds,
+                                                      self._burst)
+        return self._cmd_semaphores[auth_key], self._cmd_buckets[auth_key]
+
     @asynccontextmanager
-    async def wait(self, use_pacer: bool = True):
+    async def wait(self, use_pacer: bool = True, auth_key: str = '',
+                   node_key: str = ''):
         """Context Manager to implement throttling of commands.
 
         Some networks communicate with a backend authentication server only
@@ -60,11 +171,19 @@ class CommandPacer:
 
         Args:
             use_pacer(bool): True if you want to use the pacer
+            auth_key(str): the authentication server the command goes to
+            node_key(str): the node issuing the command
         """
         if use_pacer and self._max_cmds:
-            async with self._cmd_semaphore:
-                async with self._cmd_mutex:
-                    await asyncio.sleep(self._cmd_pacer_sleep)
+            semaphore, bucket = self._get_limiters(auth_key)
+            start = time.monotonic()
+            await bucket.acquire(node_key)
+            async with semaphore:
+                waited = time.monotonic() - start
+                stats = self.wait_stats[auth_key]
+                stats.count += 1
+                stats.total_wait += waited
+                stats.max_wait = max(stats.max_wait, waited)
                 yield
         else:
             yield
@@ -85,12 +204,24 @@ class Inventory(SqPlugin):
         """
         self._nodes = {}
         self._node_tasks = {}
+        self._nodes_scheduled = False
+        # The parameters of the devices in the inventory and the key of
+        # their node, by device key
+        self._devices: Dict[str, Dict] = {}
+        self._device_nodes: Dict[str, str] = {}
         self.add_task_fn = add_task_fn
         self._max_outstanding_cmd = 0
         self._cmd_pacer = None
+        self._tunnel_pool = None
+        self._rest_pool = None
+        self._discovery_cache = None
 
         self.connect_timeout = kwargs.pop('connect_timeout', 15)
         self.ssh_config_file = kwargs.pop('ssh_config_file', None)
+        self.jump_host_channels = kwargs.pop('jump_host_channels', 10)
+        self.rest_conn_per_host = kwargs.pop('rest_conn_per_host', 4)
+        self.rest_keepalive = kwargs.pop('rest_keepalive', 60)
+        self.discovery_cache_file = kwargs.pop('discovery_cache_file', None)
 
     @property
     def nodes(self) -> Dict[str, Node]:
@@ -103,12 +234,12 @@ class Inventory(SqPlugin):
         return self._nodes
 
     @property
-    def running_nodes(self) -> List[Coroutine]:
-        """Get the the couroutines of the running nodes
+    def running_nodes(self) -> Dict[str, asyncio.Task]:
+        """Get the the tasks of the running nodes
 
         Returns:
-            List[Coroutine]: a list containing the coroutines of the running
-                nodes
+            Dict[str, asyncio.Task]: a dictionary containing the tasks of the
+                running nodes, by node key
         """
         return self._node_tasks
 
@@ -129,6 +260,11 @@ class Inventory(SqPlugin):
             raise SqPollerConfError('The inventory source returned no hosts')
 
         self._cmd_pacer = CommandPacer(self._max_outstanding_cmd)
+        self._tunnel_pool = TunnelPool(self.jump_host_channels)
+        self._rest_pool = RestPool(self.rest_conn_per_host,
+                                   self.rest_keepalive)
+        if self.discovery_cache_file:
+            self._discovery_cache = DiscoveryCache(self.discovery_cache_file)
 
         # Initialize the nodes in the inventory
         self._nodes = await self._init_nodes(inventory_list)
@@ -158,11 +294,80 @@ class Inventory(SqPlugin):
         This function should be called only once, if called more
         than once, it won't have any effect.
         """
-        if not self._node_tasks:
-            self._node_tasks = {node: self._nodes[node].run()
-                                for node in self._nodes}
+        if not self._nodes_scheduled:
+            self._nodes_scheduled = True
+            self._node_tasks = {node: asyncio.ensure_future(
+                self._nodes[node].run()) for node in self._nodes}
             await self.add_task_fn(list(self._node_tasks.values()))
 
+    async def update_inventory(self) -> Tuple[Dict[str, Dict], List[str]]:
+        """Retrieve again the list of nodes to poll, adding the new nodes and
+        removing the ones no longer in the list. The nodes whose parameters
+        changed are replaced, all the others are left untouched.
+
+        Raises:
+            InventorySourceError: in case of error with the inventory source
+
+        Returns:
+            Tuple[Dict[str, Dict], List[str]]: the command queues of the nodes
+                added, as returned by get_node_callq(), and the keys of the
+                nodes removed
+        """
+        inventory_list = await self._get_device_list()
+        new_devices = {self._get_device_key(x): x for x in inventory_list}
+
+        to_remove = [k for k, v in self._devices.items()
+                     if new_devices.get(k) != v]
+        to_add = [v for k, v in new_devices.items()
+                  if self._devices.get(k) != v]
+
+        removed = []
+        for dev_key in to_remove:
+            del self._devices[dev_key]
+            node_key = self._device_nodes.pop(dev_key, None)
+            node = self._nodes.pop(node_key, None)
+            if not node:
+                continue
+            task = self._node_tasks.pop(node_key, None)
+            if task:
+                # The node closes its connection when cancelled
+                task.cancel()
+            else:
+                await node._close_connection()
+            removed.append(node_key)
+            logger.info(f'Removed node {node_key}')
+
+        new_nodes = await self._init_nodes(to_add)
+        self._nodes.update(new_nodes)
+        if self._nodes_scheduled:
+            new_tasks = {k: asyncio.ensure_future(n.run())
+                         for k, n in new_nodes.items()}
+            self._node_tasks.update(new_tasks)
+            await self.add_task_fn(list(new_tasks.values()))
+
+        callq = self.get_node_callq()
+        return {k: callq[k] for k in new_nodes}, removed
+
+    async def close(self) -> None:
+        """Release the resources shared by the nodes, such as the pool of the
+        HTTP connections, once the inventory is no longer polled.
+        """
+        if self._rest_pool:
+            await self._rest_pool.close()
+
+    async def ack_inventory(self) -> None:
+        """Tell the source which inventory the worker is polling, if the
+        source needs it. By default nothing to do.
+        """
+
+    async def report_load(self, load: Dict) -> None:
+        """Tell the source the load of the worker, if the source needs it.
+        By default nothing to do.
+
+        Args:
+            load (Dict): the load of the worker
+        """
+
     async def _init_nodes(self, inventory_list:
                           List[Dict]) -> Dict[str, Node]:
         """Initialize the Node objects given the of credentials of the nodes.
@@ -176,17 +381,11 @@ class Inventory(SqPlugin):
         nodes_list = {}
 
         for host in inventory_list:
-            new_node = Node()
-            init_tasks += [new_node.initialize(
-                **host,
-                cmd_pacer=self._cmd_pacer,
-                connect_timeout=self.connect_timeout,
-                ssh_config_file=self.ssh_config_file
-            )]
+            init_tasks += [self._init_node(host)]
 
         for n in asyncio.as_completed(init_tasks):
             try:
-                newnode = await n
+                dev_key, host, newnode = await n
             except Exception as e:  # pylint: disable=broad-except
                 logger.error(
                     f'Encountered error {str(e)} in initializing node')
@@ -202,10 +401,46 @@ class Inventory(SqPlugin):
             else:
                 logger.info(f'Added node {newnode.hostname}:{newnode.port} '
                             f'of type {newnode.devtype}')
-            nodes_list.update({self.get_node_key(newnode): newnode})
+            node_key = self.get_node_key(newnode)
+            nodes_list.update({node_key: newnode})
+            self._devices[dev_key] = host
+            self._device_nodes[dev_key] = node_key
 
         return nodes_list
 
+    async def _init_node(self, host: Dict) -> Tuple[str, Dict, Node]:
+        """Initialize the node of a device of the inventory
+
+        Returns:
+            Tuple[str, Dict, Node]: the key and the parameters of the device,
+                and its node
+        """
+        new_node = Node()
+        await new_node.initialize(
+            **host,
+            cmd_pacer=self._cmd_pacer,
+            tunnel_pool=self._tunnel_pool,
+            rest_pool=self._rest_pool,
+            discovery_cache=self._discovery_cache,
+            connect_timeout=self.connect_timeout,
+            ssh_config_file=self.ssh_config_file
+        )
+        return self._get_device_key(host), host, new_node
+
+    @staticmethod
+    def _get_device_key(host: Dict) -> str:
+        """Return the key identifying a device of the inventory, the same
+        used by the controller
+
+        Args:
+            host (Dict): the parameters of the device
+
+        Returns:
+            str: the key of the device
+        """
+        return f"{host.get('namespace')}.{host.get('address')}." \
+            f"{host.get('port')}"
+
     @ abc.abstractmethod
     async def _get_device_list(self) -> List[Dict]:
         """Retrieve the devices credentials from the inventory
@@ -1,8 +1,9 @@
 import binascii
+import hashlib
 import logging
 import os
 from pathlib import Path
-from typing import Callable, Dict, List
+from typing import Callable, Dict, List, Tuple
 
 import aiofiles
 import yaml
@@ -42,6 +43,14 @@ class StaticManagerInventory(Inventory):
         self._cred_file = Path(inv_path).joinpath(
             f'cred_{worker_id}').resolve()
 
+        # Where the worker acknowledges the inventory it applied
+        self._applied_file = Path(inv_path).joinpath(
+            f'applied_{worker_id}').resolve()
+        self._inventory_digest = None
+        # Where the worker reports its load
+        self._load_file = Path(inv_path).joinpath(
+            f'load_{worker_id}').resolve()
+
         if not self._inventory_file.is_file():
             raise InventorySourceError(
                 f'No inventory found at {self._inventory_file}')
@@ -60,6 +69,8 @@ class StaticManagerInventory(Inventory):
         async with aiofiles.open(str(self._inventory_file), "r") as out_file:
             inventory_data = await out_file.read()
             inventory = yaml.safe_load(inventory_data)
+        self._inventory_digest = hashlib.sha256(
+            inventory_data.encode()).hexdigest()
 
         if not isinstance(inventory, dict):
             raise InventorySourceError('Invalid inventory format. Expected'
@@ -86,3 +97,24 @@ class StaticManagerInventory(Inventory):
                 inventory[k].update(v)
 
         return inventory.values()
+
+    async def update_inventory(self) -> Tuple[Dict[str, Dict], List[str]]:
+        res = await super().update_inventory()
+        await self.ack_inventory()
+        return res
+
+    async def ack_inventory(self) -> None:
+        """Tell the controller which inventory the worker is polling, i.e.
+        that the worker is ready to receive inventory updates
+        """
+        async with aiofiles.open(str(self._applied_file), "w") as out_file:
+            await out_file.write(self._inventory_digest or '')
+
+    async def report_load(self, load: Dict) -> None:
+        """Tell the controller the load of the worker, used to size the
+        number of workers
+        """
+        tmp_file = f'{self._load_file}.tmp'
+        async with aiofiles.open(tmp_file, "w") as out_file:
+            await out_file.write(yaml.safe_dump(load))
+        os.replace(tmp_file, str(self._load_file))
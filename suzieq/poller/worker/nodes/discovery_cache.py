@@ -0,0 +1,140 @@
+"""
+This module contains the cache of the identity discovered on the nodes,
+allowing a worker restarting to poll them without a new discovery.
+"""
+import asyncio
+import json
+import logging
+import os
+from glob import glob
+from typing import Dict, Optional, Set
+
+from suzieq.shared.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+
+class DiscoveryCache:
+    """Persistent cache of the devtype, version, hostname and transport
+    discovered on each node, keyed by namespace, address and port.
+
+    Each worker writes its own file, but reads the files of all the workers
+    in the same directory, so that a node moved to another worker after a
+    restart can still benefit from the cache. The writes are delayed and
+    coalesced, to avoid rewriting the file every time a node is discovered.
+    """
+
+    def __init__(self, filename: str, save_delay: float = 5):
+        """Instantiate the cache, loading the identities discovered in the
+        previous runs.
+
+        Args:
+            filename (str): the file where the worker stores the cache
+            save_delay (float): how many seconds to wait before writing the
+                changes to the file
+        """
+        self.filename = filename
+        self.save_delay = save_delay
+        self._entries: Dict[str, Dict] = {}
+        # Entries to write in our own file
+        self._owned: Set[str] = set()
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+        self._load()
+
+    @staticmethod
+    def get_key(namespace: str, address: str, port: int) -> str:
+        """Return the key identifying a node in the cache
+
+        Args:
+            namespace (str): the namespace of the node
+            address (str): the address of the node
+            port (int): the port used to connect to the node
+
+        Returns:
+            str: the key of the node
+        """
+        return f'{namespace}/{address}:{port}'
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the identity of a node discovered in a previous run
+
+        Args:
+            key (str): the key of the node
+
+        Returns:
+            Optional[Dict]: the identity of the node, None if unknown
+        """
+        entry = self._entries.get(key)
+        CACHE_LOOKUPS.inc(cache='discovery',
+                          result='hit' if entry else 'miss')
+        return entry
+
+    def update(self, key: str, entry: Dict) -> None:
+        """Store the identity discovered on a node
+
+        Args:
+            key (str): the key of the node
+            entry (Dict): the identity of the node
+        """
+        if self._entries.get(key) == entry and key in self._owned:
+            return
+        self._entries[key] = entry
+        self._owned.add(key)
+        self._schedule_save()
+
+    def invalidate(self, key: str) -> None:
+        """Remove the identity of a node which is no longer valid
+
+        Args:
+            key (str): the key of the node
+        """
+        if self._entries.pop(key, None) is not None:
+            self._owned.discard(key)
+            self._schedule_save()
+
+    def save(self) -> None:
+        """Write the identities discovered by this worker in its file"""
+        self._save_handle = None
+        data = {k: self._entries[k] for k in self._owned}
+        tmp_file = f'{self.filename}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.filename) or '.', exist_ok=True)
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f)
+            # Replace the file at once, never leaving a truncated cache
+            os.replace(tmp_file, self.filename)
+        except OSError as e:
+            logger.warning(f'Unable to write the discovery cache '
+                           f'{self.filename}: {e}')
+
+    def _schedule_save(self) -> None:
+        if self._save_handle:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.save()
+            return
+        self._save_handle = loop.call_later(self.save_delay, self.save)
+
+    def _load(self) -> None:
+        cache_dir = os.path.dirname(self.filename) or '.'
+        # Load our own file last, so that its entries take precedence
+        files = sorted(glob(os.path.join(cache_dir, '*.json')),
+                       key=lambda x: os.path.abspath(x) ==
+                       os.path.abspath(self.filename))
+        for fname in files:
+            try:
+                with open(fname, 'r') as f:
+                    entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f'Ignoring discovery cache {fname}: {e}')
+                continue
+            if not isinstance(entries, dict):
+                continue
+            self._entries.update(entries)
+            if os.path.abspath(fname) == os.path.abspath(self.filename):
+                self._owned.update(entries)
+        if self._entries:
+            logger.info(f'Loaded the identity of {len(self._entries)} '
+                        'nodes from the discovery cache')
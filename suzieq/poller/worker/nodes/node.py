@@ -1,6 +1,7 @@
-from typing import TypeVar, Dict, Callable, List, Optional
+from typing import TypeVar, Dict, Callable, List, Optional, Tuple, Union
 from abc import abstractmethod
 from collections import defaultdict
+from dataclasses import dataclass
 import time
 from datetime import datetime, timezone
 import logging
@@ -9,6 +10,7 @@ from http import HTTPStatus
 import json
 import re
 import operator
+import functools
 from urllib.parse import urlparse
 import asyncio
 from asyncio.subprocess import PIPE, DEVNULL
@@ -20,6 +22,9 @@ import xmltodict
 import asyncssh
 import aiohttp
 
+from suzieq.poller.worker.nodes.discovery_cache import DiscoveryCache
+from suzieq.poller.worker.nodes.rest_pool import RestPool
+from suzieq.poller.worker.nodes.tunnel_pool import TunnelPool
 from suzieq.poller.worker.services.service import RsltToken
 from suzieq.shared.utils import get_timestamp_from_junos_time, \
     known_devtypes, parse_relative_timestamp
@@ -33,6 +38,15 @@ IOS_TIME_AFTER_DISCOVERY = 60   # time to wait after ios(xe,xr) auto-discovery
 TNode = TypeVar('TNode', bound='Node')
 
 
+@dataclass
+class CmdPlan:
+    '''Commands resolved for a service on a node'''
+    defined: bool   # Is there a definition of the service for the node
+    cmd: Union[str, List, None] = None  # The command(s) as in the definition
+    cmdlist: Optional[List[str]] = None  # The commands to execute
+    oformat: str = 'json'  # The expected output format
+
+
 # pylint: disable=broad-except, attribute-defined-outside-init
 class Node:
     '''Class defining communicating with a device for telemetry
@@ -86,6 +100,13 @@ class Node:
     MIN_WAIT_TIME_DATA_INIT_FAIL = 50  # (s) wait time dev data init failed
     # same as before but for slow hosts
     MIN_WAIT_TIME_DATA_INIT_FAIL_SLOW = 120
+    # (s) max difference in the boot time of a node still considered the same
+    BOOT_TIME_TOLERANCE = 120
+    # Max commands running at once over the SSH connection, each on its own
+    # channel. As many as the default batch size, i.e. the SSH sessions the
+    # node was already trusted with. The devtypes known to handle more
+    # channels raise it.
+    MAX_SSH_CHANNELS = 4
 
     # pylint: disable=too-many-statements
     async def initialize(self, **kwargs) -> TNode:
@@ -98,7 +119,11 @@ class Node:
         self.pvtkey_file = ""     # SSH private keyfile
         self.prev_result = {}  # No updates if nothing changed
         self.nsname = None
-        self.svc_cmd_mapping = defaultdict(lambda: {})  # Not used yet
+        # Commands to execute for each service, resolved for the
+        # devtype, version and hostname in _cmd_plan_key
+        self.svc_cmd_mapping: Dict[str, CmdPlan] = {}
+        self._cmd_plan_key = None
+        self.cmd_plan_time = 0  # Time spent resolving the commands (in ms)
         self.logger = logging.getLogger(__name__)
         self.port = 0
         self.backoff = 15  # secs to backoff
@@ -112,11 +137,15 @@ class Node:
         self.bootupTimestamp = 0
         self.version = "all"   # OS Version to pick the right defn
         self._service_queue = None
+        # Requests waiting to be executed together in a single call
+        self.cmd_batch_window = 0.5  # secs to wait to coalesce requests
         self._conn = None
         self._tunnel = None
         self.svcs_proc = set()
         self.error_svcs_proc = set()
         self._conn_lock = asyncio.Lock()
+        # (limit, semaphore) on the channels open at once on the connection
+        self._channel_limiter = None
         self._last_exception = None
         self._exception_timestamp = None
         self._current_exception: Optional[Exception] = None
@@ -128,6 +157,17 @@ class Node:
         self._retry = self._max_retries_on_auth_fail
         self._discovery_lock = asyncio.Lock()
         self._cmd_pacer = kwargs.get('cmd_pacer')
+        # The jump host connections shared with the other nodes, if not
+        # set the node opens its own connection
+        self._tunnel_pool: Optional[TunnelPool] = kwargs.get('tunnel_pool')
+        # The HTTP connections shared with the other REST nodes, if not set
+        # the node opens its own connections
+        self._rest_pool: Optional[RestPool] = kwargs.get('rest_pool')
+        # The identity discovered in the previous runs, to skip the discovery
+        self._discovery_cache: Optional[DiscoveryCache] = kwargs.get(
+            'discovery_cache')
+        # The identity taken from the cache, till validated on the device
+        self._cached_identity: Optional[Dict] = None
         self.per_cmd_auth = kwargs.get('per_cmd_auth', True)
 
         self.address = kwargs["address"]
@@ -193,6 +233,11 @@ class Node:
 
         if self.transport == "ssh":
             self.port = self.port or 22
+            if not self.devtype:
+                # If the node has been already discovered in a previous run,
+                # start polling it right away: the identity is checked when
+                # the device data are fetched at the connection.
+                self._use_cached_identity()
             # If a devtype is provided do not perform the initial connection
             # we want to do the connection once. So that we don't need to
             # open and close it in the case of 'iosxe', 'ios', 'iosxr'.
@@ -205,7 +250,7 @@ class Node:
                 # without also providing the device type.
                 await self._init_rest()
 
-        if not devtype:
+        if not self.devtype:
             if self.transport != 'ssh':
                 self.logger.error(
                     'devtype MUST be specified in inventory file if transport'
@@ -274,19 +319,41 @@ class Node:
             elif self.transport == 'https':
                 await self._conn.close()
         if self._tunnel:
-            self._tunnel.close()
-            await self._tunnel.wait_closed()
+            if self._tunnel_pool:
+                await self._tunnel_pool.release(self._tunnel)
+            else:
+                self._tunnel.close()
+                await self._tunnel.wait_closed()
 
         self._conn = None
         self._tunnel = None
         self._stdin = self._stdout = self._stderr = None
 
+    def _new_rest_session(self, **kwargs) -> aiohttp.ClientSession:
+        '''Return a new HTTP session, using the shared connection pool if
+        available'''
+        if self._rest_pool:
+            return self._rest_pool.get_session(**kwargs)
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(ssl=False), **kwargs)
+
     async def _terminate(self):
         self.logger.warning(
             f'Node: {self.hostname} received signal to terminate')
         await self._close_connection()
         return
 
+    def _pace(self, use_pacer: bool = True):
+        """Return the context manager waiting for the command pacer to allow
+        issuing a command to the node.
+
+        The commands are paced per jump host, if any, or per credentials,
+        since they identify the authentication server.
+        """
+        auth_key = self.jump_host or self.username
+        return self._cmd_pacer.wait(use_pacer, auth_key,
+                                    f'{self.address}:{self.port}')
+
     def _create_error(self, cmd) -> dict:
         data = {'error': str(self.current_exception)}
         if isinstance(self.current_exception, TimeoutError):
@@ -558,6 +625,77 @@ class Node:
         if hostname:
             self.hostname = hostname
 
+    @property
+    def _discovery_key(self) -> str:
+        return DiscoveryCache.get_key(self.nsname, self.address, self.port)
+
+    def _use_cached_identity(self) -> None:
+        '''Take the node identity from the discovery cache, if known'''
+        if not self._discovery_cache:
+            return
+        entry = self._discovery_cache.get(self._discovery_key)
+        if not entry or entry.get('transport') != self.transport:
+            return
+        try:
+            self._set_devtype(entry['devtype'], '')
+        except (KeyError, ValueError):
+            self._discovery_cache.invalidate(self._discovery_key)
+            return
+        self.version = entry.get('version') or 'all'
+        self._set_hostname(entry.get('hostname'))
+        self.bootupTimestamp = entry.get('bootupTimestamp', 0)
+        self._cached_identity = entry
+        logger.info(f'Using cached identity for {self.address}:{self.port}: '
+                    f'{self.devtype} {self.version}, {self.hostname}')
+
+    def _boot_time_changed(self, prev: int, cur: int) -> bool:
+        '''Tell if the node rebooted, given the boot timestamps in s or ms'''
+        if not prev or not cur or prev < 0 or cur < 0:
+            # Boot time unknown
+            return False
+        tolerance = self.BOOT_TIME_TOLERANCE
+        if max(prev, cur) > 1e11:
+            tolerance *= 1000
+        return abs(cur - prev) > tolerance
+
+    async def _check_identity(self) -> None:
+        '''Compare the identity taken from the discovery cache with the
+        device data just fetched, and store the up to date identity.
+        '''
+        cached = self._cached_identity
+        if cached:
+            self._cached_identity = None
+            if self.version != cached.get('version'):
+                await self._rediscover(f'version is now {self.version}')
+                return
+            if self._boot_time_changed(cached.get('bootupTimestamp'),
+                                       self.bootupTimestamp):
+                await self._rediscover('the device rebooted')
+                return
+
+        if self._discovery_cache and self.devtype != 'unsupported':
+            self._discovery_cache.update(self._discovery_key, {
+                'devtype': self.devtype,
+                'version': self.version,
+                'hostname': self.hostname,
+                'transport': self.transport,
+                'bootupTimestamp': self.bootupTimestamp,
+            })
+
+    async def _rediscover(self, reason: str) -> None:
+        '''Drop the cached identity and go through the full discovery'''
+        logger.warning(f'{self.address}:{self.port}: cached identity is not '
+                       f'valid, {reason}. Discovering the node again')
+        self._cached_identity = None
+        self._discovery_cache.invalidate(self._discovery_key)
+        if self.is_connected:
+            await self._close_connection()
+        self.devtype = None
+        self.version = 'all'
+        self.__class__ = Node
+        # The discovery is performed with the next command
+        self.init_again_at = 0
+
     async def _init_jump_host_connection(
             self,
             options: asyncssh.SSHClientConnectionOptions) -> None:
@@ -595,9 +733,20 @@ class Node:
                     'Using jump host: %s, with username: %s, and port: %s',
                     self.jump_host, self.jump_user, self.jump_port
                 )
-                self._tunnel = await asyncssh.connect(
-                    self.jump_host, port=self.jump_port,
-                    options=jump_host_options, username=self.jump_user)
+                if self._tunnel_pool:
+                    key = TunnelPool.get_key(self.jump_host, self.jump_port,
+                                             self.jump_user,
+                                             self.jump_host_key)
+                    self._tunnel = await self._tunnel_pool.acquire(
+                        key, lambda client_factory: asyncssh.connect(
+                            self.jump_host, port=self.jump_port,
+                            options=jump_host_options,
+                            username=self.jump_user,
+                            client_factory=client_factory))
+                else:
+                    self._tunnel = await asyncssh.connect(
+                        self.jump_host, port=self.jump_port,
+                        options=jump_host_options, username=self.jump_user)
                 self.logger.info(
                     'Connection to jump host %s succeeded', self.jump_host)
 
@@ -743,7 +892,7 @@ class Node:
             if not self._tunnel:
                 return
 
-        async with self._cmd_pacer.wait():
+        async with self._pace():
             try:
                 if self._tunnel:
                     self._conn = await self._tunnel.connect_ssh(
@@ -945,41 +1094,91 @@ class Node:
                 return
 
         timeout = timeout or self.cmd_timeout
-        async with self._cmd_pacer.wait(self.per_cmd_auth):
-            for cmd in cmd_list:
-                try:
-                    if self.slow_host:
-                        await asyncio.sleep(self.SLEEP_BET_CMDS_SLOW)
-
-                    cmd_timestamp = time.time()
-                    output = await asyncio.wait_for(self._conn.run(cmd),
-                                                    timeout=timeout)
-                    if self.current_exception:
-                        self.logger.info(
-                            '%s recovered from previous exception',
-                            self.hostname)
-                        self.current_exception = None
-                    result.append(self._create_result(
-                        cmd, output.exit_status, output.stdout, cmd_timestamp))
-                    if (output.exit_status == 0) and only_one:
+        async with self._pace(self.per_cmd_auth):
+            if only_one or len(cmd_list) == 1 or self.ssh_channels == 1:
+                outputs = []
+                for cmd in cmd_list:
+                    outputs.append(await self._run_ssh_cmd(cmd, timeout))
+                    res, error = outputs[-1]
+                    if error or (only_one and res['status'] == 0):
                         break
-                except Exception as e:
-                    self.current_exception = e
-                    result.append(self._create_error(cmd))
-                    if not isinstance(e, asyncio.TimeoutError):
-                        self.logger.error(
-                            "%s output for %s failed due to %s", cmd,
-                            self.hostname, e)
+            else:
+                # Each command runs on its own channel of the connection
+                outputs = await asyncio.gather(
+                    *[self._run_ssh_cmd(cmd, timeout) for cmd in cmd_list])
+
+            # As when running one command after the other, stop at the
+            # first failure
+            for res, error in outputs:
+                result.append(res)
+                if error:
+                    if not isinstance(error, asyncio.TimeoutError):
                         await self._close_connection()
-                    else:
-                        self.logger.error(
-                            "%s output for %s failed due to timeout", cmd,
-                            self.hostname)
-
                     break
 
         await self._post_result(service_callback, result, cb_token)
 
+    async def _run_ssh_cmd(self, cmd: str, timeout: int
+                           ) -> Tuple[Dict, Optional[Exception]]:
+        """Run a command on a channel of the SSH connection, waiting for
+        a free channel if the node already runs the max number of commands.
+
+        Args:
+            cmd (str): the command to run
+            timeout (int): how long to wait for the command to complete
+
+        Returns:
+            Tuple[Dict, Optional[Exception]]: the result of the command and
+                the exception raised running it, if any
+        """
+        async with self._get_channel_limiter():
+            try:
+                if self.slow_host:
+                    await asyncio.sleep(self.SLEEP_BET_CMDS_SLOW)
+
+                if not self.is_connected:
+                    raise ConnectionError('connection closed')
+                cmd_timestamp = time.time()
+                output = await asyncio.wait_for(self._conn.run(cmd),
+                                                timeout=timeout)
+                if self.current_exception:
+                    self.logger.info(
+                        '%s recovered from previous exception',
+                        self.hostname)
+                    self.current_exception = None
+                return self._create_result(
+                    cmd, output.exit_status, output.stdout,
+                    cmd_timestamp), None
+            except Exception as e:  # pylint: disable=broad-except
+                self.current_exception = e
+                if not isinstance(e, asyncio.TimeoutError):
+                    self.logger.error(
+                        "%s output for %s failed due to %s", cmd,
+                        self.hostname, e)
+                else:
+                    self.logger.error(
+                        "%s output for %s failed due to timeout", cmd,
+                        self.hostname)
+                return self._create_error(cmd), e
+
+    @property
+    def ssh_channels(self) -> int:
+        '''Max number of commands running at once on the SSH connection'''
+        # Slow hosts get one command at a time, the rate limited AAA servers
+        # are already protected by the command pacer
+        if self.slow_host:
+            return 1
+        return self.MAX_SSH_CHANNELS
+
+    def _get_channel_limiter(self) -> asyncio.Semaphore:
+        '''Return the semaphore limiting the channels open on the node, the
+        limit depends on the devtype, possibly changed since the last call
+        '''
+        channels = self.ssh_channels
+        if not self._channel_limiter or self._channel_limiter[0] != channels:
+            self._channel_limiter = (channels, asyncio.Semaphore(channels))
+        return self._channel_limiter[1]
+
     async def _exec_cmd(self, service_callback, cmd_list, cb_token,
                         oformat='json', timeout=None, only_one=False,
                         reconnect=True):
@@ -1003,7 +1202,104 @@ class Node:
                 self.transport, self.hostname)
         return
 
+    def _get_cmd_plan(self, service: str, svc_defn: Dict) -> CmdPlan:
+        """Return the commands to execute for the service on this node.
+
+        The commands depend only on the devtype, the version and the hostname
+        of the node, so they are resolved the first time a service is
+        executed and reused in all the following polls, till any of them
+        changes, for example after a rediscovery.
+
+        Args:
+            service (str): the name of the service
+            svc_defn (Dict): the definition of the service
+
+        Returns:
+            CmdPlan: the commands to execute
+        """
+        plan_key = (self.devtype, self.version, self.hostname)
+        if plan_key != self._cmd_plan_key:
+            self.svc_cmd_mapping = {}
+            self._cmd_plan_key = plan_key
+
+        plan = self.svc_cmd_mapping.get(service)
+        if not plan:
+            start = time.perf_counter()
+            plan = self._resolve_cmd_plan(svc_defn)
+            self.svc_cmd_mapping[service] = plan
+            self.cmd_plan_time += (time.perf_counter() - start) * 1000
+            self.logger.debug(
+                f'{self.hostname}: {service} commands resolved, '
+                f'{self.cmd_plan_time:.3f}ms spent resolving so far')
+        return plan
+
     # pylint: disable=too-many-nested-blocks
+    def _resolve_cmd_plan(self, svc_defn: Dict) -> CmdPlan:
+        """Pick the commands for the node from the service definition
+
+        Args:
+            svc_defn (Dict): the definition of the service
+
+        Returns:
+            CmdPlan: the commands to execute
+        """
+        cmd = None
+        use = svc_defn.get(self.hostname, None)
+        if not use:
+            use = svc_defn.get(self.devtype, {})
+        if not use:
+            return CmdPlan(defined=False)
+
+        # TODO This kind of logic should be encoded in config and node
+        # shouldn't have to know about it
+        if "copy" in use:
+            use = svc_defn.get(use.get("copy"))
+
+        if use:
+            if isinstance(use, list):
+                # There's more than one version here, we have to pick ours
+                for item in use:
+                    if item.get('version', '') != "all":
+                        os_version = item['version']
+                        opdict = {'>=': operator.ge, '<=': operator.le,
+                                  '>': operator.gt, '<': operator.lt,
+                                  '=': operator.eq, '!=': operator.ne}
+                        op = operator.eq
+
+                        for elem, val in opdict.items():
+                            if os_version.startswith(elem):
+                                os_version = os_version.replace(
+                                    elem, '').strip()
+                                op = val
+                                break
+
+                        if op(version_parse.LegacyVersion(self.version),
+                              version_parse.LegacyVersion(os_version)):
+                            cmd = item.get('command', None)
+                            use = item
+                            break
+                    else:
+                        cmd = item.get("command", None)
+                        use = item
+                        break
+            else:
+                cmd = use.get("command", None)
+
+        if not cmd:
+            return CmdPlan(defined=True)
+
+        oformat = use.get('format', 'json')
+        if not isinstance(cmd, list):
+            if use.get('textfsm'):
+                oformat = 'text'
+            cmdlist = [cmd]
+        else:
+            # TODO: Handling format for the multiple cmd case
+            cmdlist = [x.get('command', '') for x in cmd]
+
+        return CmdPlan(defined=True, cmd=cmd, cmdlist=cmdlist,
+                       oformat=oformat)
+
     async def _exec_service(self, service_callback, svc_defn: dict,
                             cb_token: RsltToken):
         '''Routine that determines cmdlist to be executed for given service
@@ -1011,8 +1307,31 @@ class Node:
         And invokes appropriate transport routine to execute the cmds and
         return the data to the service that requested it.
         '''
+        plan = None
+        try:
+            plan = await self._prepare_service(service_callback, svc_defn,
+                                               cb_token)
+            if plan:
+                await self._exec_cmd(service_callback, plan.cmdlist, cb_token,
+                                     oformat=plan.oformat,
+                                     timeout=cb_token.timeout)
+        except Exception as e:
+            await self._post_service_exception(service_callback, cb_token,
+                                               plan, e)
+
+    async def _prepare_service(self, service_callback, svc_defn: dict,
+                               cb_token: RsltToken) -> Optional[CmdPlan]:
+        '''Check the node is ready to execute the service and return the
+        commands to execute.
+
+        If the service cannot be executed, the error is directly posted to
+        the service.
+
+        Returns:
+            Optional[CmdPlan]: the commands to execute, None if there is
+                nothing to execute
+        '''
         result = []  # same type as gather function
-        cmd = None
 
         # If the service provided no service definition, something really
         # wrong happend. Raise an exception to stop polling.
@@ -1020,119 +1339,183 @@ class Node:
             raise PollingError(f'The {cb_token.service} service did not '
                                'provide any service definition')
 
-        try:
-            if (not self.devtype and self._retry
-                    and self.init_again_at < time.time()):
-                # When we issue bunch of commands multiple tasks might try to
-                # perform the discovery all together, we need only one of them
-                # trying to perform the discovery, all the others can fail
-                if not self._discovery_lock.locked():
-                    async with self._discovery_lock:
-                        await self._detect_node_type()
-
-            # As after the discovery we call the _init_dev_data() devtype might
-            # be set but the devdata is still not intialized, so discovery is
-            # still pending. In this case we need to fail
-            if (not self.devtype
-                    or (self.devtype and self._discovery_lock.locked())):
-                result.append(self._create_error(svc_defn.get("service", "-")))
-                return await self._post_result(
-                    service_callback, result, cb_token)
-
-            if self.devtype == 'unsupported':
-                # Service code 418 means I'm a teapot in http status codes
-                # in other words, I won't brew coffee because I'm a teapot
-                result.append(self._create_result(
-                    svc_defn, 418, "No service definition"))
+        if (not self.devtype and self._retry
+                and self.init_again_at < time.time()):
+            # When we issue bunch of commands multiple tasks might try to
+            # perform the discovery all together, we need only one of them
+            # trying to perform the discovery, all the others can fail
+            if not self._discovery_lock.locked():
+                async with self._discovery_lock:
+                    await self._detect_node_type()
+
+        # As after the discovery we call the _init_dev_data() devtype might
+        # be set but the devdata is still not intialized, so discovery is
+        # still pending. In this case we need to fail
+        if (not self.devtype
+                or (self.devtype and self._discovery_lock.locked())):
+            result.append(self._create_error(svc_defn.get("service", "-")))
+            await self._post_result(service_callback, result, cb_token)
+            return None
+
+        if self.devtype == 'unsupported':
+            # Service code 418 means I'm a teapot in http status codes
+            # in other words, I won't brew coffee because I'm a teapot
+            result.append(self._create_result(
+                svc_defn, 418, "No service definition"))
+            self.error_svcs_proc.add(svc_defn.get("service"))
+            await self._post_result(service_callback, result, cb_token)
+            return None
+
+        self.svcs_proc.add(svc_defn.get("service"))
+        plan = self._get_cmd_plan(cb_token.service, svc_defn)
+        if not plan.defined:
+            if svc_defn.get("service") not in self.error_svcs_proc:
+                res = self._create_result(svc_defn,
+                                          HTTPStatus.NOT_FOUND,
+                                          "No service definition")
+                result.append(res)
                 self.error_svcs_proc.add(svc_defn.get("service"))
-                return await self._post_result(
-                    service_callback, result, cb_token)
-
-            self.svcs_proc.add(svc_defn.get("service"))
-            use = svc_defn.get(self.hostname, None)
-            if not use:
-                use = svc_defn.get(self.devtype, {})
-            if not use:
-                if svc_defn.get("service") not in self.error_svcs_proc:
-                    res = self._create_result(svc_defn,
-                                              HTTPStatus.NOT_FOUND,
-                                              "No service definition")
-                    result.append(res)
-                    self.error_svcs_proc.add(svc_defn.get("service"))
-                return await self._post_result(
-                    service_callback, result, cb_token)
-
-            # TODO This kind of logic should be encoded in config and node
-            # shouldn't have to know about it
-            if "copy" in use:
-                use = svc_defn.get(use.get("copy"))
-
-            if use:
-                if isinstance(use, list):
-                    # There's more than one version here, we have to pick ours
-                    for item in use:
-                        if item.get('version', '') != "all":
-                            os_version = item['version']
-                            opdict = {'>=': operator.ge, '<=': operator.le,
-                                      '>': operator.gt, '<': operator.lt,
-                                      '=': operator.eq, '!=': operator.ne}
-                            op = operator.eq
-
-                            for elem, val in opdict.items():
-                                if os_version.startswith(elem):
-                                    os_version = os_version.replace(
-                                        elem, '').strip()
-                                    op = val
-                                    break
-
-                            if op(version_parse.LegacyVersion(self.version),
-                                    version_parse.LegacyVersion(os_version)):
-                                cmd = item.get('command', None)
-                                use = item
-                                break
-                        else:
-                            cmd = item.get("command", None)
-                            use = item
-                            break
-                else:
-                    cmd = use.get("command", None)
+            await self._post_result(service_callback, result, cb_token)
+            return None
 
-            if not cmd:
-                result.append(self._create_result(
-                    svc_defn, HTTPStatus.NOT_FOUND, "No service definition"))
-                self.error_svcs_proc.add(svc_defn.get("service"))
-                return await self._post_result(
-                    service_callback, result, cb_token)
+        if not plan.cmd:
+            result.append(self._create_result(
+                svc_defn, HTTPStatus.NOT_FOUND, "No service definition"))
+            self.error_svcs_proc.add(svc_defn.get("service"))
+            await self._post_result(service_callback, result, cb_token)
+            return None
+
+        return plan
+
+    async def _post_service_exception(self, service_callback,
+                                      cb_token: RsltToken,
+                                      plan: Optional[CmdPlan],
+                                      exc: Exception):
+        '''Post the error of an unexpected exception raised while executing
+        a service.
 
-            oformat = use.get('format', 'json')
+        Here we need to catch any uncatched exception as if the node
+        does not return any answer to the service, it will never schedule
+        the service again
+        '''
+        logger.exception(f'{self.address}:{self.port} exception raised '
+                         f'while executing the {cb_token.service} '
+                         'service.')
+        self.current_exception = exc
+        result = []
+        cmd = plan.cmd if plan else None
+        if cmd:
             if not isinstance(cmd, list):
-                if use.get('textfsm'):
-                    oformat = 'text'
-                cmdlist = [cmd]
+                result.append(self._create_error(cmd))
             else:
-                # TODO: Handling format for the multiple cmd case
-                cmdlist = [x.get('command', '') for x in cmd]
+                for c in cmd:
+                    result.append(self._create_error(c.get('command', '')))
+        else:
+            result.append(self._create_error(''))
 
-            await self._exec_cmd(service_callback, cmdlist, cb_token,
-                                 oformat=oformat, timeout=cb_token.timeout)
-        except Exception as e:
-            # Here we need to catch any uncatched exception as if the node
-            # does not return any answer to the service, it will never schedule
-            # the service again
-            logger.exception(f'{self.address}:{self.port} exception raised '
-                             f'while executing the {cb_token.service} '
-                             'service.')
-            self.current_exception = e
-            if cmd:
-                if not isinstance(cmd, list):
-                    result.append(self._create_error(cmd))
-                else:
-                    for c in cmd:
-                        result.append(self._create_error(c.get('command', '')))
+        await self._post_result(service_callback, result, cb_token)
+
+    @property
+    def supports_cmd_batching(self) -> bool:
+        '''Whether the commands of different services can be sent to the
+        node in a single transport call'''
+        return False
+
+    async def _collect_batch(self, request: List) -> List[List]:
+        '''Return the request with the ones posted until the end of the
+        batching window it opens'''
+        requests = [request]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.cmd_batch_window
+        while True:
+            remaining = deadline - loop.time()
+            if not self._service_queue.empty():
+                request = self._service_queue.get_nowait()
+            elif remaining > 0:
+                try:
+                    request = await asyncio.wait_for(
+                        self._service_queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
             else:
-                result.append(self._create_error(''))
+                break
+            if request:
+                requests.append(request)
+                self.logger.debug(
+                    f"Batching {request[2].service} for execution")
+        return requests
 
-            await self._post_result(service_callback, result, cb_token)
+    async def _exec_batched_services(self, requests: List[List]):
+        '''Execute together the services posted in the same batching window
+
+        The services due in the same window are coalesced in a single call
+        to the device, grouped by output format and timeout, and the results
+        are split back to each service. The services whose commands failed
+        are executed again on their own, so that the error they get is the
+        same they would have got without batching.
+        '''
+        batches: Dict[Tuple[str, int], List] = defaultdict(list)
+        for service_callback, svc_defn, cb_token in requests:
+            plan = None
+            try:
+                plan = await self._prepare_service(service_callback, svc_defn,
+                                                   cb_token)
+            except Exception as e:
+                await self._post_service_exception(service_callback, cb_token,
+                                                   plan, e)
+            if plan:
+                # Only the services with the same timeout are batched, so
+                # that each service keeps its own
+                batches[(plan.oformat, cb_token.timeout)].append(
+                    (service_callback, cb_token, plan))
+
+        for (oformat, timeout), batch in batches.items():
+            if len(batch) == 1:
+                service_callback, cb_token, plan = batch[0]
+                try:
+                    await self._exec_cmd(service_callback, plan.cmdlist,
+                                         cb_token, oformat=oformat,
+                                         timeout=timeout)
+                except Exception as e:
+                    await self._post_service_exception(
+                        service_callback, cb_token, plan, e)
+                continue
+
+            cmdlist = [c for _, _, plan in batch for c in plan.cmdlist]
+            self.logger.debug(
+                f'{self.address}:{self.port} batching services '
+                f'{[cb_token.service for _, cb_token, _ in batch]}')
+            try:
+                await self._exec_cmd(
+                    functools.partial(self._split_batch_result, batch),
+                    cmdlist, None, oformat=oformat, timeout=timeout)
+            except Exception as e:
+                for service_callback, cb_token, plan in batch:
+                    await self._post_service_exception(
+                        service_callback, cb_token, plan, e)
+
+    async def _split_batch_result(self, batch: List, result: List[Dict], _):
+        '''Return to each service of a batch its own part of the result'''
+
+        # If no command got an answer the device cannot be reached, it is
+        # pointless to retry each service, return the errors to all of them
+        retry = any(self._is_result_ok(r) for r in result)
+        start = 0
+        for service_callback, cb_token, plan in batch:
+            end = start + len(plan.cmdlist)
+            svc_result = result[start:end]
+            start = end
+            if retry and not all(self._is_result_ok(r) for r in svc_result):
+                await self._exec_cmd(service_callback, plan.cmdlist,
+                                     cb_token, oformat=plan.oformat,
+                                     timeout=cb_token.timeout)
+            else:
+                await self._post_result(service_callback, svc_result,
+                                        cb_token)
+
+    @staticmethod
+    def _is_result_ok(result: Dict) -> bool:
+        return result.get('status') in [0, HTTPStatus.OK]
 
     async def _fetch_init_dev_data(self, reconnect=True):
         """Start data fetch to initialize the class with specific device attrs
@@ -1190,6 +1573,11 @@ class Node:
                 fail_reason += (f"Cmd `{cmd['cmd']}` failed with reason: "
                                 f"{cmd['data']}. ")
 
+            if self._cached_identity:
+                # The cached devtype might be wrong
+                await self._rediscover(fail_reason)
+                return
+
             # Schedule a new connection attempt to retry the discovery of the
             # node
             min_wait_time = (self.MIN_WAIT_TIME_DATA_INIT_FAIL_SLOW
@@ -1208,6 +1596,7 @@ class Node:
                 f'another connection attempt from {next_time}.')
         else:
             await self._parse_init_dev_data_devtype(output, cb_token)
+            await self._check_identity()
 
     @abstractmethod
     async def _parse_init_dev_data_devtype(self, output: List,
@@ -1303,7 +1692,14 @@ class Node:
 
                     request = await self._service_queue.get()
 
-                    if request:
+                    if request and self.supports_cmd_batching:
+                        # The request opens a batching window, all the
+                        # requests posted in the window are executed together
+                        self.logger.debug(
+                            f"Batching {request[2].service} for execution")
+                        tasks.append(self._exec_batched_services(
+                            await self._collect_batch(request)))
+                    elif request:
                         callback, service_dfn, token = request
                         tasks.append(self._exec_service(
                             callback, service_dfn, token))
@@ -1335,6 +1731,11 @@ class Node:
 class EosNode(Node):
     '''EOS Node specific implementation'''
 
+    @property
+    def supports_cmd_batching(self) -> bool:
+        # The command-api accepts many commands in a single runCmds request
+        return self.transport == 'https'
+
     async def _rest_connect(self):
         '''Check that connectivity and authentication works'''
 
@@ -1345,9 +1746,7 @@ class EosNode(Node):
         url = f"https://{self.address}:{self.port}/command-api"
 
         try:
-            self._conn = aiohttp.ClientSession(
-                auth=auth, timeout=timeout,
-                connector=aiohttp.TCPConnector(ssl=False))
+            self._conn = self._new_rest_session(auth=auth, timeout=timeout)
             async with self._conn.post(url, timeout=timeout) as response:
                 _ = response.status
         except Exception as e:
@@ -1432,7 +1831,7 @@ class EosNode(Node):
         output = []
         status = 200  # status OK
 
-        async with self._cmd_pacer.wait(self.per_cmd_auth):
+        async with self._pace(self.per_cmd_auth):
             try:
                 self.logger.info(
                     f'{self.address}:{self.port} exec: {cmd_list}')
@@ -1442,13 +1841,23 @@ class EosNode(Node):
                     status = response.status
                     if status == HTTPStatus.OK:
                         json_out = await response.json()
+                        error = json_out.get("error")
+                        failed_at = len(cmd_list)
                         if "result" in json_out:
                             output.extend(json_out["result"])
                         else:
-                            output.extend(
-                                json_out["error"].get('data', []))
+                            # The data contain the output of the commands
+                            # executed till the failing one, the last
+                            output.extend(error.get('data', []))
+                            failed_at = max(len(output) - 1, 0)
 
                         for i, cmd in enumerate(cmd_list):
+                            if i >= failed_at:
+                                result.append(self._create_result(
+                                    cmd, error.get('code', -1),
+                                    {'error': error.get('message', '')},
+                                    now / 1000))
+                                continue
                             data = (output[i] if isinstance(output, list)
                                     else output)
                             result.append(
@@ -1522,6 +1931,8 @@ class EosNode(Node):
 class CumulusNode(Node):
     '''Cumulus Node specific implementation'''
 
+    MAX_SSH_CHANNELS = 6
+
     async def _rest_connect(self):
         raise NotImplementedError(
             f'{self.address}: REST transport is not supported')
@@ -1694,7 +2105,7 @@ class IosXENode(Node):
         if self.is_connected and not self._stdin:
             self.logger.info(
                 f'Trying to create Persistent SSH for {self.hostname}')
-            async with self._cmd_pacer.wait(self.per_cmd_auth):
+            async with self._pace(self.per_cmd_auth):
                 try:
                     self._stdin, self._stdout, self._stderr = \
                         await self._conn.open_session(term_type='xterm')
@@ -1870,7 +2281,7 @@ class IosXENode(Node):
             return
 
         timeout = timeout or self.cmd_timeout
-        async with self._cmd_pacer.wait(self.per_cmd_auth):
+        async with self._pace(self.per_cmd_auth):
             for cmd in cmd_list:
                 try:
                     if self.slow_host:
@@ -2069,6 +2480,8 @@ class NxosNode(Node):
 class SonicNode(Node):
     '''SONiC Node-specific implementtaion'''
 
+    MAX_SSH_CHANNELS = 6
+
     async def _rest_connect(self):
         raise NotImplementedError(
             f'{self.address}: REST transport is not supported')
@@ -2114,7 +2527,7 @@ class PanosNode(Node):
         result = []
         try:
             # temporary hack to detect device info using ssh
-            async with self._cmd_pacer.wait():
+            async with self._pace():
                 async with asyncssh.connect(
                         self.address, port=22, username=self.username,
                         password=self.password, known_hosts=None) as conn:
@@ -2153,7 +2566,7 @@ class PanosNode(Node):
 
         if not self._retry:
             return
-        async with self._cmd_pacer.wait(self.per_cmd_auth):
+        async with self._pace(self.per_cmd_auth):
             timeout = aiohttp.ClientTimeout(self.connect_timeout)
             async with self._conn.get(url, timeout=timeout) as response:
                 status, xml = response.status, await response.text()
@@ -2214,13 +2627,10 @@ class PanosNode(Node):
     async def _rest_connect(self):
         # In case of PANOS, getting here means REST is up
         if not self._conn:
-            async with self._cmd_pacer.wait(self.per_cmd_auth):
+            async with self._pace(self.per_cmd_auth):
                 timeout = aiohttp.ClientTimeout(self.connect_timeout)
                 try:
-                    self._conn = aiohttp.ClientSession(
-                        conn_timeout=timeout,
-                        connector=aiohttp.TCPConnector(ssl=False),
-                    )
+                    self._conn = self._new_rest_session(conn_timeout=timeout)
                     if self.api_key is None:
                         await self.get_api_key()
                     # If the api_key is still None we can't gather any data.
@@ -2259,7 +2669,7 @@ class PanosNode(Node):
                 await self._post_result(service_callback, result, cb_token)
                 return
 
-        async with self._cmd_pacer.wait(self.per_cmd_auth):
+        async with self._pace(self.per_cmd_auth):
             try:
                 for cmd in cmd_list:
                     self.logger.info(f'{self.address}:{self.port} exec: {cmd}')
@@ -0,0 +1,108 @@
+"""
+This module contains the pool of the HTTP connections shared by all the
+nodes of the worker polled via REST.
+"""
+import logging
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+import aiohttp
+
+from suzieq.shared.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RestStats:
+    '''Reuse of the HTTP connections towards a device'''
+    requests: int = 0            # Requests sent
+    new_connections: int = 0     # Requests needing a new connection
+    reused_connections: int = 0  # Requests sent on a kept alive connection
+
+    @property
+    def reuse_ratio(self) -> float:
+        '''Fraction of the connections reused'''
+        total = self.new_connections + self.reused_connections
+        return self.reused_connections / total if total else 0
+
+
+class RestPool:
+    """Pool of the HTTP connections of the REST nodes of the worker.
+
+    The nodes keep their own session, carrying their credentials, but all
+    the sessions share the same connector. This way the worker has a single
+    DNS cache, limits the connections open towards each device and keeps
+    them alive between the polls, avoiding a new TCP and TLS handshake for
+    each request. aiohttp negotiates the gzip/deflate compression of the
+    responses.
+    """
+
+    def __init__(self, limit_per_host: int = 4,
+                 keepalive_timeout: float = 60,
+                 dns_cache_ttl: int = 300):
+        """Instantiate the pool
+
+        Args:
+            limit_per_host (int): the max connections open towards a device,
+                0 means no limit
+            keepalive_timeout (float): how many seconds an idle connection is
+                kept open
+            dns_cache_ttl (int): how many seconds the name resolutions are
+                cached
+        """
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.stats: Dict[str, RestStats] = {}
+        self._connector: Optional[aiohttp.TCPConnector] = None
+
+        self._trace = aiohttp.TraceConfig()
+        self._trace.on_request_start.append(self._on_request_start)
+        self._trace.on_connection_create_end.append(self._on_conn_create)
+        self._trace.on_connection_reuseconn.append(self._on_conn_reuse)
+
+    def get_session(self, **kwargs) -> aiohttp.ClientSession:
+        """Return a new session using the connections of the pool
+
+        Args:
+            kwargs: the arguments of aiohttp.ClientSession, such as auth
+                and timeout
+
+        Returns:
+            aiohttp.ClientSession: the session, closing it doesn't close the
+                connections of the pool
+        """
+        if not self._connector or self._connector.closed:
+            # The connector needs the running loop, so it can be created only
+            # when the first node connects
+            self._connector = aiohttp.TCPConnector(
+                ssl=False, limit=0, limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl)
+        return aiohttp.ClientSession(connector=self._connector,
+                                     connector_owner=False,
+                                     trace_configs=[self._trace],
+                                     **kwargs)
+
+    async def close(self):
+        """Close the connections of the pool, the sessions still open can
+        no longer send requests
+        """
+        if self._connector:
+            await self._connector.close()
+
+    async def _on_request_start(self, _session, ctx: SimpleNamespace,
+                                params: aiohttp.TraceRequestStartParams):
+        ctx.stats = self.stats.setdefault(
+            f'{params.url.host}:{params.url.port}', RestStats())
+        ctx.stats.requests += 1
+
+    async def _on_conn_create(self, _session, ctx: SimpleNamespace, _params):
+        ctx.stats.new_connections += 1
+        CACHE_LOOKUPS.inc(cache='rest_connection', result='miss')
+
+    async def _on_conn_reuse(self, _session, ctx: SimpleNamespace, _params):
+        ctx.stats.reused_connections += 1
+        CACHE_LOOKUPS.inc(cache='rest_connection', result='hit')
@@ -0,0 +1,177 @@
+"""
+This module contains the pool of the SSH connections towards the jump hosts,
+shared by all the nodes of the worker reached through them.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import asyncssh
+
+logger = logging.getLogger(__name__)
+
+# (jump host, port, username, fingerprint of the private key)
+TunnelKey = Tuple[str, int, str, Optional[str]]
+
+
+@dataclass
+class TunnelStats:
+    '''Health of the connections towards a jump host'''
+    open_tunnels: int = 0    # Connections currently open
+    active_channels: int = 0  # Nodes currently using the connections
+    connects: int = 0        # Connections successfully opened
+    failures: int = 0        # Failed attempts to open a connection
+    lost: int = 0            # Connections unexpectedly closed
+
+
+class _Tunnel:
+    '''A connection to the jump host and the nodes using it'''
+
+    def __init__(self, key: TunnelKey):
+        self.key = key
+        self.conn: Optional[asyncssh.SSHClientConnection] = None
+        self.users = 0
+        self.alive = True
+
+
+class _TunnelClient(asyncssh.SSHClient):
+    '''Keep track of the tunnels closed by the jump host'''
+
+    def __init__(self, pool: 'TunnelPool', tunnel: _Tunnel):
+        self._pool = pool
+        self._tunnel = tunnel
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self._pool.tunnel_lost(self._tunnel, exc)
+
+
+class TunnelPool:
+    """Pool of the SSH connections towards the jump hosts.
+
+    The nodes behind the same jump host, reached with the same user and key,
+    share the same connections, each of them carrying at most `max_channels`
+    nodes. When all the connections are full, a new one is opened. A
+    connection closed by the jump host is discarded, and the nodes using it
+    get a new one the next time they connect.
+    """
+
+    def __init__(self, max_channels: int = 10):
+        """Instantiate the pool
+
+        Args:
+            max_channels (int): the max number of nodes sharing a single
+                connection to the jump host
+        """
+        self.max_channels = max_channels
+        self.stats: Dict[TunnelKey, TunnelStats] = {}
+        self._tunnels: Dict[TunnelKey, List[_Tunnel]] = {}
+        self._conn_by_id: Dict[int, _Tunnel] = {}
+        self._locks: Dict[TunnelKey, asyncio.Lock] = {}
+
+    @staticmethod
+    def get_key(host: str, port: int, username: str,
+                pvtkey: Optional[asyncssh.SSHKey]) -> TunnelKey:
+        """Return the key identifying the connections to a jump host
+
+        Args:
+            host (str): the jump host address
+            port (int): the jump host port
+            username (str): the user logging in the jump host
+            pvtkey (Optional[asyncssh.SSHKey]): the private key to login
+
+        Returns:
+            TunnelKey: the key of the jump host connections
+        """
+        return (host, port, username,
+                pvtkey.get_fingerprint() if pvtkey else None)
+
+    async def acquire(
+        self,
+        key: TunnelKey,
+        connect: Callable[[Callable], Awaitable[asyncssh.SSHClientConnection]]
+    ) -> asyncssh.SSHClientConnection:
+        """Get a connection to the jump host with a free channel, opening a
+        new one if needed.
+
+        Args:
+            key (TunnelKey): the key of the jump host
+            connect (Callable): the coroutine function opening a new
+                connection, called with the client_factory to pass to
+                asyncssh.connect()
+
+        Raises:
+            Exception: any exception raised while connecting
+
+        Returns:
+            asyncssh.SSHClientConnection: the connection to the jump host,
+                to give back calling release()
+        """
+        stats = self.stats.setdefault(key, TunnelStats())
+        # Only one node at a time opens a new connection, so that all the
+        # others waiting can share it
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            tunnels = self._tunnels.setdefault(key, [])
+            tunnel = next((t for t in tunnels
+                           if t.alive and t.users < self.max_channels), None)
+            if not tunnel:
+                tunnel = _Tunnel(key)
+                try:
+                    tunnel.conn = await connect(
+                        lambda: _TunnelClient(self, tunnel))
+                except Exception:
+                    stats.failures += 1
+                    raise
+                if not tunnel.alive:
+                    # Closed while we were still connecting
+                    stats.failures += 1
+                    raise ConnectionError(f'Connection to {key[0]} lost')
+                stats.connects += 1
+                stats.open_tunnels += 1
+                tunnels.append(tunnel)
+                self._conn_by_id[id(tunnel.conn)] = tunnel
+                logger.info(f'Opened connection {len(tunnels)} to jump host '
+                            f'{key[0]}:{key[1]}')
+
+            tunnel.users += 1
+            stats.active_channels += 1
+            return tunnel.conn
+
+    async def release(self, conn: asyncssh.SSHClientConnection) -> None:
+        """Give back a connection obtained with acquire(), closing it if
+        no other node is using it.
+
+        Args:
+            conn (asyncssh.SSHClientConnection): the connection to release
+        """
+        tunnel = self._conn_by_id.get(id(conn))
+        if not tunnel:
+            return
+        tunnel.users -= 1
+        self.stats[tunnel.key].active_channels -= 1
+        if tunnel.users <= 0:
+            self._discard(tunnel)
+            del self._conn_by_id[id(conn)]
+            conn.close()
+            await conn.wait_closed()
+
+    def tunnel_lost(self, tunnel: _Tunnel, exc: Optional[Exception]) -> None:
+        """Discard a tunnel closed by the jump host, the nodes using it will
+        get a new one when reconnecting.
+        """
+        if not tunnel.alive:
+            return
+        if tunnel.users > 0:
+            self.stats[tunnel.key].lost += 1
+            logger.warning(f'Connection to jump host {tunnel.key[0]} '
+                           f'lost: {exc or "closed by the server"}')
+        self._discard(tunnel)
+
+    def _discard(self, tunnel: _Tunnel) -> None:
+        if not tunnel.alive:
+            return
+        tunnel.alive = False
+        tunnels = self._tunnels.get(tunnel.key, [])
+        if tunnel in tunnels:
+            tunnels.remove(tunnel)
+            self.stats[tunnel.key].open_tunnels -= 1
@@ -0,0 +1,91 @@
+"""
+This module contains the logic to profile a running worker on demand
+"""
+import asyncio
+import cProfile
+import logging
+import os
+import pstats
+import time
+from typing import Callable, List, Optional
+
+from suzieq.poller.worker.services.service import Service
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerProfiler:
+    """Profile the worker with cProfile for a while when requested, i.e.
+    when the worker receives a SIGUSR1.
+
+    At the end of the sampling window the profile is dumped in a .prof file,
+    which can be loaded with pstats or snakeviz, along with a text summary
+    containing the top functions and the time the services spent in each
+    processing phase, per devtype.
+    """
+
+    def __init__(self, dump_dir: str, worker_id: str,
+                 get_services: Callable[[], List[Service]],
+                 duration: int = 30):
+        """Instantiate the profiler
+
+        Args:
+            dump_dir (str): the directory where the profiles are dumped
+            worker_id (str): the id of the worker, part of the file names
+            get_services (Callable[[], List[Service]]): function returning
+                the services running in the worker
+            duration (int): how many seconds the worker is profiled for
+        """
+        self.dump_dir = dump_dir
+        self.worker_id = worker_id
+        self.duration = duration
+        self._get_services = get_services
+        self._task: Optional[asyncio.Task] = None
+
+    def trigger(self) -> None:
+        """Start profiling the worker, if not already doing it"""
+        if self._task and not self._task.done():
+            logger.warning('Worker profiling already in progress')
+            return
+        self._task = asyncio.create_task(self.profile())
+
+    async def profile(self) -> str:
+        """Profile the worker and dump the results
+
+        Returns:
+            str: the path of the profile dumped, without extension
+        """
+        logger.warning(f'Profiling the worker for {self.duration}s')
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(self.duration)
+        finally:
+            profiler.disable()
+
+        filename = os.path.join(
+            self.dump_dir,
+            f'sq-poller-{self.worker_id}-{int(time.time())}')
+        try:
+            os.makedirs(self.dump_dir, exist_ok=True)
+            profiler.dump_stats(f'{filename}.prof')
+            with open(f'{filename}.txt', 'w') as f:
+                self._write_phase_stats(f)
+                f.write('\n')
+                pstats.Stats(profiler, stream=f) \
+                    .sort_stats('cumulative').print_stats(50)
+        except OSError as e:
+            logger.error(f'Unable to dump the worker profile: {e}')
+        else:
+            logger.warning(f'Worker profile dumped in {filename}.prof')
+        return filename
+
+    def _write_phase_stats(self, f) -> None:
+        f.write('Processing time (ms) [min, max, avg] per service, devtype '
+                'and phase\n')
+        for svc in self._get_services():
+            for devtype, phases in sorted(svc.phase_stats.items()):
+                times = ', '.join(
+                    f'{phase}: [{", ".join(f"{x:.2f}" for x in val)}]'
+                    for phase, val in phases.items())
+                f.write(f'{svc.name} {devtype} {times}\n')
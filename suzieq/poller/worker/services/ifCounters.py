@@ -0,0 +1,127 @@
+import math
+from typing import Dict, Optional, Tuple
+
+from suzieq.poller.worker.services.service import Service
+
+COUNTER32_MAX = 2**32
+
+# How long the interface speeds read from the datastore are reused, in secs
+SPEED_REFRESH = 900
+
+# rate field: (counter field, multiplier, min bits on the wire per unit)
+# A packet takes at least 84 bytes, the smallest Ethernet frame with its
+# preamble and inter-frame gap
+RATE_FIELDS = {
+    'rxBps': ('rxBytes', 8, 8),
+    'txBps': ('txBytes', 8, 8),
+    'rxPps': ('rxPackets', 1, 84 * 8),
+    'txPps': ('txPackets', 1, 84 * 8),
+    'rxErrsPerSec': ('rxErrs', 1, 84 * 8),
+    'txErrsPerSec': ('txErrs', 1, 84 * 8),
+}
+
+
+class IfCountersService(Service):
+    """ifCounters service. Different class to compute the rates of the
+    counters from the previous sample"""
+
+    def __init__(self, name, defn, period, stype, keys, ignore_fields,
+                 schema, queue, db_access, run_once="forever"):
+        super().__init__(name, defn, period, stype, keys, ignore_fields,
+                         schema, queue, db_access, run_once)
+        # The devices do not report the speed with the counters, the one
+        # written by the interfaces service is read when a counter might
+        # have wrapped: 'namespace.hostname' -> (read time, {ifname: speed})
+        self._speeds = {}
+
+    def update_node_list(self, added, removed):
+        super().update_node_list(added, removed)
+        for node in removed:
+            self._speeds.pop(node, None)
+
+    def clean_data(self, processed_data, raw_data):
+        processed_data = super().clean_data(processed_data, raw_data)
+
+        if not processed_data:
+            return processed_data
+        key = f'{processed_data[0]["namespace"]}.' \
+            f'{processed_data[0]["hostname"]}'
+        prev = {x['ifname']: x
+                for x in self.previous_results.get(key) or []}
+        for entry in processed_data:
+            self._add_rates(key, entry, prev.get(entry['ifname']))
+
+        return processed_data
+
+    def _add_rates(self, key: str, entry: Dict, prev: Optional[Dict]) -> None:
+        '''Add to the entry the rates since the previous sample, NaN if
+        unknown, on the first sample or after the counters were reset'''
+        elapsed = 0
+        if prev:
+            prev_ts = prev['timestamp']
+            if hasattr(prev_ts, 'timestamp'):
+                # Coming from the datastore
+                prev_ts = prev_ts.timestamp() * 1000
+            elapsed = (entry['timestamp'] - prev_ts) / 1000
+
+        for rate, (counter, mult, unit_bits) in RATE_FIELDS.items():
+            delta = None
+            if elapsed > 0:
+                delta, wrapped = self._counter_delta(prev.get(counter),
+                                                     entry[counter])
+                # A wrap is plausible only if the interface could carry
+                # the increase in the elapsed time, otherwise the counters
+                # were reset, for instance cleared or because of a reboot
+                if wrapped:
+                    speed = self._get_speed(key, entry['ifname'],
+                                            entry['timestamp'])
+                    if delta > speed * 10**6 * elapsed / unit_bits:
+                        delta = None
+            entry[rate] = (delta * mult / elapsed
+                           if delta is not None else float('nan'))
+
+    @staticmethod
+    def _counter_delta(prev: int, cur: int) -> Tuple[Optional[int], bool]:
+        '''Return how much a counter increased, None if unknown, and
+        whether it wrapped.
+
+        A counter found lower than in the previous sample wrapped if both
+        samples fit in 32 bits. Otherwise, the counters were reset or the
+        counter width is unknown.
+        '''
+        if prev is None or math.isnan(prev):
+            # Missing, or NaN if read from the datastore
+            return None, False
+        prev = int(prev)
+        if cur >= prev:
+            return cur - prev, False
+        if prev < COUNTER32_MAX:
+            return cur + COUNTER32_MAX - prev, True
+        return None, False
+
+    def _get_speed(self, key: str, ifname: str, timestamp: int) -> int:
+        '''Return the speed in Mbps of the interface, 0 if unknown'''
+        read_time, speeds = self._speeds.get(key, (0, None))
+        if speeds is None or timestamp - read_time > SPEED_REFRESH * 1000:
+            speeds = self._read_speeds(*key.split('.', 1))
+            self._speeds[key] = (timestamp, speeds)
+        return speeds.get(ifname, 0)
+
+    def _read_speeds(self, namespace: str, hostname: str) -> Dict[str, int]:
+        '''Read the speed of the interfaces of a node from the datastore'''
+        if not self._db_access:
+            return {}
+        df = self._db_access.read(
+            'interfaces',
+            'pandas',
+            start_time='',
+            end_time='',
+            columns=['namespace', 'hostname', 'ifname', 'speed', 'active',
+                     'timestamp'],
+            view='latest',
+            key_fields=['namespace', 'hostname', 'ifname'],
+            add_filter=f"hostname.str.match('{hostname}') and "
+            f"namespace.str.match('{namespace}')",
+            hostname=[hostname],
+            namespace=[namespace]).query('active')
+        return df.set_index('ifname')['speed'].fillna(0).to_dict()
@@ -0,0 +1,246 @@
+"""
+This module contains the scheduler in charge of deciding when each service
+has to poll each node.
+"""
+import asyncio
+import heapq
+import logging
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from itertools import count
+from typing import Callable, Dict, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Weight of the last sample in the moving averages of the scheduler load
+LOAD_AVG_WEIGHT = 0.05
+# Above these values the worker is considered falling behind
+MAX_MISS_RATE = 0.2
+MAX_FIRE_LAG = 2  # secs
+
+
+@dataclass
+class PollStats:
+    '''Scheduling stats of a service on a node'''
+    deadline_misses: int = 0  # Polls started after their slot had passed
+    shed_count: int = 0       # Polls delayed to reduce the load
+    max_lag: float = 0        # Max delay (in secs) in starting a poll
+
+
+class PollScheduler:
+    """Central scheduler of the polls of a worker.
+
+    Each service hands over to the scheduler the nodes it has to poll. The
+    first poll of a node starts right away, then the nodes of a service are
+    spread across the service period, so that the nodes of the same service
+    do not all poll at the same time. The nodes added later are placed in
+    the largest gaps between the slots of the nodes already scheduled. Each
+    node then keeps its slot in the following periods, with some jitter to
+    avoid nodes drifting back in phase.
+
+    The scheduler tracks the polls started after their slot has passed
+    (deadline misses). When the worker falls behind, the polls of the low
+    priority services are delayed of a period, so that the other services
+    can catch up.
+    """
+
+    def __init__(self, jitter: float = 0.1):
+        """Instantiate the scheduler
+
+        Args:
+            jitter (float): the maximum random delay added to each poll,
+                as a fraction of the interval between the slots of two
+                nodes of the same service.
+        """
+        self.jitter = jitter
+        self.stats: Dict[Tuple[str, str], PollStats] = defaultdict(PollStats)
+        # Heap of (deadline, seq, service, node, callback), the seq makes
+        # the heap never compare the callbacks
+        self._heap = []
+        self._seq = count()
+        # The service and node of the polls in the heap
+        self._queued: Set[Tuple[str, str]] = set()
+        # Slot (without jitter) of the next poll of each service on each node
+        self._slots: Dict[Tuple[str, str], float] = {}
+        self._slot_jitter: Dict[str, float] = {}
+        self._periods: Dict[str, float] = {}
+        self._miss_rate = 0
+        self._fire_lag = 0
+        self._wakeup = None
+
+    @property
+    def falling_behind(self) -> bool:
+        '''Whether the worker is not able to keep up with the polls'''
+        return (self._miss_rate > MAX_MISS_RATE or
+                self._fire_lag > MAX_FIRE_LAG)
+
+    @property
+    def load(self) -> Dict[str, float]:
+        '''The load of the worker, as seen by the scheduler: the average
+        delay in starting the polls, the rate of the polls started after
+        their slot and whether the worker is falling behind'''
+        return {'fire-lag': self._fire_lag,
+                'miss-rate': self._miss_rate,
+                'falling-behind': self.falling_behind}
+
+    def add_nodes(self, service: str, nodes: List[str], period: float,
+                  callback: Callable) -> None:
+        """Schedule the first poll of the service on the given nodes, right
+        away, and give them a slot for the following polls.
+
+        The slots of the new nodes are spread across the period, in the
+        largest gaps between the slots of the nodes of the service already
+        scheduled. The second poll of a node comes in its slot, from half a
+        period to one period and a half after the first one.
+
+        Args:
+            service (str): the name of the service
+            nodes (List[str]): the names of the nodes to poll
+            period (float): the poll period of the service in secs
+            callback (Callable): the function to call to start the poll, it
+                is called with the node name as argument
+        """
+        if not nodes:
+            return
+        now = time.time()
+        self._periods[service] = period
+        added = set(nodes)
+        phases = [slot % period for (svc, node), slot in self._slots.items()
+                  if svc == service and node not in added]
+        new_phases = self._spread(phases, len(nodes), period,
+                                  (now + period / 2) % period)
+        for node, phase in zip(nodes, new_phases):
+            slot = now + period / 2 + (phase - now - period / 2) % period
+            # The slot of the poll preceding the second one
+            self._slots[(service, node)] = slot - period
+        self._update_jitter(service)
+        for node in nodes:
+            self._push(service, node, now, callback)
+
+    def remove_node(self, service: str, node: str) -> None:
+        """Stop polling the node with the service
+
+        Args:
+            service (str): the name of the service
+            node (str): the name of the node
+        """
+        self._slots.pop((service, node), None)
+        self.stats.pop((service, node), None)
+        self._queued.discard((service, node))
+        self._heap = [x for x in self._heap
+                      if x[2] != service or x[3] != node]
+        heapq.heapify(self._heap)
+        self._update_jitter(service)
+
+    def reschedule(self, service: str, node: str, period: float,
+                   callback: Callable, low_priority: bool = False) -> None:
+        """Schedule the next poll of the service on the node, keeping the
+        node in its slot.
+
+        Args:
+            service (str): the name of the service
+            node (str): the name of the node
+            period (float): the poll period of the service in secs
+            callback (Callable): the function to call to start the poll
+            low_priority (bool): whether the poll can be delayed when the
+                worker is falling behind
+        """
+        now = time.time()
+        key = (service, node)
+        slot = self._slots.get(key, now) + period
+        missed = slot < now
+        if missed:
+            # The poll took longer than the period, restart from now
+            self.stats[key].deadline_misses += 1
+            slot = now
+        self._miss_rate += LOAD_AVG_WEIGHT * (missed - self._miss_rate)
+
+        if low_priority and self.falling_behind:
+            self.stats[key].shed_count += 1
+            slot += period
+            logger.info(f'Worker falling behind, delaying {service} on '
+                        f'{node} of {period}s')
+
+        self._slots[key] = slot
+        self._push(service, node, slot, callback)
+
+    @staticmethod
+    def _spread(phases: List[float], new_slots: int, period: float,
+                start: float) -> List[float]:
+        '''Return the phases in the period of the new slots: spread
+        evenly from start if no slot is taken, otherwise each in the
+        middle of the largest gap between the slots taken'''
+        if not phases:
+            return [(start + i * period / new_slots) % period
+                    for i in range(new_slots)]
+        phases = sorted(phases)
+        # Heap of the gaps between the slots, as (-length, begin)
+        gaps = [(a - b, a) for a, b in
+                zip(phases, phases[1:] + [phases[0] + period])]
+        heapq.heapify(gaps)
+        new_phases = []
+        for _ in range(new_slots):
+            length, begin = heapq.heappop(gaps)
+            new_phases.append((begin - length / 2) % period)
+            for half in (begin, begin - length / 2):
+                heapq.heappush(gaps, (length / 2, half))
+        return new_phases
+
+    def _update_jitter(self, service: str) -> None:
+        '''Set the jitter of the service from the interval between the
+        slots of its nodes'''
+        nodes = sum(1 for svc, _ in self._slots if svc == service)
+        if nodes and service in self._periods:
+            self._slot_jitter[service] = \
+                self._periods[service] / nodes * self.jitter
+        else:
+            self._slot_jitter.pop(service, None)
+
+    def _push(self, service: str, node: str, slot: float,
+              callback: Callable) -> None:
+        if (service, node) in self._queued:
+            # Already scheduled, e.g. the node was added again while it was
+            # being polled
+            return
+        self._queued.add((service, node))
+        deadline = slot + random.uniform(0, self._slot_jitter.get(service, 0))
+        entry = (deadline, next(self._seq), service, node, callback)
+        heapq.heappush(self._heap, entry)
+        # Wake up the scheduler if this is the new first poll
+        if self._wakeup and self._heap[0] is entry:
+            self._wakeup.set()
+
+    async def run(self):
+        """Start the polls when their time comes"""
+        self._wakeup = asyncio.Event()
+        while True:
+            if not self._heap:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                deadline, _, service, node, callback = \
+                    heapq.heappop(self._heap)
+                self._queued.discard((service, node))
+                lag = now - deadline
+                self._fire_lag += LOAD_AVG_WEIGHT * (lag - self._fire_lag)
+                stats = self.stats[(service, node)]
+                stats.max_lag = max(stats.max_lag, lag)
+                try:
+                    callback(node)
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception(
+                        f'Unable to start {service} poll on {node}')
@@ -4,20 +4,24 @@ import json
 import logging
 import operator
 import os
+import threading
 import time
 from collections import defaultdict
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from http import HTTPStatus
 from tempfile import mkstemp
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import pyarrow as pa
 import yaml
 from packaging import version as version_parse
 
+from suzieq.poller.worker.services.poll_scheduler import PollScheduler
 from suzieq.poller.worker.services.svcparser \
-    import cons_recs_from_json_template
+    import cons_recs_from_json_stream, cons_recs_from_json_template
+from suzieq.shared.metrics import REGISTRY
 from suzieq.shared.sq_plugin import SqPlugin
 from suzieq.shared.utils import get_default_per_vals, known_devtypes
 from suzieq.version import SUZIEQ_VERSION
@@ -28,6 +32,38 @@ HOLD_TIME_IN_MSECS = 60000
 HYSTERESIS_FAILURE_CNT = 3
 # The boot timestamp time drift tolerance (in seconds)
 TIME_DRIFT_TOLERANCE = 5
+# Outputs bigger than this (in bytes) are processed in a worker thread
+THREADED_PROCESSING_THRESHOLD = 512*1024
+
+POLL_TIME = REGISTRY.histogram(
+    'sq_poller_poll_seconds',
+    'Time to poll a node and process its output', ['service'])
+GATHER_TIME = REGISTRY.histogram(
+    'sq_poller_gather_seconds',
+    'Time to get the output of a node', ['service'])
+PHASE_TIME = REGISTRY.histogram(
+    'sq_poller_processing_seconds',
+    'Time spent processing the output of a node, per phase',
+    ['service', 'phase'])
+POLLS = REGISTRY.counter(
+    'sq_poller_polls_total', 'Polls of the nodes, per status',
+    ['service', 'status'])
+RX_BYTES = REGISTRY.counter(
+    'sq_poller_received_bytes_total', 'Bytes received from the nodes',
+    ['service'])
+
+# Python type each of the schema types is coerced to
+PTYPE_MAP = {
+    pa.string(): str,
+    pa.int32(): int,
+    pa.int64(): int,
+    pa.float32(): float,
+    pa.float64(): float,
+    pa.date64(): float,
+    pa.list_(pa.string()): list,
+    pa.list_(pa.int64()): list,
+    pa.bool_(): bool,
+}
 
 
 @dataclass
@@ -41,6 +77,10 @@ class RsltToken:
     timeout: int          # timeout value for cmd to complete
 
 
+# Phases of the processing of the outputs of a node, timed separately
+PROCESSING_PHASES = ['decode', 'normalize', 'clean', 'diff', 'enqueue']
+
+
 @dataclass
 class ServiceStats:
     '''Capture useful stats about service'''
@@ -50,6 +90,8 @@ class ServiceStats:
     nodeQsize: List[float] = field(default_factory=list)
     wrQsize: List[float] = field(default_factory=list)
     rxBytes: List[float] = field(default_factory=list)
+    # Time (ms) spent in each processing phase, see PROCESSING_PHASES
+    phase_time: Dict[str, List[float]] = field(default_factory=dict)
     empty_count: int = 0
     time_excd_count: int = 0    # Number of times total_time > poll period
     next_update_time: int = 0   # When results will be logged
@@ -81,6 +123,19 @@ class Service(SqPlugin):
         self.run_once = run_once
         self.post_timeout = 5
         self.sigend = False
+        # Decode the JSON outputs incrementally instead of all at once
+        self.stream_decode = False
+        # The worker scheduler deciding when to poll, if not set the nodes
+        # are polled every period after the end of the previous poll
+        self.scheduler: Optional[PollScheduler] = None
+        self.low_priority = False  # The polls can be delayed if overloaded
+        # Upper bound of the poll period of the nodes whose data do not
+        # change, if not set the nodes are always polled every period
+        self.max_period = None
+        self._node_periods = {}
+        # Do not write the counters records equal to the previous ones
+        self.skip_unchanged = False
+        self._init_phase_stats()
         self.version = schema.version
         # Get sqobject to retrieve the data of this service
         self._db_access = db_access
@@ -90,6 +145,7 @@ class Service(SqPlugin):
         self.node_postcall_list = {}
         self.new_node_postcall_list = {}
         self.previous_results = {}
+        self._normalizer_cache = {}
         self._node_boot_timestamps = {}  # dictionary useful to detect reboots
         self._poller_schema = {}
         self.node_boot_times = defaultdict(int)
@@ -115,15 +171,33 @@ class Service(SqPlugin):
         self.partition_cols = schema.get_partition_columns()
 
         # Setup dictionary of NOS specific extracted data cleaners
-        self.dev_clean_fn = {}
+        self.dev_clean_fn = self._build_dev_clean_fn()
+
+        self._coerce_plan = self._build_coerce_plan()
+
+    def _init_phase_stats(self) -> None:
+        '''Setup the accounting of the time spent processing the outputs'''
+        # The time spent processing the outputs, per devtype and phase
+        self.phase_stats: Dict[str, Dict[str, List[float]]] = \
+            defaultdict(dict)
+        # The recent write times (ms) per table, filled by the writer
+        self.write_times: Optional[Dict[str, List[float]]] = None
+        # Where the phase timers of the output being processed are stored,
+        # the processing of large outputs runs in a separate thread
+        self._phase_local = threading.local()
+
+    def _build_dev_clean_fn(self) -> Dict:
+        '''Return the data cleaner of each devtype'''
+        dev_clean_fn = {}
         common_dev_clean_fn = getattr(self, '_common_data_cleaner', None)
         for x in known_devtypes():
             if x.startswith('junos'):
                 dev = 'junos'
             else:
                 dev = x
-            self.dev_clean_fn[x] = getattr(
+            dev_clean_fn[x] = getattr(
                 self, f'_clean_{dev}_data', None) or common_dev_clean_fn
+        return dev_clean_fn
 
     @ staticmethod
     def is_status_ok(status: int) -> bool:
@@ -156,6 +230,43 @@ class Service(SqPlugin):
         else:
             self.node_postcall_list = node_call_list
 
+    def update_node_list(self, added: Dict, removed: List[str]) -> None:
+        """Start polling the nodes added to the inventory and stop polling
+        the removed ones, while the service is running.
+
+        Args:
+            added (Dict): for each 'namespace.hostname' the function allowing
+                to call a query on the node
+            removed (List[str]): the 'namespace.hostname' of the nodes removed
+        """
+        for node in removed:
+            if node in added:
+                # The node was re-created, e.g. its password changed, it
+                # gets a new slot in place of the one of the old node
+                if self.scheduler:
+                    self.scheduler.remove_node(self.name, node)
+                continue
+            self.node_postcall_list.pop(node, None)
+            self.previous_results.pop(node, None)
+            self._node_boot_timestamps.pop(node, None)
+            self._consecutive_failures.pop(node, None)
+            self._node_periods.pop(node, None)
+            self._failed_node_set.discard(node)
+            if self.scheduler:
+                self.scheduler.remove_node(self.name, node)
+
+        if not added:
+            return
+        self.node_postcall_list.update(added)
+        if self.scheduler:
+            self.scheduler.add_nodes(self.name, list(added), self.period,
+                                     self._start_poll)
+        else:
+            for node, postcall in added.items():
+                # The polls of the re-created nodes go on, with the new node
+                if node not in removed:
+                    self.call_node_postcmd(postcall, node)
+
     def get_empty_record(self):
         '''Return an empty record matching schema'''
         map_defaults = get_default_per_vals()
@@ -237,7 +348,7 @@ class Service(SqPlugin):
             koldvals.append(vals)
             koldkeys.append(kvals)
 
-        if add_all or self.stype == 'counters':
+        if add_all or (self.stype == 'counters' and not self.skip_unchanged):
             adds = new
         else:
             adds = [new[k]
@@ -257,8 +368,7 @@ class Service(SqPlugin):
         """Convert unstructured output to structured output"""
 
         records = []
-        fsm_template.Reset()
-        res = fsm_template.ParseText(raw_input)
+        res = fsm_template.parse(raw_input)
 
         for entry in res:
             metent = dict(zip(fsm_template.header, entry))
@@ -282,6 +392,10 @@ class Service(SqPlugin):
                               self.period-5)
             postcall['postq'](self.post_results, self.defn, token)
 
+    def _start_poll(self, nodename: str) -> None:
+        self.call_node_postcmd(self.node_postcall_list.get(nodename),
+                               nodename)
+
     def clean_json_input(self, data):
         """Clean the JSON input data that is sometimes messed up
         Each service can implement its own version of the cleanup
@@ -295,8 +409,15 @@ class Service(SqPlugin):
         the duration specified for the service period. If nodes are slower,
         they'll be scheduled to run after the specified service period after
         their return. We could use this to track slow nodes.
+        If there is a scheduler, it is in charge of spreading the polls of
+        the nodes across the period.
         """
 
+        if self.scheduler:
+            self.scheduler.add_nodes(self.name, list(self.node_postcall_list),
+                                     self.period, self._start_poll)
+            return
+
         for node in self.node_postcall_list:
             try:
                 self.call_node_postcmd(self.node_postcall_list[node],
@@ -346,6 +467,13 @@ class Service(SqPlugin):
         service config file (under suzieq/config). This function
         returns that string for the given data input
         '''
+        # The normalizer only depends on these, no need to look it up
+        # again every time
+        nfn_key = (data.get("hostname"), data.get("devtype"),
+                   data.get("version"))
+        if nfn_key in self._normalizer_cache:
+            return self._normalizer_cache[nfn_key]
+
         nfn = self.defn.get(data.get("hostname"), {})
         if not nfn:
             nfn = self.defn.get(data.get("devtype"), {})
@@ -359,6 +487,7 @@ class Service(SqPlugin):
             if isinstance(nfn, list):
                 nfn = self._get_def_for_version(nfn, data.get("version"))
 
+        self._normalizer_cache[nfn_key] = nfn
         return nfn
 
     def _process_each_output(self, elem_num, data, nfn):
@@ -380,43 +509,22 @@ class Service(SqPlugin):
                     norm_str = nfn.get('command', [])[elem_num].get(
                         'normalize', None)
                 if norm_str:
-                    if isinstance(data["data"], str):
-                        try:
-                            in_info = json.loads(data["data"])
-                        except json.JSONDecodeError:
-                            in_info = self.clean_json_input(data)
-                            if not in_info:
-                                self.logger.error(
-                                    "Received non-JSON output where "
-                                    "JSON was expected for %s on "
-                                    "node %s, %s",
-                                    data["cmd"], data["hostname"],
-                                    data["data"]
-                                )
-                                return result
-                            try:
-                                in_info = json.loads(in_info)
-                            except json.JSONDecodeError:
-                                self.logger.error(
-                                    "Received non-JSON output where "
-                                    "JSON was expected for %s on "
-                                    "node %s, %s",
-                                    data["cmd"], data["hostname"],
-                                    data["data"]
-                                )
-                                return result
-                    else:
-                        in_info = data["data"]
+                    if self.stream_decode and isinstance(data["data"], str):
+                        with self._phase_timer('decode'):
+                            result = cons_recs_from_json_stream(
+                                norm_str, data["data"])
+                        if result is not None:
+                            return result
+                        # Not streamable, fallback to the full decoding
+                        result = []
+
+                    with self._phase_timer('decode'):
+                        in_info = self._decode_json_output(data)
 
                     if in_info:
-                        # EOS' HTTP returns errors like this.
-                        if isinstance(in_info, dict):
-                            tmp = in_info.get('data', [])
-                            if tmp and tmp[0].get('errors', {}):
-                                return []
-
-                        result = cons_recs_from_json_template(
-                            norm_str, in_info)
+                        with self._phase_timer('normalize'):
+                            result = cons_recs_from_json_template(
+                                norm_str, in_info)
 
                 else:
                     tfsm_template = nfn.get("textfsm", None)
@@ -450,9 +558,10 @@ class Service(SqPlugin):
                     # Clean data is invoked inside this due to the way we
                     # munge the data and force the types to adhere to the
                     # specified type
-                    result = self.textfsm_data(
-                        in_info, tfsm_template, entry_type, self.schema, data
-                    )
+                    with self._phase_timer('normalize'):
+                        result = self.textfsm_data(
+                            in_info, tfsm_template, entry_type, self.schema,
+                            data)
             else:
                 self.logger.error(
                     "%s: No normalization/textfsm function for device %s",
@@ -460,6 +569,49 @@ class Service(SqPlugin):
 
         return result
 
+    def _decode_json_output(self, data: Dict):
+        """Decode the output of a command expected to be JSON
+
+        Args:
+            data (Dict): the output of the command
+
+        Returns:
+            the decoded output, None if it is not JSON or carries an error
+        """
+        in_info = data["data"]
+        if isinstance(in_info, str):
+            try:
+                in_info = json.loads(in_info)
+            except json.JSONDecodeError:
+                in_info = self.clean_json_input(data)
+                try:
+                    in_info = json.loads(in_info) if in_info else None
+                except json.JSONDecodeError:
+                    in_info = None
+                if in_info is None:
+                    self.logger.error(
+                        "Received non-JSON output where JSON was expected "
+                        "for %s on node %s, %s",
+                        data["cmd"], data["hostname"], data["data"])
+                    return None
+
+        # EOS' HTTP returns errors like this.
+        if isinstance(in_info, dict):
+            tmp = in_info.get('data', [])
+            if tmp and tmp[0].get('errors', {}):
+                return None
+        return in_info
+
+    @staticmethod
+    def _is_large_output(data: List[Dict]) -> bool:
+        '''Is the raw output big enough to be processed in a thread'''
+        size = 0
+        for item in data:
+            raw = item.get('data', None)
+            if isinstance(raw, str):
+                size += len(raw)
+        return size > THREADED_PROCESSING_THRESHOLD
+
     def process_data(self, data):
         """Derive the data to be stored from the raw input"""
         result_list = []
@@ -471,10 +623,41 @@ class Service(SqPlugin):
             result_list.append(tmpres)
 
         if do_merge:
-            result = self.merge_results(result_list, data)
+            with self._phase_timer('normalize'):
+                result = self.merge_results(result_list, data)
         else:
             result = [ele for sublist in result_list for ele in sublist]
-        return self.clean_data(result, data)
+        with self._phase_timer('clean'):
+            result = self.clean_data(result, data)
+        return result
+
+    def _process_with_timers(self, data) -> Tuple[List, Dict[str, float]]:
+        """Process the data, timing each processing phase
+
+        Args:
+            data (List[Dict]): the outputs returned by the node
+
+        Returns:
+            Tuple[List, Dict[str, float]]: the processed data and the time
+                (ms) spent in each phase
+        """
+        self._phase_local.times = times = {}
+        try:
+            return self.process_data(data), times
+        finally:
+            self._phase_local.times = None
+
+    @contextmanager
+    def _phase_timer(self, phase: str) -> Iterator[None]:
+        '''Account the time spent in the block to a processing phase'''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            times = getattr(self._phase_local, 'times', None)
+            if times is not None:
+                times[phase] = (times.get(phase, 0) +
+                                (time.perf_counter() - start) * 1000)
 
     def get_key_flds(self):
         """Get the key fields associated with this service.
@@ -537,6 +720,27 @@ class Service(SqPlugin):
 
         return self.clean_data_common(processed_data, raw_data)
 
+    def _build_coerce_plan(self) -> List[Tuple]:
+        """Precompute how to coerce each schema field to its type
+
+        Returns:
+            List[Tuple]: for each field in the schema a tuple with the field
+                name, the value to use if the field is missing, the default
+                value, the python type and the python type of the elements
+                for list fields.
+        """
+        plan = []
+        def_vals = get_default_per_vals()
+        for fld in self.schema:
+            ptype = PTYPE_MAP.get(fld.type)
+            vtype = None
+            if ptype == list:
+                vtype = PTYPE_MAP.get(fld.type.value_type)
+            default = def_vals[fld.type]
+            missing = True if fld.name == 'active' else default
+            plan.append((fld.name, missing, default, ptype, vtype))
+        return plan
+
     def clean_data_common(self, processed_data, raw_data):
         """Fix the type and default value of of each extracted field
 
@@ -545,26 +749,6 @@ class Service(SqPlugin):
         Furthermore, each field is set to the specified type.
         """
 
-        # Build default data structure
-        schema_rec = {}
-        def_vals = get_default_per_vals()
-
-        ptype_map = {
-            pa.string(): str,
-            pa.int32(): int,
-            pa.int64(): int,
-            pa.float32(): float,
-            pa.float64(): float,
-            pa.date64(): float,
-            pa.list_(pa.string()): list,
-            pa.list_(pa.int64()): list,
-            pa.bool_(): bool,
-        }
-
-        for fld in self.schema:
-            default = def_vals[fld.type]
-            schema_rec.update({fld.name: default})
-
         if isinstance(raw_data, list):
             read_from = raw_data[0]
         else:
@@ -578,37 +762,34 @@ class Service(SqPlugin):
                 "timestamp": read_from["timestamp"],
                 "sqvers": self.version
             })
-            for fld, val in schema_rec.items():
+            for fld, missing, default, ptype, vtype in self._coerce_plan:
                 if fld not in entry:
-                    if fld == "active":
-                        entry.update({fld: True})
-                    else:
-                        entry.update({fld: val})
-                else:
-                    fld_type = self.schema.field(fld).type
-                    if not isinstance(entry[fld], ptype_map[fld_type]):
-                        try:
-                            entry[fld] = ptype_map[fld_type](entry[fld])
-                        except (ValueError, TypeError):
-                            entry[fld] = val
-                    elif isinstance(entry[fld], list):
-                        for i, ele in enumerate(entry[fld]):
-                            if not isinstance(ele,
-                                              ptype_map[fld_type.value_type]):
-                                try:
-                                    if ptype_map[fld_type.value_type] == int:
-                                        entry[fld][i] = int(entry[fld][i])
-                                    elif ptype_map[fld_type.value_type] == str:
-                                        entry[fld][i] = str(entry[fld][i])
-                                    else:
-                                        raise ValueError
-                                except (ValueError, TypeError):
-                                    entry[fld][i] = val
+                    entry[fld] = [] if ptype == list else missing
+                elif ptype and not isinstance(entry[fld], ptype):
+                    try:
+                        entry[fld] = ptype(entry[fld])
+                    except (ValueError, TypeError):
+                        entry[fld] = [] if ptype == list else default
+                elif vtype:
+                    fld_val = entry[fld]
+                    for i, ele in enumerate(fld_val):
+                        if not isinstance(ele, vtype):
+                            try:
+                                if vtype in (int, str):
+                                    fld_val[i] = vtype(ele)
+                                else:
+                                    raise ValueError
+                            except (ValueError, TypeError):
+                                fld_val[i] = []
         return processed_data
 
     async def commit_data(self, result: Dict, namespace: str, hostname: str,
-                          boot_timestamp: int):
-        """Write the result data out"""
+                          boot_timestamp: int) -> bool:
+        """Write the result data out
+
+        Returns:
+            bool: True if the data changed since the previous poll
+        """
         records = []
         key = f'{namespace}.{hostname}'
         prev_res = self.previous_results.get(key, None)
@@ -656,7 +837,8 @@ class Service(SqPlugin):
                 last_device_session = int(boot_timestamp)
                 self._node_boot_timestamps[key] = boot_timestamp
 
-            adds, dels = self.get_diff(prev_res, result, write_all)
+            with self._phase_timer('diff'):
+                adds, dels = self.get_diff(prev_res, result, write_all)
             if adds or dels:
                 self.previous_results[key] = copy.deepcopy(result)
                 for entry in adds:
@@ -681,7 +863,37 @@ class Service(SqPlugin):
                         })
                         records.append(entry)
 
-                self._post_work_to_writer(records)
+                with self._phase_timer('enqueue'):
+                    self._post_work_to_writer(records)
+                return True
+
+        return False
+
+    def get_poll_period(self, nodename: str, changed: bool) -> int:
+        """Return the period after which polling again the node.
+
+        If the service has a max period, the period of a node is doubled
+        every time a poll returns the same data of the previous one, up to
+        the max period, and it is set back to the service period as soon as
+        something changes.
+
+        Args:
+            nodename (str): the node to poll
+            changed (bool): whether the last poll returned new data
+
+        Returns:
+            int: the poll period in secs
+        """
+        if not self.max_period or self.max_period <= self.period:
+            return self.period
+
+        if changed:
+            period = self.period
+        else:
+            period = min(self._node_periods.get(nodename, self.period) * 2,
+                         self.max_period)
+        self._node_periods[nodename] = period
+        return period
 
     def _post_work_to_writer(self, records: dict):
         """This posts the data to be written to the worker queue"""
@@ -704,6 +916,7 @@ class Service(SqPlugin):
         stats.nodeQsize = []
         stats.wrQsize = []
         stats.rxBytes = []
+        stats.phase_time = {}
         stats.empty_count = 0
         stats.time_excd_count = 0
 
@@ -732,7 +945,8 @@ class Service(SqPlugin):
 
     def update_stats(self, stats: ServiceStats, total_time: int,
                      gather_time: int, qsize: int, wrQsize: int,
-                     nodeQsize: int, rxBytes) -> bool:
+                     nodeQsize: int, rxBytes,
+                     phase_times: Dict[str, float] = None) -> bool:
         """Update per-node stats"""
         write_stat = False
         now = int(time.time()*1000)
@@ -745,6 +959,9 @@ class Service(SqPlugin):
         stats.wrQsize = self.compute_basic_stats(stats.wrQsize, wrQsize)
         stats.nodeQsize = self.compute_basic_stats(stats.nodeQsize, nodeQsize)
         stats.rxBytes = self.compute_basic_stats(stats.rxBytes, rxBytes)
+        for phase, phase_time in (phase_times or {}).items():
+            stats.phase_time[phase] = self.compute_basic_stats(
+                stats.phase_time.get(phase), phase_time)
 
         if total_time > self.period*1000:
             stats.time_excd_count += 1
@@ -756,6 +973,32 @@ class Service(SqPlugin):
 
         return write_stat
 
+    def _update_phase_stats(self, devtype: Optional[str],
+                            phase_times: Dict[str, float]) -> None:
+        '''Update the processing times of the devtype'''
+        devtype_stats = self.phase_stats[devtype or 'unknown']
+        for phase, phase_time in phase_times.items():
+            devtype_stats[phase] = self.compute_basic_stats(
+                devtype_stats.get(phase), phase_time)
+
+    def _export_metrics(self, status: int, total_time: int, gather_time: int,
+                        rxBytes: int, phase_times: Dict[str, float]) -> None:
+        '''Update the metrics of the poll of a node, times are in ms'''
+        POLLS.inc(service=self.name, status=status)
+        POLL_TIME.observe(total_time/1000, service=self.name)
+        GATHER_TIME.observe(gather_time/1000, service=self.name)
+        RX_BYTES.inc(rxBytes, service=self.name)
+        for phase, phase_time in phase_times.items():
+            PHASE_TIME.observe(phase_time/1000, service=self.name,
+                               phase=phase)
+
+    def _get_write_time(self) -> List[float]:
+        '''Return [min, max, avg] of the recent write times of the table'''
+        times = (self.write_times or {}).get(self.name)
+        if not times:
+            return []
+        return [min(times), max(times), sum(times)/len(times)]
+
     def is_first_run(self, key: str) -> bool:
         '''Boolean indicating wether the current run
            is the first since the service is running.
@@ -789,11 +1032,16 @@ class Service(SqPlugin):
             self.logger.debug(f"Extracted response for {self.name} service")
             if isinstance(token, list):
                 token = token[0]
+            if token.nodename not in self.node_postcall_list:
+                # The node has been removed from the inventory
+                continue
             gather_time = int(time.time()*1000) - token.start_time
 
             status = HTTPStatus.NO_CONTENT        # Empty content
             write_poller_stat = False
             rxBytes = 0
+            changed = True  # If the data changed since the previous poll
+            phase_times = {}
 
             if output:
                 ostatus = [x.get('status', -1) for x in output]
@@ -849,7 +1097,14 @@ class Service(SqPlugin):
                     continue
 
                 try:
-                    result = self.process_data(output)
+                    if self._is_large_output(output):
+                        # Parse big outputs in a thread, so that the other
+                        # services can keep going in the meantime
+                        result, phase_times = await loop.run_in_executor(
+                            None, self._process_with_timers, output)
+                    else:
+                        result, phase_times = self._process_with_timers(
+                            output)
                 except Exception:  # pylint: disable=broad-except
                     result = []
                     status = HTTPStatus.BAD_GATEWAY
@@ -879,9 +1134,15 @@ class Service(SqPlugin):
                     continue
 
                 if should_commit:
-                    await self.commit_data(result, output[0]["namespace"],
-                                           output[0]["hostname"],
-                                           token.bootupTimestamp)
+                    self._phase_local.times = phase_times
+                    try:
+                        changed = await self.commit_data(
+                            result, output[0]["namespace"],
+                            output[0]["hostname"], token.bootupTimestamp)
+                    finally:
+                        self._phase_local.times = None
+                self._update_phase_stats(output[0].get('devtype'),
+                                         phase_times)
             elif self.run_once in ["gather", "process", "update"]:
                 total_nodes -= 1
                 if total_nodes <= 0:
@@ -892,14 +1153,23 @@ class Service(SqPlugin):
 
             total_time = int(time.time()*1000) - token.start_time
 
+            # Errors are retried with the service period
+            prev_period = self._node_periods.get(token.nodename, self.period)
+            period = self.get_poll_period(
+                token.nodename, changed or not self.is_status_ok(status))
+
             if output:
+                self._export_metrics(status, total_time, gather_time, rxBytes,
+                                     phase_times)
 
                 stats = pernode_stats[token.nodename]
                 write_poller_stat = (self.update_stats(
                     stats, total_time, gather_time, qsize,
-                    self.writer_queue.qsize(), token.nodeQsize, rxBytes) or
+                    self.writer_queue.qsize(), token.nodeQsize, rxBytes,
+                    phase_times) or
                     write_poller_stat or
-                    self.is_first_run(token.nodename))
+                    self.is_first_run(token.nodename) or
+                    period != prev_period)
                 pernode_stats[token.nodename] = stats
                 if write_poller_stat:
                     poller_stat = [
@@ -915,8 +1185,12 @@ class Service(SqPlugin):
                          "nodeQsize": stats.nodeQsize,
                          "rxBytes": stats.rxBytes,
                          "pollExcdPeriodCount": stats.time_excd_count,
+                         "pollPeriod": period,
                          "gatherTime": stats.gather_time,
                          "totalTime": stats.total_time,
+                         **{f'{phase}Time': stats.phase_time.get(phase, [])
+                            for phase in PROCESSING_PHASES},
+                         "writeTime": self._get_write_time(),
                          "version": SUZIEQ_VERSION,
                          "nodesPolledCnt": len(self.node_postcall_list),
                          "nodesFailedCnt": len(self._failed_node_set),
@@ -942,6 +1216,11 @@ class Service(SqPlugin):
                 continue
             self.logger.debug(
                 f"Rescheduling service for {self.name} service")
-            loop.call_later(self.period, self.call_node_postcmd,
-                            self.node_postcall_list.get(token.nodename),
-                            token.nodename)
+            if self.scheduler:
+                self.scheduler.reschedule(self.name, token.nodename,
+                                          period, self._start_poll,
+                                          self.low_priority)
+            else:
+                loop.call_later(period, self.call_node_postcmd,
+                                self.node_postcall_list.get(token.nodename),
+                                token.nodename)
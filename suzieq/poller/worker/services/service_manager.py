@@ -5,16 +5,18 @@ import asyncio
 import logging
 import os
 from collections import defaultdict
+from genericpath import isfile
 from pathlib import Path
 from time import struct_time
 from typing import Callable, Dict, List, Union
 
-import textfsm
 import yaml
-from genericpath import isfile
 from suzieq.db.base_db import SqDB
 
+from suzieq.poller.worker.services.poll_scheduler import PollScheduler
 from suzieq.poller.worker.services.service import Service
+from suzieq.poller.worker.services.textfsm_parser import (TextFSMParser,
+                                                          get_textfsm_parser)
 from suzieq.shared.exceptions import SqPollerConfError
 from suzieq.shared.schema import Schema, SchemaForTable
 
@@ -63,6 +65,15 @@ class ServiceManager:
         self.run_mode = run_mode
         self.cfg = cfg
         self.outputs = kwargs.pop('outputs', [])
+        # The recent write times of each table, shared with the writer
+        self.write_times = kwargs.pop('write_times', None)
+
+        # When polling forever, a single scheduler spreads the polls of all
+        # the services across their period
+        self.scheduler = None
+        if self.run_mode == 'forever':
+            self.scheduler = PollScheduler(
+                (cfg or {}).get('poller', {}).get('schedule-jitter', 0.1))
 
         # Set and validate service and schema directories
         if not os.path.isdir(service_directory):
@@ -272,6 +283,7 @@ class ServiceManager:
             )
             service.poller_schema = poller_schema
             service.poller_schema_version = poller_schema_version
+            self._set_service_options(service, svc_def)
             logger.info(f'Service {service.name} added')
             services.append(service)
 
@@ -279,6 +291,21 @@ class ServiceManager:
         self._services = services
         return self._services
 
+    def _set_service_options(self, service: Service, svc_def: Dict) -> None:
+        """Set the options of the service from its definition and the
+        settings shared by all the services of the worker
+
+        Args:
+            service (Service): the service to set up
+            svc_def (Dict): the content of the service definition file
+        """
+        service.stream_decode = svc_def.get('stream-decode', False)
+        service.scheduler = self.scheduler
+        service.low_priority = svc_def.get('priority') == 'low'
+        service.max_period = svc_def.get('max-period')
+        service.skip_unchanged = svc_def.get('skip-unchanged', False)
+        service.write_times = self.write_times
+
     async def schedule_services_run(self):
         """Schedule the services tasks in the poller, so that they can
         start sending command queries to the nodes.
@@ -288,6 +315,8 @@ class ServiceManager:
         """
         self._running_svcs = [svc.run() for svc in self.services]
         await self.add_task_fn(self._running_svcs)
+        if self.scheduler:
+            await self.add_task_fn([self.scheduler.run()])
 
     async def set_nodes(self, node_callq: Dict):
         """Set/Update the list of nodes to poll
@@ -300,6 +329,17 @@ class ServiceManager:
         for svc in self._services:
             await svc.set_nodes(node_callq)
 
+    def update_nodes(self, added: Dict, removed: List[str]):
+        """Update the list of nodes polled by the running services
+
+        Args:
+            added (Dict): for each 'namespace.hostname' of the nodes added,
+                the function allowing to call a query on the node
+            removed (List[str]): the 'namespace.hostname' of the nodes removed
+        """
+        for svc in self._services:
+            svc.update_node_list(added, removed)
+
     def _get_db_access(self, cfg) -> SqDB:
         """Return the SqDB to use to access to the state of the previous
         polls
@@ -388,7 +428,7 @@ class ServiceManager:
             # We may have already visited this element and parsed
             # the textfsm file. Check for this and in this case return
             if cmds_desc['textfsm'] and isinstance(
-                cmds_desc['textfsm'], textfsm.TextFSM
+                cmds_desc['textfsm'], TextFSMParser
             ) or (cmds_desc['textfsm'] is None):
                 return
 
@@ -400,9 +440,7 @@ class ServiceManager:
                 )
                 return
 
-            with open(tfsm_file, 'r') as f:
-                tfsm_template = textfsm.TextFSM(f)
-                cmds_desc['textfsm'] = tfsm_template
+            cmds_desc['textfsm'] = get_textfsm_parser(tfsm_file)
         if isinstance(cmds_desc['command'], list):
             # If the command description is a list of commands
             # we need to iterate over them
@@ -410,7 +448,7 @@ class ServiceManager:
                 if 'textfsm' in subelem:
                     # Check if the elemnt has been already visited
                     if subelem['textfsm'] and isinstance(
-                        subelem['textfsm'], textfsm.TextFSM
+                        subelem['textfsm'], TextFSMParser
                     ):
                         continue
 
@@ -423,13 +461,11 @@ class ServiceManager:
                         )
                         continue
 
-                    with open(tfsm_file, 'r') as f:
-                        try:
-                            tfsm_template = textfsm.TextFSM(f)
-                            subelem['textfsm'] = tfsm_template
-                        except Exception:  # pylint: disable=broad-except
-                            logger.exception(
-                                'Unable to load TextFSM file '
-                                f'{tfsm_file} for service '
-                                f"{svc_def['service']}")
-                            continue
+                    try:
+                        subelem['textfsm'] = get_textfsm_parser(tfsm_file)
+                    except Exception:  # pylint: disable=broad-except
+                        logger.exception(
+                            'Unable to load TextFSM file '
+                            f'{tfsm_file} for service '
+                            f"{svc_def['service']}")
+                        continue
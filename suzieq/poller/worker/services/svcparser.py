@@ -2,6 +2,8 @@ import re
 import ast
 import logging
 import operator as op
+from json import JSONDecodeError, JSONDecoder
+from json.decoder import scanstring
 
 # pylint: disable=too-many-nested-blocks, too-many-statements
 
@@ -513,6 +515,209 @@ def cons_recs_from_json_template(tmplt_str, in_data):
     return cleanup_and_return(result)
 
 
+class _NotStreamable(Exception):
+    """The JSON data does not have the structure expected by the template"""
+
+
+_JSON_WS = re.compile(r'[ \t\n\r]*')
+_JSON_SKIP = re.compile(r'"(?:[^"\\]|\\.)*"|[\[\]{}]')
+_json_decoder = JSONDecoder()
+
+
+def _get_stream_path(tmplt_str: str) -> list:
+    """Return the hierarchy of the template the JSON can be streamed along.
+
+    The JSON data can be split along the leading literal keys and the
+    wildcards of the template, as long as they don't need to look at the
+    sibling fields of the element. The returned list always ends with a
+    wildcard, whose elements are the unit of decoding. An empty list is
+    returned if the template cannot be streamed.
+    """
+    try:
+        ppos = re.search(r'/\[\s+', tmplt_str).start()
+    except AttributeError:
+        ppos = tmplt_str.find('[')
+    if ppos <= 0:
+        return []
+
+    path = []
+    last_wildcard = 0
+    for seg in tmplt_str[:ppos].split('/'):
+        if seg == '[0]':
+            path.append(('index', seg))
+        elif seg in ['*', '*?'] or (seg.startswith('*:') and
+                                    seg.count(':') == 1 and '|' not in seg):
+            path.append(('any', seg))
+            last_wildcard = len(path)
+        elif seg.startswith('*'):
+            # The wildcard elements use their own fields, decode them whole
+            path.append(('any', seg))
+            last_wildcard = len(path)
+            break
+        elif seg and ':' not in seg and not seg.startswith('['):
+            path.append(('key', seg))
+        else:
+            break
+
+    return path[:last_wildcard]
+
+
+def _skip_json_ws(json_str: str, idx: int) -> int:
+    return _JSON_WS.match(json_str, idx).end()
+
+
+def _skip_json_value(json_str: str, idx: int) -> int:
+    """Return the position after the JSON value starting at idx"""
+    if json_str[idx] not in '[{':
+        _, idx = _json_decoder.raw_decode(json_str, idx)
+        return idx
+
+    depth = 0
+    for match in _JSON_SKIP.finditer(json_str, idx):
+        token = match.group()
+        if token in '[{':
+            depth += 1
+        elif token in ']}':
+            depth -= 1
+            if not depth:
+                return match.end()
+    raise JSONDecodeError('Unterminated JSON value', json_str, idx)
+
+
+def _iter_json_members(json_str: str, idx: int):
+    """Iterate over an object or array, without decoding its members.
+
+    Yields the key (None for arrays) and the position of the value. The
+    consumer sends back the position after the value.
+    """
+    is_obj = json_str[idx] == '{'
+    close = '}' if is_obj else ']'
+    idx = _skip_json_ws(json_str, idx + 1)
+    if json_str[idx] == close:
+        return idx + 1
+
+    while True:
+        key = None
+        if is_obj:
+            if json_str[idx] != '"':
+                raise JSONDecodeError('Expecting property name', json_str,
+                                      idx)
+            key, idx = scanstring(json_str, idx + 1)
+            idx = _skip_json_ws(json_str, idx)
+            if json_str[idx] != ':':
+                raise JSONDecodeError("Expecting ':'", json_str, idx)
+            idx = _skip_json_ws(json_str, idx + 1)
+        idx = yield key, idx
+        idx = _skip_json_ws(json_str, idx)
+        if json_str[idx] == close:
+            return idx + 1
+        if json_str[idx] != ',':
+            raise JSONDecodeError("Expecting ','", json_str, idx)
+        idx = _skip_json_ws(json_str, idx + 1)
+
+
+def _stream_json_path(json_str: str, idx: int, path: list, keys: tuple):
+    """Yield the decoded elements of the last wildcard of the path together
+    with the keys of the containers walked to reach them.
+
+    Returns the position after the value starting at idx.
+    """
+    kind, seg = path[0]
+    container = json_str[idx]
+    if seg.startswith('*?'):
+        # '*?' marks a single element passed as a dict instead of a list
+        expected = '['
+    else:
+        expected = {'key': '{', 'index': '['}.get(kind, '[{')
+    if container not in expected:
+        raise _NotStreamable(seg)
+
+    members = _iter_json_members(json_str, idx)
+    found = False
+    try:
+        key, vidx = next(members)
+        pos = 0
+        while True:
+            if (kind == 'key' and key != seg) or (kind == 'index' and pos):
+                end = _skip_json_value(json_str, vidx)
+            elif len(path) > 1:
+                found = True
+                end = yield from _stream_json_path(
+                    json_str, vidx, path[1:], keys + ((container, key),))
+            else:
+                found = True
+                value, end = _json_decoder.raw_decode(json_str, vidx)
+                yield keys + ((container, key),), value
+            pos += 1
+            key, vidx = members.send(end)
+    except StopIteration as end:
+        if kind != 'any' and not found:
+            # The template parser handles missing keys in its own way
+            raise _NotStreamable(seg) from None
+        return end.value
+
+
+def _stream_json(json_str: str, path: list):
+    """Stream the elements along the path of the whole JSON string"""
+    idx = _skip_json_ws(json_str, 0)
+    idx = yield from _stream_json_path(json_str, idx, path, ())
+    if _skip_json_ws(json_str, idx) != len(json_str):
+        raise JSONDecodeError('Extra data', json_str, idx)
+
+
+def _build_json_tree(keys: tuple, batch: list):
+    """Rebuild the JSON hierarchy holding only the elements in the batch"""
+    container, _ = keys[-1]
+    if container == '{':
+        tree = dict(batch)
+    else:
+        tree = [x[1] for x in batch]
+
+    for container, key in reversed(keys[:-1]):
+        tree = {key: tree} if container == '{' else [tree]
+
+    return tree
+
+
+def cons_recs_from_json_stream(tmplt_str, json_str, batch_size=1000):
+    """Return an array of records given the template and the JSON string,
+    without decoding the whole JSON at once.
+
+    The JSON string is walked along the hierarchy of the template, and only
+    batch_size elements of the innermost usable wildcard are decoded at a
+    time. Each batch is rebuilt into a JSON hierarchy of its own and passed
+    to cons_recs_from_json_template(). Thus the decoded data in memory never
+    exceeds a batch, whatever the size of the output.
+
+    Returns None if the template or the data cannot be streamed, in which
+    case the caller is expected to decode the data the usual way.
+    """
+    path = _get_stream_path(tmplt_str)
+    if not path:
+        return None
+
+    result = []
+    batch = []
+    batch_keys = ()
+    try:
+        for keys, value in _stream_json(json_str, path):
+            if batch and (keys[:-1] != batch_keys[:-1] or
+                          len(batch) >= batch_size):
+                result.extend(cons_recs_from_json_template(
+                    tmplt_str, _build_json_tree(batch_keys, batch)))
+                batch = []
+            batch_keys = keys
+            batch.append((keys[-1][1], value))
+
+        if batch:
+            result.extend(cons_recs_from_json_template(
+                tmplt_str, _build_json_tree(batch_keys, batch)))
+    except (_NotStreamable, JSONDecodeError, IndexError):
+        return None
+
+    return result
+
+
 def cleanup_and_return(result):
     '''What it says: cleanup the result and return it'''
     for entry in result:
@@ -0,0 +1,88 @@
+"""
+This module contains the logic to build and cache the TextFSM parsers used
+by the services to structure the unstructured command outputs.
+"""
+import os
+from io import StringIO
+from queue import Empty, SimpleQueue
+from threading import Lock
+from typing import Dict, List
+
+import textfsm
+
+_parser_cache: Dict[str, 'TextFSMParser'] = {}
+_parser_cache_lock = Lock()
+
+
+class TextFSMParser:
+    """Reusable parser built from a TextFSM template file.
+
+    A TextFSM object keeps the parsing state inside itself, so it cannot be
+    used by two parsing tasks at the same time. This object keeps a pool of
+    compiled state machines built from the same template and hands out one
+    per parse, so that a single parser can be shared by many services and
+    can be safely used from worker threads.
+    """
+
+    def __init__(self, template_file: str):
+        self.template_file = template_file
+        with open(template_file, 'r') as f:
+            self._template = f.read()
+
+        # Compiling the template here also makes sure it is valid
+        fsm = self._compile()
+        self.header = fsm.header
+        self._pool = SimpleQueue()
+        self._pool.put(fsm)
+
+    def __str__(self) -> str:
+        return self.template_file
+
+    def _compile(self) -> textfsm.TextFSM:
+        return textfsm.TextFSM(StringIO(self._template))
+
+    def parse(self, raw_input: str) -> List[List]:
+        """Parse the given text with the template
+
+        Args:
+            raw_input (str): the unstructured output to parse
+
+        Returns:
+            List[List]: the list of the parsed entries, with the values in
+                the same order of the header
+        """
+        try:
+            fsm = self._pool.get_nowait()
+        except Empty:
+            # All the state machines are busy, create a new one, it will
+            # be returned to the pool once the parsing is done
+            fsm = self._compile()
+
+        try:
+            fsm.Reset()
+            return fsm.ParseText(raw_input)
+        finally:
+            self._pool.put(fsm)
+
+
+def get_textfsm_parser(template_file: str) -> TextFSMParser:
+    """Return the parser for the given template, creating it only the
+    first time the template is requested.
+
+    Args:
+        template_file (str): the path of the TextFSM template
+
+    Raises:
+        FileNotFoundError: if the template file does not exist
+        textfsm.TextFSMTemplateError: if the template is not valid
+
+    Returns:
+        TextFSMParser: the parser for the template
+    """
+    key = os.path.realpath(template_file)
+    with _parser_cache_lock:
+        parser = _parser_cache.get(key)
+        if not parser:
+            parser = TextFSMParser(template_file)
+            _parser_cache[key] = parser
+    return parser
@@ -0,0 +1,113 @@
+"""
+This module contains the server exposing the latest state polled by the
+worker, before it is written in the datastore.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+from aiohttp import web
+
+from suzieq.db.live.livedb import COMPLETE_HEADER
+from suzieq.poller.worker.services.service import Service
+
+logger = logging.getLogger(__name__)
+
+ARROW_CONTENT_TYPE = 'application/vnd.apache.arrow.stream'
+
+
+class StateServer:
+    """Serve the latest state of each table, i.e. the records the services
+    keep to compute the changes at every poll, on a Unix socket.
+
+    GET /tables returns the tables served, GET /state/<table> the records of
+    the table, as an Arrow stream or as JSON with ?format=json. The readers
+    should not rely on the state until the COMPLETE_HEADER is '1', i.e.
+    until every node of the worker was polled at least once.
+    """
+
+    def __init__(self, path: str, get_services: Callable[[], List[Service]]):
+        """Instantiate the server
+
+        Args:
+            path (str): the path of the Unix socket
+            get_services (Callable[[], List[Service]]): function returning
+                the services running in the worker
+        """
+        self.path = path
+        self._get_services = get_services
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        """Start listening on the socket"""
+        app = web.Application()
+        app.router.add_get('/tables', self._handle_tables)
+        app.router.add_get('/state/{table}', self._handle_state)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        if os.path.exists(self.path):
+            # Left behind by a previous run of the worker
+            os.remove(self.path)
+        await web.UnixSite(self._runner, self.path).start()
+        logger.info(f'Serving the latest state on {self.path}')
+
+    async def stop(self) -> None:
+        """Stop the server, removing the socket"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    async def _handle_tables(self, _) -> web.Response:
+        return web.json_response(
+            {svc.name: self._is_complete(svc)
+             for svc in self._get_services()})
+
+    async def _handle_state(self, request: web.Request) -> web.Response:
+        table = request.match_info['table']
+        svc = next((x for x in self._get_services() if x.name == table),
+                   None)
+        if not svc:
+            raise web.HTTPNotFound(text=f'{table} not polled')
+
+        # Take a snapshot, the services replace the records of a node
+        # instead of modifying them
+        records = [rec for node_recs in list(svc.previous_results.values())
+                   for rec in node_recs or []]
+        headers = {COMPLETE_HEADER: '1' if self._is_complete(svc) else '0'}
+        if request.query.get('format') == 'json':
+            return web.json_response(
+                records, headers=headers,
+                dumps=lambda x: json.dumps(x, default=str))
+
+        body = await asyncio.get_running_loop().run_in_executor(
+            None, self._to_arrow, records, svc.schema)
+        return web.Response(body=body, content_type=ARROW_CONTENT_TYPE,
+                            headers=headers)
+
+    @staticmethod
+    def _is_complete(svc: Service) -> bool:
+        return all(node in svc.previous_results
+                   for node in svc.node_postcall_list)
+
+    @staticmethod
+    def _to_arrow(records: List[Dict], schema: pa.Schema) -> bytes:
+        try:
+            table = pa.Table.from_pylist(records, schema=schema)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # The records read from the datastore at startup might not
+            # have the python types of the polled ones
+            df = pd.DataFrame(records, columns=schema.names)
+            table = pa.Table.from_pandas(df, schema=schema,
+                                         preserve_index=False, safe=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
@@ -10,13 +10,19 @@ import signal
 from typing import Dict, Type
 
 from suzieq.poller.worker.inventory.inventory import Inventory
+from suzieq.poller.worker.profiler import WorkerProfiler
 from suzieq.poller.worker.services.service_manager import ServiceManager
+from suzieq.poller.worker.state_server import StateServer
 from suzieq.poller.worker.writers.output_worker_manager \
     import OutputWorkerManager
-from suzieq.shared.exceptions import SqPollerConfError
+from suzieq.shared.exceptions import InventorySourceError, SqPollerConfError
+from suzieq.shared.metrics import REGISTRY, start_metrics_server
 
 logger = logging.getLogger(__name__)
 
+# How frequently the worker reports its load (in secs)
+LOAD_REPORT_INTERVAL = 30
+
 
 class Worker:
     """Worker is the object in charge of coordinating services, nodes and
@@ -36,6 +42,9 @@ class Worker:
         self.waiting_tasks = []
         self.waiting_tasks_lock = asyncio.Lock()
 
+        # Serializes the inventory updates signalled by the controller
+        self._inventory_lock = None
+
         # Setup poller writers
 
         # TODO: At the moment:
@@ -62,7 +71,8 @@ class Worker:
         svc_manager_args = {
             'service_only': userargs.service_only,
             'exclude_services': userargs.exclude_services,
-            'outputs': userargs.outputs
+            'outputs': userargs.outputs,
+            'write_times': self.output_manager.write_times
         }
         self.service_manager = ServiceManager(self._add_worker_tasks,
                                               service_dir,
@@ -76,6 +86,32 @@ class Worker:
         # Init the node inventory object
         self.inventory = self._init_inventory(userargs, cfg)
 
+        # Profile the worker on demand
+        self.profiler = WorkerProfiler(
+            cfg.get('temp-directory', '/tmp/'), self.worker_id,
+            lambda: self.service_manager.services)
+
+        # The controller exposes its metrics on the configured port, the
+        # workers on the following ones
+        self.metrics_cfg = cfg.get('poller', {})
+        self.metrics_server = None
+        REGISTRY.gauge('sq_poller_service_queue_size',
+                       'Outputs of the nodes waiting to be processed',
+                       ['service'],
+                       collect=lambda: {
+                           (svc.name,): svc.result_queue.qsize()
+                           for svc in self.service_manager.services})
+        REGISTRY.gauge('sq_poller_nodes', 'Nodes polled by the worker',
+                       collect=lambda: {(): len(self.inventory.nodes)})
+
+        # Serve the latest state of the tables on a local socket
+        self.state_server = None
+        state_dir = cfg.get('poller', {}).get('state-socket-dir')
+        if state_dir:
+            self.state_server = StateServer(
+                os.path.join(state_dir, f'worker_{self.worker_id}.sock'),
+                lambda: self.service_manager.services)
+
     async def init_worker(self):
         """Initialize the worker, instantiating the services and setting up
         the connection with the nodes. This function should be called only
@@ -91,6 +127,17 @@ class Worker:
         for s in [signal.SIGTERM, signal.SIGINT]:
             loop.add_signal_handler(
                 s, lambda s=s: asyncio.create_task(self._stop()))
+        loop.add_signal_handler(signal.SIGUSR1, self.profiler.trigger)
+        # The controller signals when the inventory of the worker changes
+        self._inventory_lock = asyncio.Lock()
+        loop.add_signal_handler(
+            signal.SIGHUP,
+            lambda: asyncio.create_task(self._update_inventory()))
+
+        self.metrics_server = start_metrics_server(
+            self.metrics_cfg, port_offset=int(self.worker_id) + 1)
+        if self.state_server:
+            await self.state_server.start()
 
         init_tasks = []
         init_tasks.append(self.inventory.build_inventory())
@@ -114,6 +161,8 @@ class Worker:
         if not services:
             raise SqPollerConfError('No services candidate for execution')
 
+        await self.inventory.ack_inventory()
+
     async def run(self):
         """Start polling the devices.
         Before running this function the worker should be initialized.
@@ -129,6 +178,8 @@ class Worker:
         await self.service_manager.schedule_services_run()
         await self._add_worker_tasks(
             [self.output_manager.run_output_workers()])
+        if self.service_manager.scheduler:
+            await self._add_worker_tasks([self._report_load()])
 
         try:
             # The logic below of handling the writer worker task separately
@@ -141,9 +192,13 @@ class Worker:
                     done, pending = await asyncio.wait(
                         tasks, return_when=asyncio.FIRST_COMPLETED)
                     for d in done:
-                        if d.exception():
+                        # The nodes removed from the inventory are cancelled
+                        if not d.cancelled() and d.exception():
                             raise d.exception()
-                    tasks = list(pending)
+                    # Pick up the tasks added in the meantime, like the
+                    # ones of the nodes added to the inventory
+                    tasks = list(pending) + \
+                        await self._pop_waiting_worker_tasks()
                     running_svcs = self.service_manager.running_services
                     if tasks and any(i._coro in running_svcs
                                      for i in tasks):
@@ -154,6 +209,35 @@ class Worker:
                     break
         except asyncio.CancelledError:
             logger.warning('Received terminate signal. Terminating...')
+        finally:
+            await self.inventory.close()
+
+    async def _report_load(self):
+        """Periodically report the load of the worker to the inventory
+        source, so that the controller can size the number of workers
+        """
+        while True:
+            await asyncio.sleep(LOAD_REPORT_INTERVAL)
+            load = {**self.service_manager.scheduler.load,
+                    'nodes': len(self.inventory.nodes)}
+            try:
+                await self.inventory.report_load(load)
+            except OSError as e:
+                logger.warning(f'Unable to report the worker load: {e}')
+
+    async def _update_inventory(self):
+        """Apply the changes of the inventory of the worker, polling the
+        new nodes and stopping the ones removed, without touching the others
+        """
+        async with self._inventory_lock:
+            try:
+                added, removed = await self.inventory.update_inventory()
+            except (InventorySourceError, SqPollerConfError) as e:
+                logger.error(f'Unable to update the inventory: {e}')
+                return
+            logger.info(f'Inventory updated: {len(added)} nodes added, '
+                        f'{len(removed)} removed')
+            self.service_manager.update_nodes(added, removed)
 
     async def _add_worker_tasks(self, tasks):
         """Add new tasks to be executed in the poller worker run loop."""
@@ -189,9 +273,28 @@ class Worker:
         # Define the dictionary with the settings
         # for any kind of inventory source
         connect_timeout = cfg.get('poller', {}).get('connect-timeout', 15)
+        jump_host_channels = cfg.get('poller', {}).get(
+            'jump-host-channels', 10)
+        rest_conn_per_host = cfg.get('poller', {}).get(
+            'rest-conns-per-host', 4)
+        rest_keepalive = cfg.get('poller', {}).get('rest-keepalive', 60)
+        # The identity of the nodes is cached across restarts, each worker
+        # in its own file
+        discovery_cache_file = None
+        discovery_cache_dir = cfg.get('poller', {}).get(
+            'discovery-cache-dir',
+            os.path.join(cfg.get('temp-directory', '/tmp/'),
+                         'suzieq-discovery'))
+        if discovery_cache_dir:
+            discovery_cache_file = os.path.join(
+                discovery_cache_dir, f'worker_{self.worker_id}.json')
         inventory_args = {
             'connect_timeout': connect_timeout,
             'ssh_config_file': userargs.ssh_config_file,
+            'jump_host_channels': jump_host_channels,
+            'rest_conn_per_host': rest_conn_per_host,
+            'rest_keepalive': rest_keepalive,
+            'discovery_cache_file': discovery_cache_file,
         }
 
         if addnl_args:
@@ -245,6 +348,11 @@ class Worker:
     async def _stop(self):
         """Stop the worker"""
 
+        if self.metrics_server:
+            self.metrics_server.stop()
+        if self.state_server:
+            await self.state_server.stop()
+
         tasks = [t for t in asyncio.all_tasks()
                  if t is not asyncio.current_task()]
 
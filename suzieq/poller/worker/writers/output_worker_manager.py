@@ -5,13 +5,24 @@ and running the OutputWorkers
 
 import asyncio
 import logging
-from typing import Dict, List
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, List
 
 from suzieq.poller.worker.writers.output_worker import OutputWorker
 from suzieq.shared.exceptions import SqPollerConfError
+from suzieq.shared.metrics import REGISTRY
 
 logger = logging.getLogger(__name__)
 
+# How many of the last writes of each table are kept for the stats
+WRITE_TIMES_HISTORY = 100
+
+WRITE_TIME = REGISTRY.histogram(
+    'sq_poller_write_seconds', 'Time to write a chunk of records', ['table'])
+WRITTEN_RECORDS = REGISTRY.counter(
+    'sq_poller_written_records_total', 'Records written', ['table'])
+
 
 class OutputWorkerManager:
     """OuputWorkerManager is the class in charge of
@@ -25,16 +36,28 @@ class OutputWorkerManager:
                  output_args: Dict[str, str]) -> None:
         self._output_queue = asyncio.Queue()
         self._output_workers = []
+        # The recent write times (ms) for each table
+        self._write_times: Dict[str, Deque[float]] = defaultdict(
+            lambda: deque(maxlen=WRITE_TIMES_HISTORY))
 
         self._output_types = output_types
         self._output_args = output_args
         self._init_output_workers()
 
+        REGISTRY.gauge('sq_poller_writer_queue_size',
+                       'Chunks of records waiting to be written',
+                       collect=lambda: {(): self._output_queue.qsize()})
+
     @property
     def output_queue(self):
         '''Queue between the poller and the writer'''
         return self._output_queue
 
+    @property
+    def write_times(self) -> Dict[str, Deque[float]]:
+        '''The time (ms) taken by the recent writes of each table'''
+        return self._write_times
+
     @property
     def output_types(self):
         '''Supported output formats'''
@@ -62,8 +85,16 @@ class OutputWorkerManager:
             if not self._output_workers:
                 return
 
+            start = time.perf_counter()
             for worker in self._output_workers:
                 worker.write_data(data)
+            if isinstance(data, dict):
+                write_time = time.perf_counter() - start
+                table = data.get('topic')
+                self._write_times[table].append(write_time * 1000)
+                WRITE_TIME.observe(write_time, table=table)
+                WRITTEN_RECORDS.inc(len(data.get('records') or []),
+                                    table=table)
 
     def _init_output_workers(self):
         """Create the appropriate output workers for persisting the
@@ -74,6 +105,6 @@ class OutputWorkerManager:
         for otype in self.output_types:
             if otype not in worker_types:
                 raise SqPollerConfError(f'{otype} is not a valid output '
-                                        f'pick some of {worker_types.keys()}')
+                                        f'pick some of {list(worker_types)}')
             new_worker = worker_types[otype](**self.output_args)
             self._output_workers.append(new_worker)
@@ -6,6 +6,7 @@ import inspect
 import logging
 import os
 import sys
+import time
 import uuid
 from enum import Enum
 from typing import List
@@ -17,6 +18,7 @@ from fastapi.security.api_key import APIKeyHeader, APIKeyQuery
 from starlette import status
 
 from suzieq.shared.exceptions import UserQueryError
+from suzieq.shared.metrics import REGISTRY, start_metrics_server
 from suzieq.shared.utils import (DATA_FORMATS, get_log_params, load_sq_config,
                                  print_version, sq_get_config_file)
 from suzieq.sqobjects import get_sqobject
@@ -41,6 +43,28 @@ app = FastAPI(on_startup=[check_config_file],
               redoc_url="/api/redoc")
 
 
+REQUESTS = REGISTRY.counter(
+    'sq_rest_requests_total', 'Requests served, per table, verb and status',
+    ['table', 'verb', 'status'])
+REQUEST_TIME = REGISTRY.histogram(
+    'sq_rest_request_seconds', 'Time to serve a request, per table and verb',
+    ['table', 'verb'])
+
+
+@app.middleware('http')
+async def export_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Use the matched route, not to create a label for each path requested
+    route = getattr(request.scope.get('route'), 'path', '')
+    table = route.split('/')[3] if route.startswith('/api/v2/') else ''
+    verb = request.path_params.get('verb', '') \
+        if response.status_code < 400 else ''
+    REQUESTS.inc(table=table, verb=verb, status=response.status_code)
+    REQUEST_TIME.observe(time.perf_counter() - start, table=table, verb=verb)
+    return response
+
+
 def app_init(cfg_file):
     '''This is the actual API initilaizer'''
     # pylint: disable=global-variable-not-assigned
@@ -167,6 +191,8 @@ def rest_main(*args) -> None:
 
     logcfg, loglevel = get_log_config_level(cfg)
 
+    start_metrics_server(cfg.get('rest', {}))
+
     no_https = cfg.get('rest', {}).get('no-https', False) or userargs.no_https
 
     srvr_addr = cfg.get('rest', {}).get('address', '127.0.0.1')
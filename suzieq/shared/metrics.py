@@ -0,0 +1,293 @@
+"""
+This module contains the metrics exported by the SuzieQ components in the
+Prometheus text format, and the HTTP server exposing them.
+
+Updating a metric costs a dictionary lookup, while the values which are
+cheap to read anyway, like the queue sizes, are collected only when the
+endpoint is scraped. Nothing runs when the endpoint is disabled or when
+nobody scrapes it.
+"""
+import logging
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Buckets of the histograms, in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5,
+                   5, 10, 30, 60, 120, 300)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Returns the values of a metric, by the values of its labels
+CollectFn = Callable[[], Dict[Tuple[str, ...], float]]
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str],
+                extra: str = '') -> str:
+    labels = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n') \
+        .replace('"', r'\"')
+
+
+def _fmt_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class Metric:
+    """Base class of the metrics"""
+
+    mtype = 'untyped'
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = (),
+                 collect: CollectFn = None):
+        """Instantiate the metric
+
+        Args:
+            name (str): the name of the metric
+            doc (str): the help string of the metric
+            labels (Sequence[str]): the names of the labels of the metric
+            collect (CollectFn): function returning the values of the metric
+                when it is scraped, instead of keeping them in the metric
+        """
+        self.name = name
+        self.doc = doc
+        self.labels = tuple(labels)
+        self._collect = collect
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(x, '')) for x in self.labels)
+
+    def samples(self) -> List[str]:
+        """Return the lines of the samples of the metric"""
+        if self._collect:
+            values = self._collect()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [f'{self.name}{_fmt_labels(self.labels, k)} {_fmt_value(v)}'
+                for k, v in sorted(values.items())]
+
+    def render(self) -> str:
+        """Return the metric in the Prometheus text format"""
+        return '\n'.join([f'# HELP {self.name} {self.doc}',
+                          f'# TYPE {self.name} {self.mtype}',
+                          *self.samples()])
+
+
+class Counter(Metric):
+    """A value which can only increase"""
+
+    mtype = 'counter'
+
+    def inc(self, value: float = 1, **labels) -> None:
+        """Increment the counter of the given labels"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+
+class Gauge(Metric):
+    """A value which can go up and down"""
+
+    mtype = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        """Set the value of the gauge of the given labels"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """The distribution of the observed values, in buckets"""
+
+    mtype = 'histogram'
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        """Add an observation to the histogram of the given labels"""
+        key = self._key(labels)
+        with self._lock:
+            hist = self._values.get(key)
+            if hist is None:
+                # [count per bucket..., count above the last bucket, sum]
+                hist = self._values[key] = [0] * (len(self.buckets) + 2)
+            hist[bisect_left(self.buckets, value)] += 1
+            hist[-1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = {k: list(v) for k, v in self._values.items()}
+        lines = []
+        for key, hist in sorted(values.items()):
+            count = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),),
+                                           hist):
+                count += bucket_count
+                labels = _fmt_labels(self.labels, key,
+                                     f'le="{_fmt_value(bound)}"')
+                lines.append(f'{self.name}_bucket{labels} {count}')
+            labels = _fmt_labels(self.labels, key)
+            lines.append(f'{self.name}_count{labels} {count}')
+            lines.append(f'{self.name}_sum{labels} {_fmt_value(hist[-1])}')
+        return lines
+
+
+class MetricsRegistry:
+    """The collection of the metrics exported by a process"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, doc: str, labels: Sequence[str] = (),
+                collect: CollectFn = None) -> Counter:
+        """Return the counter with the given name, creating it if needed"""
+        return self._register(Counter, name, doc, labels, collect=collect)
+
+    def gauge(self, name: str, doc: str, labels: Sequence[str] = (),
+              collect: CollectFn = None) -> Gauge:
+        """Return the gauge with the given name, creating it if needed"""
+        return self._register(Gauge, name, doc, labels, collect=collect)
+
+    def histogram(self, name: str, doc: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Return the histogram with the given name, creating it if needed"""
+        return self._register(Histogram, name, doc, labels, buckets=buckets)
+
+    def _register(self, metric_class, name, doc, labels, **kwargs) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if not metric:
+                metric = metric_class(name, doc, labels, **kwargs)
+                self._metrics[name] = metric
+            elif kwargs.get('collect'):
+                # The last component registering the metric provides it
+                # pylint: disable=protected-access
+                metric._collect = kwargs['collect']
+            return metric
+
+    def render(self) -> str:
+        """Return all the metrics in the Prometheus text format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        text = []
+        for metric in metrics:
+            try:
+                text.append(metric.render())
+            except Exception:  # pylint: disable=broad-except
+                logger.exception(f'Unable to collect metric {metric.name}')
+        return '\n'.join(text) + '\n'
+
+
+# The registry of the metrics of this process
+REGISTRY = MetricsRegistry()
+
+# The metrics updated by several components of the poller
+CACHE_LOOKUPS = REGISTRY.counter(
+    'sq_poller_cache_lookups_total', 'Lookups in the caches of the poller',
+    ['cache', 'result'])
+
+
+class MetricsServer:
+    """The HTTP server exposing the metrics on /metrics. It runs in its own
+    thread, so that it can be used by both the asyncio and the synchronous
+    components.
+    """
+
+    def __init__(self, address: str, port: int,
+                 registry: MetricsRegistry = REGISTRY):
+        """Instantiate the server
+
+        Args:
+            address (str): the address to listen on
+            port (int): the port to listen on, 0 to pick a free one
+            registry (MetricsRegistry): the metrics to expose
+        """
+        self.address = address
+        self.port = port
+        self.registry = registry
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self) -> None:
+        """Start listening for the scrapes"""
+        registry = self.registry
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):  # pylint: disable=invalid-name
+                """Reply to a scrape with the current metrics"""
+                if self.path.split('?')[0] not in ['/', '/metrics']:
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_):
+                # Do not log every scrape
+                pass
+
+        self._server = ThreadingHTTPServer((self.address, self.port),
+                                           _Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever,
+                         name='sq-metrics', daemon=True).start()
+        logger.info(f'Metrics exposed on {self.address}:{self.port}')
+
+    def stop(self) -> None:
+        """Stop the server"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def start_metrics_server(cfg: Dict, port_offset: int = 0) \
+        -> Optional[MetricsServer]:
+    """Start the metrics endpoint of a component, if enabled in its section
+    of the configuration via metrics-port
+
+    Args:
+        cfg (Dict): the section of the SuzieQ config of the component
+        port_offset (int): added to the configured port, when the component
+            runs with several processes
+
+    Returns:
+        Optional[MetricsServer]: the server started, None if not enabled or
+            if it was not possible to start it
+    """
+    port = cfg.get('metrics-port')
+    if not port:
+        return None
+    server = MetricsServer(cfg.get('metrics-address', '127.0.0.1'),
+                           int(port) + port_offset)
+    try:
+        server.start()
+    except OSError as e:
+        logger.error(f'Unable to start the metrics endpoint on port '
+                     f'{server.port}: {e}')
+        return None
+    return server
@@ -5,10 +5,48 @@
 import os
 import logging
 import json
-from typing import List, Dict, Optional
+import threading
+from typing import Any, Callable, List, Dict, Optional, Tuple
 import pyarrow as pa
 
 
+class _CompiledSchemas:
+    """The schemas of a schema directory, parsed once per process and
+    shared by all the Schema objects. The values derived from the schemas
+    are computed on first use and cached. Nothing must modify them.
+    """
+
+    def __init__(self, schemas: Dict, phy_tables: Dict, types: Dict):
+        self.schemas = schemas
+        self.phy_tables = phy_tables
+        self.types = types
+        self.field_names = {table: tuple(f['name'] for f in fields)
+                            for table, fields in schemas.items()}
+        # Like the schemas, the first definition of a field wins
+        self.fields = {}
+        for table, fields in schemas.items():
+            tbl_fields = self.fields[table] = {}
+            for f in fields:
+                tbl_fields.setdefault(f['name'], f)
+        self._cache: Dict[Tuple, Any] = {}
+
+    def get(self, key: Tuple, fn: Callable[[], Any]) -> Any:
+        """Return the value cached with key, computing it with fn if not
+        cached yet
+        """
+        try:
+            return self._cache[key]
+        except KeyError:
+            value = self._cache[key] = fn()
+            return value
+
+
+# The compiled schemas, by schema directory and modification time of the
+# schema files
+_compiled_schemas: Dict[Tuple, _CompiledSchemas] = {}
+_compiled_lock = threading.Lock()
+
+
 class Schema:
     '''Schema class holding schemas of all tables and providing ops on them'''
 
@@ -21,31 +59,45 @@ class Schema:
     def _init_schemas(self, schema_dir: str):
         """Returns the schema definition which is the fields of a table"""
 
-        schemas = {}
-        phy_tables = {}
-        types = {}
-
         logger = logging.getLogger(__name__)
         if not (schema_dir and os.path.exists(schema_dir)):
             logger.error(
                 "Schema directory %s does not exist", schema_dir)
             raise ValueError(f"Schema directory {schema_dir} does not exist")
 
-        for root, _, files in os.walk(schema_dir):
-            for topic in files:
-                if not topic.endswith(".avsc"):
-                    continue
-                with open(root + "/" + topic, "r") as f:
-                    data = json.loads(f.read())
-                    table = data["name"]
-                    schemas[table] = data["fields"]
-                    types[table] = data.get('recordType', 'record')
-                    phy_tables[data["name"]] = data.get("physicalTable", table)
-            break
-
-        self._schema = schemas
-        self._phy_tables = phy_tables
-        self._types = types
+        # Parse the schema files only the first time and whenever any of
+        # them changes
+        topics = sorted((e.name, e.stat().st_mtime_ns, e.stat().st_size)
+                        for e in os.scandir(schema_dir)
+                        if e.is_file() and e.name.endswith(".avsc"))
+        key = (os.path.realpath(schema_dir), tuple(topics))
+        with _compiled_lock:
+            compiled = _compiled_schemas.get(key)
+            if not compiled:
+                compiled = self._compile_schemas(schema_dir, topics)
+                _compiled_schemas[key] = compiled
+
+        self._compiled = compiled
+        self._schema = compiled.schemas
+        self._phy_tables = compiled.phy_tables
+        self._types = compiled.types
+
+    @staticmethod
+    def _compile_schemas(schema_dir: str,
+                         topics: List[Tuple]) -> _CompiledSchemas:
+        schemas = {}
+        phy_tables = {}
+        types = {}
+
+        for topic, _, _ in topics:
+            with open(schema_dir + "/" + topic, "r") as f:
+                data = json.loads(f.read())
+                table = data["name"]
+                schemas[table] = data["fields"]
+                types[table] = data.get('recordType', 'record')
+                phy_tables[data["name"]] = data.get("physicalTable", table)
+
+        return _CompiledSchemas(schemas, phy_tables, types)
 
     def tables(self) -> List[str]:
         '''Returns list of tables for which we have schemas'''
@@ -53,7 +105,7 @@ class Schema:
 
     def fields_for_table(self, table: str) -> List[str]:
         '''Returns list of fields in given table'''
-        return [f['name'] for f in self._schema[table]]
+        return list(self._compiled.field_names[table])
 
     def get_raw_schema(self, table: str) -> Dict:
         '''Raw schema for given table, JSON'''
@@ -61,10 +113,7 @@ class Schema:
 
     def field_for_table(self, table: str, field: str) -> Optional[str]:
         '''Returns info about field in table if present'''
-        for f in self._schema[table]:
-            if f['name'] == field:
-                return f
-        return None
+        return self._compiled.fields[table].get(field)
 
     def type_for_table(self, table: str) -> str:
         '''Return table type: counter, record, derived etc.'''
@@ -111,36 +160,47 @@ class Schema:
                                         table: str,
                                         getall: bool = False) -> List[str]:
         '''Returns sorted list of default display fields'''
-        display_fields = self._sort_fields_for_table(table, 'display', getall)
-        return [f for f in display_fields
-                if not self.field_for_table(table, f).get('suppress', False)]
+        def _display_fields():
+            display_fields = self._sort_fields_for_table(table, 'display',
+                                                         getall)
+            return tuple(
+                f for f in display_fields
+                if not self.field_for_table(table, f).get('suppress', False))
+
+        return list(self._compiled.get(('display', table, getall),
+                                       _display_fields))
 
     def _sort_fields_for_table(self,
                                table: str,
                                tag: str,
                                getall: bool = False) -> List[str]:
         '''Returns sorted list of fields in table with given tag'''
-        fields = self.fields_for_table(table)
-        field_weights = {}
-        for f_name in fields:
-            field = self.field_for_table(table, f_name)
-            if field.get(tag, None) is not None:
-                field_weights[f_name] = field.get(tag, 1000)
-            elif getall:
-                field_weights[f_name] = 1000
-        return list(sorted(field_weights.keys(),
-                           key=lambda x: field_weights[x]))
+        def _sort_fields():
+            field_weights = {}
+            for f_name in self._compiled.field_names[table]:
+                field = self.field_for_table(table, f_name)
+                if field.get(tag, None) is not None:
+                    field_weights[f_name] = field.get(tag, 1000)
+                elif getall:
+                    field_weights[f_name] = 1000
+            return tuple(sorted(field_weights.keys(),
+                                key=lambda x: field_weights[x]))
+
+        return list(self._compiled.get(('sort', table, tag, getall),
+                                       _sort_fields))
 
     def array_fields_for_table(self, table: str) -> List[str]:
         '''Returns list of fields which are lists in table'''
-        fields = self.fields_for_table(table)
-        arrays = []
-        for f_name in fields:
-            field = self.field_for_table(table, f_name)
-            if (isinstance(field['type'], dict) and
-                    field['type'].get('type', None) == 'array'):
-                arrays.append(f_name)
-        return arrays
+        def _array_fields():
+            arrays = []
+            for f_name in self._compiled.field_names[table]:
+                field = self.field_for_table(table, f_name)
+                if (isinstance(field['type'], dict) and
+                        field['type'].get('type', None) == 'array'):
+                    arrays.append(f_name)
+            return tuple(arrays)
+
+        return list(self._compiled.get(('array', table), _array_fields))
 
     def get_phy_table_for_table(self, table: str) -> Optional[str]:
         """Return the name of the underlying physical table"""
@@ -156,7 +216,11 @@ class Schema:
 
     def get_arrow_schema(self, table: str) -> pa.schema:
         """Convert internal AVRO schema into PyArrow schema"""
+        # Arrow schemas are immutable, they can be shared
+        return self._compiled.get(('arrow', table),
+                                  lambda: self._build_arrow_schema(table))
 
+    def _build_arrow_schema(self, table: str) -> pa.schema:
         avro_sch = self._schema.get(table, None)
         if not avro_sch:
             raise AttributeError(f"No schema found for {table}")
@@ -204,16 +268,13 @@ class Schema:
 
     def get_parent_fields(self, table: str, field: str) -> List[str]:
         '''Get list of fields this augmented field depends upon'''
-        avro_sch = self._schema.get(table, None)
-        if not avro_sch:
+        fields = self._compiled.fields.get(table, None)
+        if not fields:
             raise AttributeError(f"No schema found for {table}")
 
-        for fld in avro_sch:
-            if fld['name'] == field:
-                if "depends" in fld:
-                    return fld['depends'].split()
-                else:
-                    return []
+        fld = fields.get(field)
+        if fld and "depends" in fld:
+            return fld['depends'].split()
         return []
 
 
@@ -1,16 +1,79 @@
 """
 This module contains all the common logic of
 the Suzieq plugins
+
+Discovering the plugins requires importing all the modules of the package
+where they are searched. In order to pay this only once, the discovered
+plugins are cached as {'plugin name': 'module:Class'} in the file set in the
+SQ_PLUGIN_CACHE environment variable (by default ~/.cache/suzieq/plugins.json)
+and they are imported only when accessed. Set SQ_PLUGIN_CACHE to an empty
+string to disable the cache. The cache of a package is rebuilt whenever any
+of its modules is modified.
 """
 
+import json
+import logging
+import os
+from collections.abc import MutableMapping
 from importlib import import_module
 from importlib.util import find_spec
 from inspect import getmembers, getmro, isclass
 from pkgutil import iter_modules
-from typing import Dict, Type
+from typing import Dict, Iterator, List, Optional, Type, Union
 
 from suzieq.shared.utils import get_sq_install_dir
 
+logger = logging.getLogger(__name__)
+
+# The environment variable with the path of the plugin cache
+PLUGIN_CACHE_ENV = 'SQ_PLUGIN_CACHE'
+
+# The content of the plugin cache, loaded at the first use
+_plugin_cache: Optional[Dict[str, Dict]] = None
+
+
+class LazyPlugins(MutableMapping):
+    """The plugins discovered by SqPlugin.get_plugins(). It behaves like a
+    dictionary {'plugin name': PluginClass}, but the module of a plugin is
+    imported only when the plugin is accessed.
+    """
+
+    def __init__(self, plugins: Dict[str, Union[str, Type]]):
+        """Instantiate the plugin dictionary
+
+        Args:
+            plugins (Dict[str, Union[str, Type]]): the plugins, either the
+                classes or their 'module:Class' reference
+        """
+        self._plugins = dict(plugins)
+
+    def __getitem__(self, name: str) -> Type:
+        plugin = self._plugins[name]
+        if isinstance(plugin, str):
+            mname, cname = plugin.split(':')
+            plugin = getattr(import_module(mname), cname)
+            self._plugins[name] = plugin
+        return plugin
+
+    def __setitem__(self, name: str, plugin: Type):
+        self._plugins[name] = plugin
+
+    def __delitem__(self, name: str):
+        del self._plugins[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._plugins)
+
+    def __len__(self) -> int:
+        return len(self._plugins)
+
+    def __contains__(self, name) -> bool:
+        # Do not import the plugin only to know if it exists
+        return name in self._plugins
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({list(self._plugins)})'
+
 
 class SqPlugin:
     """SqPlugin is the base common class inherited by all the
@@ -25,7 +88,9 @@ class SqPlugin:
                     plugin_name: str = None,
                     search_pkg: str = None) -> Dict[str, Type]:
         """Discover all the plugins in the search_pkg package, inheriting
-        the current base class.
+        the current base class. The modules of the plugins are imported
+        only when they are accessed, if the plugins of the package are in
+        the plugin cache.
 
         Args:
             plugin_name (str): The name of a specific plugin to extract
@@ -40,17 +105,42 @@ class SqPlugin:
                 the descendants of the base class in the search_pkg,
                 with format {'module name': PluginClass}
         """
-        classes = {}
-
         if not search_pkg:
             search_pkg = '.'.join(cls.__module__.split('.')[:-1])
 
-        # Collect the list of packages where to search
-        sq_install_dir = '/'.join(get_sq_install_dir().split('/')[:-1])
+        cache = _get_plugin_cache()
+        key = f'{cls.__module__}.{cls.__qualname__}@{search_pkg}'
+        fingerprint = _get_fingerprint(search_pkg)
+        entry = cache.get(key)
+        if not entry or entry.get('fingerprint') != fingerprint:
+            if plugin_name:
+                # Importing all the plugins to find only one might cost
+                # more than looking for it directly
+                return LazyPlugins(cls._find_plugins(plugin_name, search_pkg))
+            classes = cls._find_plugins(None, search_pkg)
+            entry = {'fingerprint': fingerprint,
+                     'plugins': {name: f'{pcls.__module__}:{pcls.__name__}'
+                                 for name, pcls in classes.items()}}
+            _update_plugin_cache(key, entry)
+            return LazyPlugins(classes)
+
+        plugins = entry['plugins']
+        if plugin_name:
+            plugins = {plugin_name: plugins[plugin_name]} \
+                if plugin_name in plugins else {}
+        return LazyPlugins(plugins)
 
-        search_path = (f"{sq_install_dir}/{search_pkg.replace('.', '/')}")
+    @classmethod
+    def _find_plugins(cls, plugin_name: Optional[str],
+                      search_pkg: str) -> Dict[str, Type]:
+        """Import the modules in search_pkg to find the plugins, see
+        get_plugins() for the arguments
+        """
+        classes = {}
+
+        # Collect the list of packages where to search
         packages = [f'{search_pkg}.{m.name}'
-                    for m in iter_modules([search_path])
+                    for m in iter_modules([_get_pkg_path(search_pkg)])
                     if m.ispkg]
         if not packages:
             packages.append(search_pkg)
@@ -89,3 +179,81 @@ class SqPlugin:
                 break
 
         return classes
+
+
+def _get_pkg_path(pkg: str) -> str:
+    sq_install_dir = '/'.join(get_sq_install_dir().split('/')[:-1])
+    return f"{sq_install_dir}/{pkg.replace('.', '/')}"
+
+
+def _get_fingerprint(search_pkg: str) -> List[List]:
+    """Return the name, modification time and size of the modules where
+    the plugins of search_pkg are searched, without importing them
+    """
+    fingerprint = []
+    search_path = _get_pkg_path(search_pkg)
+    try:
+        pkg_dirs = sorted(e.path for e in os.scandir(search_path)
+                          if e.is_dir()
+                          and os.path.exists(f'{e.path}/__init__.py'))
+        for pkg_dir in pkg_dirs or [search_path]:
+            for mod in sorted(os.scandir(pkg_dir), key=lambda x: x.name):
+                if mod.name.startswith('_') or not mod.name.endswith('.py'):
+                    continue
+                stat = mod.stat()
+                fingerprint.append([os.path.relpath(mod.path, search_path),
+                                    stat.st_mtime_ns, stat.st_size])
+    except OSError:
+        pass
+    return fingerprint
+
+
+def _get_cache_file() -> Optional[str]:
+    cache_file = os.environ.get(PLUGIN_CACHE_ENV)
+    if cache_file is None:
+        cache_dir = os.environ.get('XDG_CACHE_HOME') or \
+            os.path.expanduser('~/.cache')
+        cache_file = os.path.join(cache_dir, 'suzieq', 'plugins.json')
+    return cache_file or None
+
+
+def _read_cache_file(cache_file: Optional[str]) -> Dict[str, Dict]:
+    if not cache_file:
+        return {}
+    try:
+        with open(cache_file, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def _get_plugin_cache() -> Dict[str, Dict]:
+    global _plugin_cache  # pylint: disable=global-statement
+    if _plugin_cache is None:
+        _plugin_cache = _read_cache_file(_get_cache_file())
+    return _plugin_cache
+
+
+def _update_plugin_cache(key: str, entry: Dict) -> None:
+    """Store the plugins of a package in the cache, both in memory and in
+    the cache file
+    """
+    _get_plugin_cache()[key] = entry
+    cache_file = _get_cache_file()
+    if not cache_file:
+        return
+
+    # Other processes might have updated other packages in the meantime
+    cache = _read_cache_file(cache_file)
+    cache[key] = entry
+    tmp_file = f'{cache_file}.{os.getpid()}'
+    try:
+        os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+        with open(tmp_file, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logger.debug(f'Unable to write the plugin cache {cache_file}: {e}')
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
@@ -3,20 +3,24 @@ import fcntl
 import getpass
 import json
 import logging
+import operator
 import os
 import platform
 import re
+import socket
 import sys
 from datetime import datetime
 from enum import Enum
+from functools import reduce
 from importlib.util import find_spec
-from ipaddress import ip_network
+from ipaddress import ip_address, ip_network
 from itertools import groupby
 from logging.handlers import RotatingFileHandler
 from os import getenv
 from time import time
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
 import psutil
 import pyarrow as pa
@@ -607,6 +611,380 @@ def validate_network(network: str) -> bool:
         return False
 
 
+def _pack_ip(addr: Any) -> bytes:
+    """Return the IP version, the 16 bytes of the address and the prefix
+    length (255 if missing), empty if the address is not valid
+    """
+    if not isinstance(addr, str):
+        return b''
+    addr, _, prefixlen = addr.partition('/')
+    try:
+        if ':' in addr:
+            packed = b'\x06' + socket.inet_pton(socket.AF_INET6,
+                                                addr.split('%')[0])
+        else:
+            packed = b'\x04' + bytes(12) + \
+                socket.inet_pton(socket.AF_INET, addr)
+        if not prefixlen:
+            return packed + b'\xff'
+        if prefixlen.isdigit() and int(prefixlen) < 255:
+            return packed + bytes([int(prefixlen)])
+    except OSError:
+        pass
+    return b''
+
+
+def _parse_ipv4(chars: np.ndarray) \
+        -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Parse the IPv4 addresses, with an optional prefix length, encoded
+    as a matrix of ASCII characters, a row per address, with vectorized
+    operations on the whole matrix.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: the addresses, the
+            prefix lengths (-1 if missing) and if the address is valid
+    """
+    n = chars.shape[0]
+    valid = np.ones(n, dtype=bool)
+    # The longest valid address is 255.255.255.255/255
+    max_width = 19
+    if chars.shape[1] > max_width:
+        valid &= ~chars[:, max_width:].any(axis=1)
+    # A row per character position, the reductions on the first axis are
+    # much faster
+    chars = np.ascontiguousarray(chars[:, :max_width].T)
+
+    is_digit = (chars >= ord('0')) & (chars <= ord('9'))
+    is_dot = chars == ord('.')
+    is_slash = chars == ord('/')
+    valid &= (is_digit | is_dot | is_slash | (chars == 0)).all(axis=0)
+    valid &= ((is_dot.sum(axis=0, dtype=np.int8) == 3) &
+              (is_slash.sum(axis=0, dtype=np.int8) <= 1))
+    has_prefix = is_slash.any(axis=0)
+    # The index of the field of each character, the prefix length is the
+    # fifth field and the slash must follow the three dots
+    field = np.cumsum(is_dot | is_slash, axis=0, dtype=np.int8)
+    valid &= ~(is_slash & (field != 4)).any(axis=0)
+
+    # The weight of each digit depends on the digits following it
+    next1 = np.zeros_like(is_digit)
+    next1[:-1] = is_digit[1:]
+    next2 = np.zeros_like(is_digit)
+    next2[:-2] = is_digit[2:]
+    num = np.where(is_digit, chars - np.uint8(ord('0')), 0) \
+        .astype(np.int16) * \
+        np.where(next1, np.where(next2, 100, 10), 1).astype(np.int16)
+
+    value = np.zeros(n, dtype=np.uint64)
+    prefixlen = np.full(n, -1, dtype=np.int64)
+    for fld in range(5):
+        in_fld = is_digit & (field == fld)
+        ndigits = in_fld.sum(axis=0, dtype=np.int8)
+        fval = (num * in_fld).sum(axis=0, dtype=np.int64)
+        good_len = (ndigits >= 1) & (ndigits <= 3)
+        if fld < 4:
+            valid &= good_len & (fval <= 255)
+            value = (value << np.uint64(8)) | fval.astype(np.uint64)
+        else:
+            valid &= np.where(has_prefix, good_len, ndigits == 0)
+            prefixlen = np.where(has_prefix, fval, -1)
+    return value, prefixlen, valid
+
+
+def _parse_ips(addrs: Union[pd.Series, np.ndarray, List]) \
+        -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Parse the IP addresses, see ip_to_int_pairs(). In addition to the
+    values returned by ip_to_int_pairs(), it returns the prefix lengths,
+    -1 when missing, not checked against the address family
+    """
+    values = np.asarray(addrs, dtype=object)
+    n = len(values)
+    hi = np.zeros(n, dtype=np.uint64)
+    lo = np.zeros(n, dtype=np.uint64)
+    is_v6 = np.zeros(n, dtype=bool)
+    valid = np.zeros(n, dtype=bool)
+    prefixlen = np.full(n, -1, dtype=np.int64)
+    if not n:
+        return hi, lo, is_v6, valid, prefixlen
+
+    try:
+        chars = values.astype('S')
+        chars = chars.view(np.uint8).reshape(n, -1)
+        slow = (chars == ord(':')).any(axis=1)
+    except (UnicodeEncodeError, ValueError, TypeError):
+        # Not ASCII strings, parse them one by one
+        chars = None
+        slow = np.ones(n, dtype=bool)
+
+    if chars is not None and not slow.all():
+        fast = ~slow
+        lo[fast], prefixlen[fast], valid[fast] = _parse_ipv4(chars[fast])
+
+    if slow.any():
+        # Each distinct address is parsed only once
+        codes, uniques = pd.factorize(values[slow])
+        packed = [_pack_ip(x) for x in uniques] + [b'']
+        ok = np.fromiter((len(x) == 18 for x in packed), dtype=bool,
+                         count=len(packed))
+        buf = b''.join(x if len(x) == 18 else bytes(18) for x in packed)
+        recs = np.frombuffer(buf, dtype=np.uint8).reshape(-1, 18)
+        words = recs[:, 1:17].copy().view('>u8').astype(np.uint64)
+        plens = recs[:, 17].astype(np.int64)
+        # Missing values get the code -1, i.e. the last empty record
+        codes[codes < 0] = len(packed) - 1
+        hi[slow] = words[codes, 0]
+        lo[slow] = words[codes, 1]
+        is_v6[slow] = recs[codes, 0] == 6
+        valid[slow] = ok[codes]
+        prefixlen[slow] = np.where(plens[codes] == 255, -1, plens[codes])
+
+    return hi, lo, is_v6, valid, prefixlen
+
+
+def ip_to_int_pairs(addrs: Union[pd.Series, np.ndarray, List]) \
+        -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Convert the IPv4 and IPv6 addresses into pairs of integers, the high
+    and low 64 bits of the address, which can be compared with vectorized
+    operations. IPv4 addresses are stored in the low 32 bits.
+
+    The IPv4 addresses are parsed with vectorized operations, the IPv6 ones
+    are parsed once per distinct address. The prefix length and the scope
+    of the address, if any, are ignored.
+
+    Args:
+        addrs (Union[pd.Series, np.ndarray, List]): the addresses
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: the high
+            and low 64 bits of the addresses (uint64), if the addresses are
+            IPv6 and if they are valid addresses (bool)
+    """
+    return _parse_ips(addrs)[:4]
+
+
+def _prefix_masks(prefixlen: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the high and low 64 bits of the masks of the 128 bits prefix
+    lengths
+    """
+    full = np.uint64(0xFFFFFFFFFFFFFFFF)
+    prefixlen = np.asarray(prefixlen, dtype=np.int64)
+    hi_shift = np.clip(64 - prefixlen, 0, 63).astype(np.uint64)
+    lo_shift = np.clip(128 - prefixlen, 0, 63).astype(np.uint64)
+    hi_mask = np.where(prefixlen <= 0, np.uint64(0),
+                       np.where(prefixlen >= 64, full, full << hi_shift))
+    lo_mask = np.where(prefixlen <= 64, np.uint64(0),
+                       np.where(prefixlen >= 128, full, full << lo_shift))
+    return hi_mask.astype(np.uint64), lo_mask.astype(np.uint64)
+
+
+def _explode_values(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Flatten a series of lists, returning the values and the position in
+    the series of the list of each value
+    """
+    lists = [x if isinstance(x, (list, np.ndarray)) else []
+             for x in values]
+    lengths = np.fromiter((len(x) for x in lists), dtype=np.int64,
+                          count=len(lists))
+    flat = np.concatenate([np.asarray(x, dtype=object) for x in lists]) \
+        if lengths.sum() else np.array([], dtype=object)
+    return flat, np.repeat(np.arange(len(lists)), lengths)
+
+
+def _any_by_position(mask: np.ndarray, positions: np.ndarray,
+                     size: int) -> np.ndarray:
+    return np.bincount(positions, weights=mask, minlength=size) > 0
+
+
+def addrs_in_subnet(addrs: pd.Series, net: str) -> pd.Series:
+    """Check which of the addresses belong to the given subnet. If the
+    series contains lists of addresses, check if any of the addresses of
+    the list belongs to the subnet
+
+    Args:
+        addrs (pd.Series): the addresses to check, with or without the
+            prefix length
+        net (str): the IP network to check the addresses against
+
+    Returns:
+        pd.Series: the mask of the addresses in the subnet
+    """
+    network = ip_network(net)
+    if addrs.empty:
+        return pd.Series([], index=addrs.index, dtype=bool)
+
+    is_list = isinstance(addrs.iloc[0], (list, np.ndarray))
+    if is_list:
+        values, positions = _explode_values(addrs)
+    else:
+        values = addrs.values
+
+    hi, lo, is_v6, valid = ip_to_int_pairs(values)
+    net_hi, net_lo, _, _ = ip_to_int_pairs([str(network.network_address)])
+    prefixlen = network.prefixlen + (96 if network.version == 4 else 0)
+    hi_mask, lo_mask = _prefix_masks(np.array([prefixlen]))
+    mask = (valid & (is_v6 == (network.version == 6)) &
+            ((hi & hi_mask) == net_hi) & ((lo & lo_mask) == net_lo))
+
+    if is_list:
+        mask = _any_by_position(mask, positions, len(addrs))
+    return pd.Series(mask, index=addrs.index)
+
+
+def addr_in_subnets(addr: str, nets: pd.Series) -> pd.Series:
+    """Check if the address belongs to any of the subnets in the series.
+    The subnets are addresses with the prefix length, like the ones in the
+    interface address lists. 0.0.0.0/0 is never matched.
+
+    Args:
+        addr (str): the address to check
+        nets (pd.Series): the subnets, or the lists of subnets
+
+    Returns:
+        pd.Series: the mask of the subnets containing the address
+    """
+    ip_address(addr)  # raises ValueError if not a valid address
+    if nets.empty:
+        return pd.Series([], index=nets.index, dtype=bool)
+
+    is_list = isinstance(nets.iloc[0], (list, np.ndarray))
+    if is_list:
+        values, positions = _explode_values(nets)
+    else:
+        values = nets.values
+
+    net_hi, net_lo, net_v6, valid, prefixlen = _parse_ips(values)
+    valid &= prefixlen <= np.where(net_v6, 128, 32)
+    prefixlen = np.where(prefixlen < 0, np.where(net_v6, 128, 32),
+                         prefixlen)
+    prefixlen += np.where(net_v6, 0, 96)
+    hi_mask, lo_mask = _prefix_masks(prefixlen)
+
+    hi, lo, is_v6, _ = ip_to_int_pairs([addr])
+    mask = (valid & (net_v6 == is_v6) & (values != '0.0.0.0/0') &
+            ((hi & hi_mask) == (net_hi & hi_mask)) &
+            ((lo & lo_mask) == (net_lo & lo_mask)))
+
+    if is_list:
+        mask = _any_by_position(mask, positions, len(nets))
+    return pd.Series(mask, index=nets.index)
+
+
+class PrefixIndex:
+    """Index of the prefixes of one or more routing tables, to find the
+    longest prefix matching many addresses at once.
+
+    The prefixes are kept sorted by address family, prefix length and
+    network, so the prefixes of the same length are like a level of a
+    trie. An address is looked up in every level present in the index,
+    with a binary search vectorized over all the addresses.
+    """
+
+    def __init__(self, prefixes: Union[pd.Series, np.ndarray, List],
+                 tables: Optional[np.ndarray] = None):
+        """Build the index
+
+        Args:
+            prefixes (Union[pd.Series, np.ndarray, List]): the prefixes,
+                the ones which are not valid are ignored
+            tables (Optional[np.ndarray]): the routing table of each prefix,
+                as integer codes like the ones returned by pd.factorize().
+                All the prefixes are in the same table if not specified
+        """
+        hi, lo, is_v6, valid, prefixlen = _parse_ips(prefixes)
+        maxlen = np.where(is_v6, 128, 32)
+        valid &= prefixlen <= maxlen
+        prefixlen = np.where(prefixlen < 0, maxlen, prefixlen)
+        if tables is None:
+            tables = np.zeros(len(hi), dtype=np.int64)
+
+        rows = np.flatnonzero(valid)
+        is_v6 = is_v6[rows]
+        # The IPv4 prefixes are stored in the low 32 bits
+        length = prefixlen[rows] + np.where(is_v6, 0, 96)
+        keys = self._make_keys(hi[rows], lo[rows], is_v6, length)
+        # Stable, the first of the identical prefixes comes first
+        order = np.argsort(keys, kind='stable')
+        self._keys = keys[order]
+        self._rows = rows[order]
+        self._tables = np.asarray(tables)[rows][order]
+        self._lengths = length[order]
+        self._levels = sorted(set(zip(is_v6[order].tolist(),
+                                      self._lengths.tolist())))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @staticmethod
+    def _make_keys(hi: np.ndarray, lo: np.ndarray, is_v6: np.ndarray,
+                   length: np.ndarray) -> np.ndarray:
+        """Return the family, the length and the network of the prefixes
+        as byte strings, sorted like the prefixes
+        """
+        hi_mask, lo_mask = _prefix_masks(length)
+        recs = np.empty((len(hi), 18), dtype=np.uint8)
+        recs[:, 0] = np.where(is_v6, 6, 4)
+        recs[:, 1] = length
+        recs[:, 2:10] = (hi & hi_mask).astype('>u8').view(np.uint8) \
+            .reshape(-1, 8)
+        recs[:, 10:] = (lo & lo_mask).astype('>u8').view(np.uint8) \
+            .reshape(-1, 8)
+        return recs.view('S18').ravel()
+
+    def lookup(self, addrs: Union[pd.Series, np.ndarray, List]) \
+            -> Tuple[np.ndarray, np.ndarray]:
+        """Find the longest prefix matching each address in each routing
+        table. Of identical prefixes in a table, only the first matches.
+
+        Args:
+            addrs (Union[pd.Series, np.ndarray, List]): the addresses, the
+                ones which are not valid do not match any prefix
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: the position of the addresses
+                and of the prefixes matching them, sorted by address and
+                prefix position
+        """
+        hi, lo, is_v6, valid = ip_to_int_pairs(addrs)
+        addr_pos = []
+        matches = []
+        for v6, length in self._levels:
+            pos = np.flatnonzero(valid & (is_v6 == v6))
+            if not pos.size:
+                continue
+            keys = self._make_keys(hi[pos], lo[pos],
+                                   np.full(pos.size, v6),
+                                   np.full(pos.size, length))
+            start = np.searchsorted(self._keys, keys, side='left')
+            count = np.searchsorted(self._keys, keys, side='right') - start
+            total = count.sum()
+            if not total:
+                continue
+            # The positions of all the prefixes between start and end
+            addr_pos.append(np.repeat(pos, count))
+            matches.append(np.arange(total) +
+                           np.repeat(start - np.cumsum(count) + count,
+                                     count))
+
+        if not matches:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        addr_pos = np.concatenate(addr_pos)
+        matches = np.concatenate(matches)
+
+        # Keep the longest prefix for each address and table
+        order = np.lexsort((matches, -self._lengths[matches],
+                            self._tables[matches], addr_pos))
+        addr_pos = addr_pos[order]
+        tables = self._tables[matches[order]]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = ((addr_pos[1:] != addr_pos[:-1]) |
+                     (tables[1:] != tables[:-1]))
+        addr_pos = addr_pos[first]
+        rows = self._rows[matches[order][first]]
+
+        order = np.lexsort((rows, addr_pos))
+        return addr_pos[order], rows[order]
+
+
 def validate_macaddr(macaddr: str) -> bool:
     """Validate mac address
 
@@ -804,6 +1182,113 @@ def build_query_str(skip_fields: List, schema: SchemaForTable,
     return ' and '.join(all_filters)
 
 
+def build_query_mask(df: pd.DataFrame, skip_fields: List,
+                     schema: SchemaForTable, ignore_regex=True,
+                     **kwargs) -> pd.Series:
+    """Build the mask of the rows of the dataframe matching the given
+    key/val pairs. The filters are the same of build_query_str(), but they
+    are evaluated directly on the columns, without building a query string
+    pandas needs to parse, which is slow with long lists of values.
+
+    Args:
+        df (pd.DataFrame): the dataframe to filter
+        skip_fields (List): the fields we don't want to include in the query
+        schema (SchemaForTable): the schema of the table where to apply the
+            query.
+        ignore_regex (bool, optional): Ignore all the fields containing a
+            regex among the filters. Defaults to True.
+
+    Returns:
+        pd.Series: the boolean mask of the rows matching the filters
+    """
+    num_ops = {'<=': operator.le, '>=': operator.ge,
+               '<': operator.lt, '>': operator.gt}
+
+    def _number(val: Any) -> Any:
+        return pd.to_numeric(val.strip()) if isinstance(val, str) else val
+
+    def _number_mask(col: pd.Series, fval: Any) -> pd.Series:
+        if isinstance(fval, str):
+            for op, op_fn in num_ops.items():
+                if fval.startswith(op):
+                    return op_fn(col, _number(fval[len(op):]))
+        return col == _number(fval)
+
+    num_types = ['long', 'float', 'int']
+    mask = pd.Series(True, index=df.index)
+    if df.empty:
+        return mask
+
+    for field, filter_vals in kwargs.items():
+        match_masks = []
+        not_mask = pd.Series(True, index=df.index)
+        # Check the skip conditions before proceeding
+        if not filter_vals or field in skip_fields or field in ['groupby']:
+            continue
+
+        field_info = schema.field(field)
+        if not field_info:
+            logger.warning(f'The field {field} does not belong to the schema')
+            continue
+
+        ftype = field_info.get('type', 'string')
+        if not isinstance(filter_vals, list):
+            filter_vals = [filter_vals]
+        col = df[field]
+
+        if ftype in num_types:
+            i = 0
+            while i < len(filter_vals):
+                fval = filter_vals[i]
+                if isinstance(fval, str) and fval.startswith('!'):
+                    not_mask &= col != _number(fval[1:])
+                elif (isinstance(fval, str) and fval.startswith('>')
+                        and i+1 < len(filter_vals)
+                        and isinstance(filter_vals[i+1], str)
+                        and filter_vals[i+1].startswith('<')):
+                    # A sequence of > and < is an interval
+                    match_masks.append(_number_mask(col, fval) &
+                                       _number_mask(col, filter_vals[i+1]))
+                    i += 1
+                else:
+                    match_masks.append(_number_mask(col, fval))
+                i += 1
+        else:
+            if ignore_regex and any(f for f in filter_vals
+                                    if isinstance(f, str)
+                                    and f.startswith(('~', '!~'))):
+                continue
+
+            values = []
+            not_values = []
+            for fval in filter_vals:
+                # Like in the query string, the values are compared as
+                # strings
+                fval = str(fval)
+                if fval.startswith('!~'):
+                    not_mask &= ~col.str.fullmatch(re.compile(fval[2:]),
+                                                   na=False)
+                elif fval.startswith('~'):
+                    match_masks.append(
+                        col.str.fullmatch(re.compile(fval[1:]), na=False))
+                elif fval.startswith('!'):
+                    not_values.append(fval[1:])
+                else:
+                    values.append(fval)
+            # A single isin() is much faster than a comparison per value
+            if values:
+                match_masks.append(col.isin(values))
+            if not_values:
+                not_mask &= ~col.isin(not_values)
+
+        if match_masks:
+            mask &= reduce(operator.or_, match_masks) & not_mask
+        else:
+            mask &= not_mask
+
+    return mask
+
+
 def poller_log_params(cfg: dict, is_controller=False, worker_id=0) -> tuple:
     """Get the log file, level and size for the given program from config
     It gets the base file name of the configuration file and appends a prefix
@@ -925,8 +1410,15 @@ def humanize_timestamp(field: pd.Series, tz=None) -> pd.Series:
     if pd.core.dtypes.common.is_datetime64_any_dtype(field):
         return field
     tz = tz or get_localzone().zone
-    return field.apply(lambda x: datetime.utcfromtimestamp((int(x)/1000))) \
-                .dt.tz_localize('UTC').dt.tz_convert(tz)
+    # Convert the whole column at once, truncating to the millisecond as
+    # int() would do. Missing values become NaT.
+    values = pd.to_numeric(field, errors='coerce')
+    valid = values.notna()
+    tstamps = pd.to_datetime(values.where(valid, 0).astype('int64'),
+                             unit='ms', utc=True)
+    if not valid.all():
+        tstamps = tstamps.where(valid)
+    return tstamps.dt.tz_convert(tz)
 
 
 def expand_nxos_ifname(ifname: str) -> str:
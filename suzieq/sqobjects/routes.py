@@ -36,17 +36,19 @@ class RoutesObj(SqObject):
         return super().validate_get_input(**kwargs)
 
     def lpm(self, **kwargs) -> pd.DataFrame:
-        '''Get the lpm for the given address'''
+        '''Get the lpm for the given address, or for each of the addresses
+        of the list'''
         kwargs.pop('ignore_warning', None)
         columns = kwargs.pop('columns', self.columns)
         if not kwargs.get("address", None):
             raise AttributeError('ip address is mandatory parameter')
-        if isinstance(kwargs['address'], list):
-            if len(kwargs['address']) > 1:
-                raise AttributeError('Just one address at a time')
+        if isinstance(kwargs['address'], list) and \
+                len(kwargs['address']) == 1:
             kwargs['address'] = kwargs['address'][0]
         result = self.engine.lpm(**kwargs, columns=columns)
         if self._is_result_empty(result):
             fields = self._get_empty_cols(columns, 'lpm')
+            if isinstance(kwargs['address'], list):
+                fields = ['address'] + fields
             return self._empty_result(fields)
         return result
@@ -15,6 +15,7 @@ from dataclasses import asdict
 
 import pandas as pd
 
+from suzieq.shared.metrics import REGISTRY, start_metrics_server
 from suzieq.shared.utils import (ensure_single_instance, get_log_params,
                                  get_sleep_time, init_logger, load_sq_config,
                                  log_suzieq_info)
@@ -22,6 +23,18 @@ from suzieq.shared.schema import Schema, SchemaForTable
 from suzieq.db import do_coalesce, get_sqdb_engine
 from suzieq.version import SUZIEQ_VERSION
 
+COALESCE_TIME = REGISTRY.histogram(
+    'sq_coalescer_seconds', 'Time to coalesce a table', ['table'])
+COALESCED_FILES = REGISTRY.counter(
+    'sq_coalescer_written_files_total', 'Files written coalescing a table',
+    ['table'])
+COALESCED_RECORDS = REGISTRY.counter(
+    'sq_coalescer_written_records_total',
+    'Records written coalescing a table', ['table'])
+COALESCER_RUNS = REGISTRY.counter(
+    'sq_coalescer_runs_total', 'Runs of the coalescer, per result',
+    ['result'])
+
 
 def validate_periodstr(periodstr: str) -> Tuple[bool, str]:
     '''Validate the period string specified by user'''
@@ -94,6 +107,14 @@ def run_coalescer(cfg: dict, tables: List[str], periodstr: str, run_once: bool,
                 cfg, tables, periodstr, logger, no_sqpoller)
         except Exception:
             logger.exception('Coalescer aborted. Continuing')
+            COALESCER_RUNS.inc(result='error')
+        else:
+            COALESCER_RUNS.inc(
+                result='error' if current_exception else 'ok')
+        for stat in stats:
+            COALESCE_TIME.observe(stat.execTime, table=stat.service)
+            COALESCED_FILES.inc(stat.fileCount, table=stat.service)
+            COALESCED_RECORDS.inc(stat.recCount, table=stat.service)
         # Write the selftats
         if stats:
             df = pd.DataFrame([asdict(x) for x in stats])
@@ -214,6 +235,8 @@ def coalescer_main():
     else:
         tables = []
 
+    start_metrics_server(cfg.get('coalescer', {}))
+
     try:
         run_coalescer(cfg, tables, timestr, userargs.run_once,
                       logger, userargs.no_sqpoller or False)
@@ -0,0 +1,6 @@
+import os
+
+# The tests must not write the plugin cache of the user. Importing suzieq
+# already looks up the plugins, so the cache is disabled till the session
+# fixture in conftest moves it to a temporary directory.
+os.environ['SQ_PLUGIN_CACHE'] = ''
@@ -49,6 +49,16 @@ cli_commands = [(v.__command['name'])
 TABLES = [t for t in get_tables() if t not in ['topmem', 'topcpu']]
 
 
+@pytest.fixture(scope='session', autouse=True)
+def plugin_cache(tmp_path_factory):
+    '''Keep the plugin cache, of the processes run by the tests as well, in
+    a temporary directory'''
+    cache_file = tmp_path_factory.mktemp('plugin_cache') / 'plugins.json'
+    os.environ['SQ_PLUGIN_CACHE'] = str(cache_file)
+    yield cache_file
+    os.environ['SQ_PLUGIN_CACHE'] = ''
+
+
 @pytest.fixture(scope='session')
 def get_cmd_object_dict() -> Dict:
     '''Get dict of command to cli_command object'''
@@ -1,3 +1,6 @@
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
 import pytest
 from suzieq.poller.controller.chunker.static import StaticChunker
 from suzieq.shared.exceptions import SqPollerConfError
@@ -86,3 +89,97 @@ def test_unknown_policy():
     with pytest.raises(SqPollerConfError, match="Unknown chunking policy "
                        "unknown-policy"):
         StaticChunker({'policy': 'unknown-policy'})
+
+
+def _get_fake_sqobject(poll_df: pd.DataFrame, dev_df: pd.DataFrame):
+    """Return a fake get_sqobject returning the given sqPoller and device
+    tables
+    """
+    def get_sqobject(table: str):
+        df = poll_df if table == 'sqPoller' else dev_df
+        return MagicMock(return_value=MagicMock(
+            get=MagicMock(return_value=df.copy())))
+    return get_sqobject
+
+
+@pytest.mark.poller
+@pytest.mark.controller
+@pytest.mark.poller_unit_tests
+@pytest.mark.controller_unit_tests
+@pytest.mark.controller_chunker
+@pytest.mark.controller_chunker_static
+def test_split_cost():
+    """Test the devices are split according to their polling cost
+    """
+    devices = {'core1': 'eos', 'core2': 'eos', 'acc1': 'cumulus',
+               'acc2': 'cumulus', 'core3': 'eos'}
+    glob_inv = {f'ns.10.0.0.{i}.22': {'namespace': 'ns',
+                                      'address': f'10.0.0.{i}',
+                                      'devtype': devtype}
+                for i, devtype in enumerate(devices.values())}
+    # core3 has no history yet
+    dev_df = pd.DataFrame([
+        {'namespace': 'ns', 'hostname': host, 'address': f'10.0.0.{i}',
+         'devtype': devtype}
+        for i, (host, devtype) in enumerate(list(devices.items())[:-1])])
+    poll_df = pd.DataFrame([
+        {'namespace': 'ns', 'hostname': host, 'service': svc,
+         'totalTime': [0, 0, total_time], 'rxBytes': [0, 0, rx_bytes],
+         'pollPeriod': 60}
+        for host, total_time, rx_bytes in [('core1', 9000, 900000),
+                                           ('core2', 9000, 900000),
+                                           ('acc1', 100, 1000),
+                                           ('acc2', 100, 1000)]
+        for svc in ['routes', 'bgp']])
+
+    ch = StaticChunker({'policy': 'cost'})
+    with patch('suzieq.poller.controller.chunker.static.get_sqobject',
+               _get_fake_sqobject(poll_df, dev_df)):
+        chunks = ch.chunk(glob_inv, 2)
+
+    assert [list(c) for c in chunks] == [
+        ['ns.10.0.0.0.22', 'ns.10.0.0.4.22'],
+        ['ns.10.0.0.1.22', 'ns.10.0.0.2.22', 'ns.10.0.0.3.22']]
+
+    # Without history the devices are weighted by devtype
+    ch = StaticChunker({'policy': 'cost', 'devtype-cost': {'eos': 10}})
+    with patch('suzieq.poller.controller.chunker.static.get_sqobject',
+               _get_fake_sqobject(pd.DataFrame(), pd.DataFrame())):
+        chunks = ch.chunk(glob_inv, 3)
+
+    assert [list(c) for c in chunks] == [
+        ['ns.10.0.0.0.22', 'ns.10.0.0.2.22'],
+        ['ns.10.0.0.1.22', 'ns.10.0.0.3.22'], ['ns.10.0.0.4.22']]
+
+
+@pytest.mark.poller
+@pytest.mark.controller
+@pytest.mark.poller_unit_tests
+@pytest.mark.controller_unit_tests
+@pytest.mark.controller_chunker
+@pytest.mark.controller_chunker_static
+def test_split_cost_update():
+    """Test an inventory change only places the new devices and moves the
+    devices of the unbalanced chunks
+    """
+    def _inventory(devices):
+        return {f'dev{i}': {'namespace': 'ns', 'address': f'10.0.0.{i}',
+                            'devtype': 'eos'}
+                for i in devices}
+
+    ch = StaticChunker({'policy': 'cost'})
+    with patch('suzieq.poller.controller.chunker.static.get_sqobject',
+               _get_fake_sqobject(pd.DataFrame(), pd.DataFrame())):
+        chunks = ch.chunk(_inventory(range(6)), 2)
+        assert [list(c) for c in chunks] == [['dev0', 'dev2', 'dev4'],
+                                             ['dev1', 'dev3', 'dev5']]
+
+        # The second chunk lost all its devices, dev0 moves to balance it
+        chunks = ch.chunk(_inventory([0, 2, 4, 6]), 2)
+        assert [list(c) for c in chunks] == [['dev2', 'dev4'],
+                                             ['dev0', 'dev6']]
+
+        # A new device does not move the others
+        chunks = ch.chunk(_inventory([0, 2, 4, 6, 7]), 2)
+        assert [list(c) for c in chunks] == [['dev2', 'dev4', 'dev7'],
+                                             ['dev0', 'dev6']]
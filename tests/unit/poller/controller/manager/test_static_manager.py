@@ -5,6 +5,7 @@
 # pylint: disable=redefined-outer-name
 
 import asyncio
+import hashlib
 import os
 from contextlib import suppress
 from pathlib import Path
@@ -16,7 +17,7 @@ import pytest
 import yaml
 import suzieq.poller.controller.manager.static as static_manager_module
 from suzieq.poller.controller.manager.static import StaticManager
-from suzieq.shared.exceptions import PollingError
+from suzieq.shared.exceptions import PollingError, SqPollerConfError
 from suzieq.shared.utils import load_sq_config
 from tests.conftest import create_dummy_config_file, get_async_task_mock
 from tests.unit.poller.shared.utils import get_random_node_list
@@ -113,6 +114,32 @@ def get_fake_process(fut: asyncio.Future, returncode: int = 0) -> MagicMock:
     return fake_process
 
 
+def get_acking_process(inv_path: Path, poller_id: int,
+                       signaled: List[int]) -> MagicMock:
+    """Generate a fake running worker acknowledging the inventory updates,
+    as the real workers do
+
+    Args:
+        inv_path (Path): the directory of the inventory files
+        poller_id (int): the id of the worker
+        signaled (List[int]): where to append the id of the worker when it
+            is signaled
+
+    Returns:
+        MagicMock: the fake process
+    """
+    def apply_inventory(_):
+        signaled.append(poller_id)
+        inv_data = (inv_path / f'inv_{poller_id}.yml').read_text()
+        (inv_path / f'applied_{poller_id}').write_text(
+            hashlib.sha256(inv_data.encode()).hexdigest())
+
+    worker = get_fake_process(None, None)
+    worker.send_signal.side_effect = apply_inventory
+    (inv_path / f'applied_{poller_id}').write_text('')
+    return worker
+
+
 def init_static_manager(manager_cfg: Dict,
                         args: Dict = MANAGER_ARGS) -> StaticManager:
     """Init the static manager
@@ -288,6 +315,175 @@ async def test_inventory_changes_apply(monkeypatch, manager_cfg):
         write_chunk_fn.assert_any_call(i, c)
 
 
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.controller
+@pytest.mark.controller_manager
+@pytest.mark.controller_manager_static
+@pytest.mark.asyncio
+async def test_inventory_changes_signal(monkeypatch, manager_cfg):
+    """Check the running workers apply the inventory changes without being
+    restarted, the removals before the additions
+    """
+    fake_environ = {}
+    monkeypatch.setattr(os, 'environ', fake_environ)
+
+    manager_args = MANAGER_ARGS.copy()
+    manager_args['workers'] = 2
+    manager = init_static_manager(manager_cfg, manager_args)
+    inv_path = manager._inventory_path
+
+    signaled = []
+    _, _, chunk1 = get_random_node_list(20)
+    _, _, chunk2 = get_random_node_list(20)
+    launch_fn = get_async_task_mock()
+    with patch.object(StaticManager, '_launch_poller', launch_fn):
+        await manager.apply([chunk1, chunk2])
+        for i in range(2):
+            manager._running_workers[i] = get_acking_process(
+                inv_path, i, signaled)
+        launch_fn.reset_mock()
+
+        # Move a device from the second worker to the first one
+        moved = list(chunk2)[0]
+        chunk1 = {**chunk1, moved: chunk2[moved]}
+        chunk2 = {k: v for k, v in chunk2.items() if k != moved}
+        await manager.apply([chunk1, chunk2])
+
+    launch_fn.assert_not_called()
+    assert signaled == [1, 0]
+    assert manager._active_chunks == [chunk1, chunk2]
+    assert manager._poller_tasks_ready.is_set()
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.controller
+@pytest.mark.controller_manager
+@pytest.mark.controller_manager_static
+def test_autoscale_sizing(monkeypatch, manager_cfg):
+    """Check the number of workers is sized on the inventory and on the
+    load reported by the workers
+    """
+    fake_environ = {}
+    monkeypatch.setattr(os, 'environ', fake_environ)
+
+    manager_args = {**MANAGER_ARGS, 'workers': 'auto', 'max-workers': 4,
+                    'devices-per-worker': 10}
+    manager = init_static_manager(manager_cfg, manager_args)
+    inv_path = manager._inventory_path
+
+    assert manager.get_n_workers({i: {} for i in range(25)}) == 3
+    assert manager.get_n_workers({i: {} for i in range(100)}) == 4
+    assert manager.get_n_workers({i: {} for i in range(1)}) == 1
+
+    def set_loads(*loads):
+        manager._workers_count = len(loads)
+        for i, load in enumerate(loads):
+            (inv_path / f'load_{i}').write_text(yaml.safe_dump(load))
+
+    idle = {'fire-lag': 0, 'miss-rate': 0, 'falling-behind': False}
+    busy = {'fire-lag': 1, 'miss-rate': 0.1, 'falling-behind': False}
+    behind = {'fire-lag': 5, 'miss-rate': 0.5, 'falling-behind': True}
+    inventory = {i: {} for i in range(15)}
+
+    set_loads(idle, busy, behind)
+    assert manager.get_n_workers(inventory) == 4
+    set_loads(idle, busy, idle)
+    assert manager.get_n_workers(inventory) == 3
+    set_loads(idle, idle, idle)
+    assert manager.get_n_workers(inventory) == 2
+    # Never below the workers needed for the inventory size
+    set_loads(idle, idle)
+    assert manager.get_n_workers(inventory) == 2
+
+    # The workers without recent report are not considered idle
+    set_loads(idle, idle, idle)
+    os.utime(inv_path / 'load_2', (0, 0))
+    assert manager.get_n_workers(inventory) == 3
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.controller
+@pytest.mark.controller_manager
+@pytest.mark.controller_manager_static
+def test_autoscale_cmd_pipeline(monkeypatch, manager_cfg):
+    """Check the pipeline is split across the maximum number of workers
+    """
+    fake_environ = {}
+    monkeypatch.setattr(os, 'environ', fake_environ)
+
+    manager_args = {**MANAGER_ARGS, 'workers': 'auto', 'max-workers': 4,
+                    'max-cmd-pipeline': 8}
+    init_static_manager(manager_cfg, manager_args)
+    assert fake_environ['SQ_MAX_OUTSTANDING_CMD'] == '2'
+
+    # A pipeline smaller than the workers would mean no limit at all
+    for max_cmd_pipeline in [2, 6]:
+        manager_args['max-cmd-pipeline'] = max_cmd_pipeline
+        with pytest.raises(SqPollerConfError):
+            init_static_manager(manager_cfg, manager_args)
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.controller
+@pytest.mark.controller_manager
+@pytest.mark.controller_manager_static
+@pytest.mark.asyncio
+async def test_autoscale_apply(monkeypatch, manager_cfg):
+    """Check the workers are added and retired moving the fewest devices
+    """
+    fake_environ = {}
+    monkeypatch.setattr(os, 'environ', fake_environ)
+
+    manager_args = {**MANAGER_ARGS, 'workers': 'auto'}
+    manager = init_static_manager(manager_cfg, manager_args)
+    inv_path = manager._inventory_path
+
+    _, _, devices = get_random_node_list(30)
+    keys = list(devices)
+    chunk1 = {k: devices[k] for k in keys[:15]}
+    chunk2 = {k: devices[k] for k in keys[15:]}
+
+    signaled = []
+    launch_fn = get_async_task_mock()
+    stop_fn = get_async_task_mock()
+    with patch.object(StaticManager, '_launch_poller', launch_fn), \
+            patch.object(StaticManager, '_stop_process', stop_fn):
+        await manager.apply([chunk1, chunk2])
+        for i in range(2):
+            manager._running_workers[i] = get_acking_process(
+                inv_path, i, signaled)
+        launch_fn.reset_mock()
+
+        # Scale up, the chunker returning the chunks in a different order
+        chunk3 = {k: devices[k] for k in keys[10:15] + keys[25:]}
+        chunk1 = {k: devices[k] for k in keys[:10]}
+        chunk2 = {k: devices[k] for k in keys[15:25]}
+        await manager.apply([chunk3, chunk2, chunk1])
+
+        assert manager._active_chunks == [chunk1, chunk2, chunk3]
+        launch_fn.assert_called_once_with(2)
+        assert sorted(signaled) == [0, 1]
+        manager._running_workers[2] = get_acking_process(
+            inv_path, 2, signaled)
+
+        # Scale down
+        signaled.clear()
+        retired = manager._running_workers[2]
+        chunk1 = {**chunk1, **chunk3}
+        await manager.apply([chunk2, chunk1])
+
+    assert manager._active_chunks == [chunk1, chunk2]
+    assert signaled == [0]
+    assert 2 not in manager._running_workers
+    stop_fn.assert_called_once_with(retired)
+    assert not (inv_path / 'inv_2.yml').exists()
+    assert manager._workers_count == 2
+
+
 @pytest.mark.poller
 @pytest.mark.poller_unit_tests
 @pytest.mark.controller
@@ -626,6 +822,63 @@ async def test_worker_replace(monkeypatch, manager_cfg):
             coalescer_monitor_mock.fut.set_result(None)
 
 
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.controller
+@pytest.mark.controller_manager
+@pytest.mark.controller_manager_static
+@pytest.mark.asyncio
+async def test_worker_scale_up(monkeypatch, manager_cfg):
+    """Test if execute monitors right away a worker launched while the other
+    ones are running
+    """
+    fake_environ = {}
+    monkeypatch.setattr(os, 'environ', fake_environ)
+
+    manager = init_static_manager(manager_cfg)
+
+    coalescer_monitor_mock = DummyCoalescerLauncher()
+    injected_workers = {i: asyncio.Future() for i in range(3)}
+    create_subprocess_fn = get_async_task_mock(
+        get_fake_process(injected_workers[2]))
+
+    with patch.multiple(static_manager_module,
+                        monitor_process=dummy_monitor_process), \
+            patch.object(manager, '_coalescer_launcher',
+                         coalescer_monitor_mock), \
+            patch.multiple(asyncio,
+                           create_subprocess_exec=create_subprocess_fn):
+        execute_task = asyncio.create_task(manager._execute())
+        try:
+            manager._waiting_workers[0] = get_fake_process(injected_workers[0])
+            manager._waiting_workers[1] = get_fake_process(injected_workers[1])
+            manager._poller_tasks_ready.set()
+            await asyncio.sleep(0.1)
+
+            # Scale up from 2 to 3 workers, while the others keep running
+            await manager._launch_poller(2)
+            await asyncio.sleep(0.1)
+
+            assert not manager._waiting_workers, 'New worker not monitored'
+            assert 2 in manager._running_workers, 'New worker not running'
+
+            # The death of the new worker must be detected
+            injected_workers[2].set_exception(Exception('worker crashed'))
+            await asyncio.sleep(0.1)
+            assert execute_task.done(), 'New worker death not detected'
+            with pytest.raises(PollingError):
+                execute_task.result()
+        finally:
+            execute_task.cancel()
+            with suppress(asyncio.CancelledError, PollingError):
+                await execute_task
+            # Resolve all the futures to suppress any warning
+            for i in injected_workers.values():
+                if not i.done():
+                    i.set_result(None)
+            coalescer_monitor_mock.fut.set_result(None)
+
+
 @pytest.mark.poller
 @pytest.mark.poller_unit_tests
 @pytest.mark.controller
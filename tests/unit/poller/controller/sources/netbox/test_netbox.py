@@ -7,6 +7,8 @@ from typing import Any, Dict, Tuple
 from pydantic import ValidationError
 
 import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
 from suzieq.poller.controller.credential_loader.static import StaticLoader
 from suzieq.poller.controller.source.netbox import Netbox
 from suzieq.shared.exceptions import InventorySourceError
@@ -350,3 +352,66 @@ def test_netbox_tags(default_config):
     url_list = n._get_url_list()
     assert sorted(url_list) == sorted(exp_url_list), \
         f'Wrong url list {url_list}'
+
+
+@pytest.mark.controller_source
+@pytest.mark.poller
+@pytest.mark.controller
+@pytest.mark.poller_unit_tests
+@pytest.mark.controller_unit_tests
+@pytest.mark.controller_source_netbox
+@pytest.mark.asyncio
+async def test_netbox_concurrent_incremental_fetch(default_config):
+    """Test the pages are retrieved concurrently and, after the first
+    retrieval, only the changed devices are retrieved
+    """
+    devices = [{'id': i, 'name': f'dev{i}', 'tags': [{'name': 'suzieq'}],
+                'last_updated': '2022-01-01T00:00:00Z'}
+               for i in range(1, 11)]
+    queries = []
+    in_flight = [0, 0]  # current, max
+
+    async def get_devices(request: web.Request) -> web.Response:
+        query = request.query
+        queries.append(dict(query))
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight)
+        await asyncio.sleep(0.05)
+        in_flight[0] -= 1
+
+        res = [d for d in devices
+               if d['last_updated'] >= query.get('last_updated__gte', '')]
+        if query.get('brief'):
+            res = [{'id': d['id'], 'name': d['name']} for d in res]
+        # The server caps the page size
+        limit = min(int(query['limit']), 3)
+        offset = int(query['offset'])
+        return web.json_response({'count': len(res), 'next': None,
+                                  'results': res[offset:offset+limit]})
+
+    app = web.Application()
+    app.router.add_get('/api/dcim/devices/', get_devices)
+    async with TestServer(app, host='127.0.0.1') as server:
+        config = {**default_config, 'url': f'http://127.0.0.1:{server.port}',
+                  'tag': ['suzieq'], 'max-requests': 2}
+        src = Netbox(config)
+        try:
+            inv = await src.get_inventory_list()
+            assert sorted(d['id'] for d in inv) == list(range(1, 11))
+            assert len(queries) == 4
+            assert in_flight[1] == 2
+
+            # Remove a device and change another
+            queries.clear()
+            devices.pop()
+            devices[0] = {**devices[0], 'name': 'renamed',
+                          'last_updated': '2100-01-01T00:00:00Z'}
+            inv = await src.get_inventory_list()
+        finally:
+            await src._stop()
+
+    assert sorted(d['id'] for d in inv) == list(range(1, 10))
+    assert next(d for d in inv if d['id'] == 1)['name'] == 'renamed'
+    # Only the brief list and the changed devices were retrieved
+    assert all('brief' in q or 'last_updated__gte' in q for q in queries)
+    assert sum('last_updated__gte' in q for q in queries) == 1
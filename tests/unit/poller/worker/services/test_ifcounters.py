@@ -0,0 +1,120 @@
+import math
+import os
+import tempfile
+from shutil import rmtree
+
+import pandas as pd
+import pytest
+
+from suzieq.db.parquet.parquetdb import SqParquetDB
+from suzieq.poller.worker.services.ifCounters import IfCountersService
+from suzieq.shared.schema import Schema, SchemaForTable
+from suzieq.shared.utils import get_default_per_vals, load_sq_config
+from tests.conftest import create_dummy_config_file
+
+# pylint: disable=redefined-outer-name, protected-access
+
+RAW = {'hostname': 'leaf01', 'namespace': 'ns', 'devtype': 'linux'}
+
+
+@pytest.fixture
+def ifcounters_service():
+    """Init the ifCounters service
+    """
+    data_dir = tempfile.mkdtemp()
+    cfg_file = create_dummy_config_file(datadir=data_dir)
+    cfg = load_sq_config(config_file=cfg_file)
+    schema = Schema(cfg['schema-directory'])
+    schema_tab = SchemaForTable('ifCounters', schema)
+    db_access = SqParquetDB(cfg, None)
+    service = IfCountersService('ifCounters', None, 15, 'counters',
+                                ['ifname'], [], schema_tab, None, db_access,
+                                'forever')
+    yield service
+    os.remove(cfg_file)
+    rmtree(data_dir)
+
+
+def _sample(timestamp: int, **counters):
+    zero = {'rxBytes': 0, 'rxPackets': 0, 'rxDrops': 0, 'rxErrs': 0,
+            'txBytes': 0, 'txPackets': 0, 'txDrops': 0, 'txErrs': 0}
+    entries = [{'ifname': 'eth0', **zero, **counters},
+               {'ifname': 'eth1', **zero, 'rxBytes': 10}]
+    return entries, {**RAW, 'timestamp': timestamp}
+
+
+def _write_speed(service: IfCountersService, speed: int):
+    '''Write the speed of eth0 in the interfaces table'''
+    schema = Schema(service._db_access.cfg['schema-directory']) \
+        .get_arrow_schema('interfaces')
+    defvals = get_default_per_vals()
+    record = {f.name: defvals.get(f.type, '') for f in schema}
+    record.update({'sqvers': '3.0', 'namespace': 'ns', 'hostname': 'leaf01',
+                   'ifname': 'eth0', 'speed': speed, 'active': True,
+                   'timestamp': 1000})
+    service._db_access.write('interfaces', 'pandas', pd.DataFrame([record]),
+                             False, schema, None)
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+def test_ifcounters_rates(ifcounters_service):
+    """Test the rates are computed from the previous sample, handling the
+    plausible counter wraps and the resets
+    """
+    svc = ifcounters_service
+    first = svc.clean_data(*_sample(1000, rxBytes=1000, rxPackets=10))
+    assert all(math.isnan(e['rxBps']) for e in first)
+    svc.previous_results['ns.leaf01'] = first
+
+    second = svc.clean_data(*_sample(11000, rxBytes=11000, rxPackets=110,
+                                     txBytes=2**32 - 100))
+    eth0 = second[0]
+    assert eth0['rxBps'] == 8000
+    assert eth0['rxPps'] == 10
+    assert eth0['rxErrsPerSec'] == 0
+    assert second[1]['rxBps'] == 0
+    svc.previous_results['ns.leaf01'] = second
+
+    # Without the interface speed, a wrap cannot be told from a reset
+    third = svc.clean_data(*_sample(21000, rxBytes=500, txBytes=900))
+    assert math.isnan(third[0]['txBps'])
+    assert math.isnan(third[0]['rxBps'])
+
+    # txBytes wrapped on a 1Gbps interface, rxBytes were reset
+    _write_speed(svc, 1000)
+    svc._speeds.clear()
+    third = svc.clean_data(*_sample(21000, rxBytes=500, txBytes=900))
+    assert third[0]['txBps'] == 1000 * 8 / 10
+    assert math.isnan(third[0]['rxBps'])
+
+    # The interface could not carry 2GB in 10 seconds, not a wrap
+    svc.previous_results['ns.leaf01'] = svc.clean_data(
+        *_sample(11000, txBytes=2**31))
+    third = svc.clean_data(*_sample(21000, txBytes=900))
+    assert math.isnan(third[0]['txBps'])
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+def test_ifcounters_skip_unchanged(ifcounters_service):
+    """Test only the interfaces whose counters moved are written when
+    skip-unchanged is set
+    """
+    svc = ifcounters_service
+    old = svc.clean_data(*_sample(1000))
+    svc.previous_results['ns.leaf01'] = old
+    new = svc.clean_data(*_sample(11000))
+    svc.previous_results['ns.leaf01'] = new
+    new = svc.clean_data(*_sample(21000, rxBytes=100))
+
+    adds, _ = svc.get_diff(svc.previous_results['ns.leaf01'], new, False)
+    assert len(adds) == 2, 'Expected all the records by default'
+
+    svc.skip_unchanged = True
+    adds, _ = svc.get_diff(svc.previous_results['ns.leaf01'], new, False)
+    assert [e['ifname'] for e in adds] == ['eth0']
+    adds, _ = svc.get_diff(svc.previous_results['ns.leaf01'], new, True)
+    assert len(adds) == 2, 'Expected all the records after a reboot'
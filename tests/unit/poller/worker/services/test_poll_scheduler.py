@@ -0,0 +1,135 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from suzieq.poller.worker.services.poll_scheduler import PollScheduler
+
+NODES = [f'ns.leaf{i}' for i in range(10)]
+
+
+def _deadlines(scheduler: PollScheduler):
+    return {node: deadline
+            for deadline, _, _, node, _ in sorted(scheduler._heap)}
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+def test_poll_scheduler_spreads_nodes():
+    """Test the nodes of a service are polled right away, then spread across
+    the period and keep their slot in the next polls
+    """
+    scheduler = PollScheduler(jitter=0)
+    with patch('time.time', return_value=1000):
+        scheduler.add_nodes('lldp', NODES, 60, print)
+    deadlines = _deadlines(scheduler)
+    assert all(deadlines[n] == 1000 for n in NODES)
+
+    # The second polls are spread from half a period after the first one
+    for i, node in enumerate(NODES):
+        with patch('time.time', return_value=1010):
+            scheduler.reschedule('lldp', node, 60, print)
+        assert scheduler._slots[('lldp', node)] == 1030 + 6*i
+    assert not scheduler.stats[('lldp', NODES[2])].deadline_misses
+
+    # The poll ended before the next slot, the slot is kept
+    with patch('time.time', return_value=1050):
+        scheduler.reschedule('lldp', NODES[2], 60, print)
+    assert scheduler._slots[('lldp', NODES[2])] == 1102
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+def test_poll_scheduler_jitter():
+    """Test the jitter of the first polls is small
+    """
+    scheduler = PollScheduler(jitter=0.5)
+    with patch('time.time', return_value=1000):
+        scheduler.add_nodes('lldp', NODES, 60, print)
+    deadlines = _deadlines(scheduler)
+    for node in NODES:
+        assert 1000 <= deadlines[node] <= 1003
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+def test_poll_scheduler_add_nodes_in_gaps():
+    """Test the nodes added later are placed in the largest gaps and the
+    jitter depends on all the nodes of the service
+    """
+    scheduler = PollScheduler(jitter=0.1)
+    with patch('time.time', return_value=1000):
+        scheduler.add_nodes('lldp', NODES[:4], 60, print)
+    assert scheduler._slot_jitter['lldp'] == 1.5
+
+    # The slot at 25 secs in the period is free again
+    scheduler.remove_node('lldp', NODES[1])
+    assert scheduler._slot_jitter['lldp'] == 2
+    with patch('time.time', return_value=1100):
+        scheduler.add_nodes('lldp', NODES[4:5], 60, print)
+    assert scheduler._slots[('lldp', NODES[4])] % 60 == 25
+    assert scheduler._slot_jitter['lldp'] == 1.5
+    with patch('time.time', return_value=1100):
+        scheduler.reschedule('lldp', NODES[4], 60, print)
+    assert 1130 <= scheduler._slots[('lldp', NODES[4])] < 1190
+
+    # No large gap left, the new nodes split the existing ones
+    with patch('time.time', return_value=1100):
+        scheduler.add_nodes('lldp', NODES[5:9], 60, print)
+    phases = sorted(slot % 60 for slot in scheduler._slots.values())
+    assert phases == sorted((10 + 7.5 * i) % 60 for i in range(8))
+    assert scheduler._slot_jitter['lldp'] == 0.75
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+def test_poll_scheduler_deadline_miss_and_shedding():
+    """Test the deadline misses are tracked and the low priority services
+    are delayed when the worker falls behind
+    """
+    scheduler = PollScheduler(jitter=0)
+    with patch('time.time', return_value=1000):
+        scheduler.add_nodes('lldp', NODES, 60, print)
+        scheduler.add_nodes('inventory', NODES, 60, print)
+
+    # All the polls took longer than the period
+    with patch('time.time', return_value=1200):
+        for node in NODES:
+            scheduler.reschedule('lldp', node, 60, print)
+    assert all(scheduler.stats[('lldp', n)].deadline_misses == 1
+               for n in NODES)
+    assert scheduler._slots[('lldp', NODES[0])] == 1200
+    assert scheduler.falling_behind
+    assert scheduler.load['falling-behind']
+    assert scheduler.load['miss-rate'] > 0.2
+
+    with patch('time.time', return_value=1200):
+        scheduler.reschedule('inventory', NODES[0], 60, print,
+                             low_priority=True)
+    assert scheduler.stats[('inventory', NODES[0])].shed_count == 1
+    assert scheduler._slots[('inventory', NODES[0])] == 1260
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+@pytest.mark.asyncio
+async def test_poll_scheduler_run():
+    """Test the first polls are started right away
+    """
+    scheduler = PollScheduler(jitter=0)
+    polled = []
+    task = asyncio.create_task(scheduler.run())
+    await asyncio.sleep(0)
+
+    scheduler.add_nodes('lldp', NODES[:4], 0.4, polled.append)
+    await asyncio.sleep(0.05)
+    assert polled == NODES[:4]
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
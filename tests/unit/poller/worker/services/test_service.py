@@ -3,20 +3,21 @@ import tempfile
 from copy import deepcopy
 from shutil import rmtree
 from time import time
-from unittest.mock import Mock
+from unittest.mock import MagicMock, Mock
 
 import numpy as np
 import pandas as pd
 import pytest
 
 from suzieq.db.parquet.parquetdb import SqParquetDB
+from suzieq.poller.worker.services.poll_scheduler import PollScheduler
 from suzieq.poller.worker.services.service import Service
 from suzieq.shared.schema import Schema, SchemaForTable
 from suzieq.shared.utils import load_sq_config
 from tests.conftest import create_dummy_config_file
 from tests.unit.poller.worker.services.dummy_out import interface_out
 
-# pylint: disable=redefined-outer-name
+# pylint: disable=redefined-outer-name, protected-access
 
 
 @pytest.fixture(scope="session")
@@ -209,3 +210,92 @@ async def test_write_device_on_reboot_no_prev_session(
     written_records = service_for_diff._post_work_to_writer.call_args[0][0]
     assert len(written_records) == len(device_out), \
         'Not all the records written'
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+@pytest.mark.asyncio
+async def test_adaptive_poll_period(service_for_diff: Service, device_out):
+    """Test the poll period grows while the data do not change and goes
+    back to the service period when something changes
+    """
+    service = service_for_diff
+    node = 'vagrant.leaf01'
+    assert service.get_poll_period(node, False) == 15, \
+        'Expected a fixed period without max period'
+
+    service.max_period = 100
+    service._post_work_to_writer = Mock()
+    service.previous_results[node] = deepcopy(device_out)
+    boot_ts = device_out[0]['deviceSession']
+    service._node_boot_timestamps[node] = boot_ts
+
+    changed = await service.commit_data(deepcopy(device_out), 'vagrant',
+                                        'leaf01', boot_ts)
+    assert not changed
+    periods = [service.get_poll_period(node, changed) for _ in range(4)]
+    assert periods == [30, 60, 100, 100]
+
+    new_out = deepcopy(device_out)
+    new_out[0]['state'] = 'down'
+    changed = await service.commit_data(new_out, 'vagrant', 'leaf01',
+                                        boot_ts)
+    assert changed
+    assert service.get_poll_period(node, changed) == 15
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+@pytest.mark.asyncio
+async def test_phase_times(service_for_diff: Service, device_out):
+    """Test the time spent in each processing phase is accounted, per devtype
+    """
+    service = service_for_diff
+    service._post_work_to_writer = Mock()
+    phase_times = {}
+    service._phase_local.times = phase_times
+    await service.commit_data(deepcopy(device_out), 'vagrant', 'leaf01',
+                              device_out[0]['deviceSession'])
+    assert set(phase_times) == {'diff', 'enqueue'}
+    assert all(t >= 0 for t in phase_times.values())
+
+    service._update_phase_stats('eos', phase_times)
+    service._update_phase_stats('eos', {'diff': 0})
+    assert service.phase_stats['eos']['diff'][0] == 0
+    assert len(service.phase_stats['eos']['enqueue']) == 3
+
+    service.write_times = {'interfaces': [1.0, 3.0]}
+    assert service._get_write_time() == [1.0, 3.0, 2.0]
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+def test_update_node_list(service_for_diff: Service):
+    """Test the nodes re-created by an inventory update keep being polled
+    once per period
+    """
+    service = service_for_diff
+    old_node = {'postq': MagicMock()}
+    service.node_postcall_list = {'ns.leaf01': old_node}
+    new_node = {'postq': MagicMock()}
+    added_node = {'postq': MagicMock()}
+
+    # Without scheduler the polls of the re-created node go on
+    service.update_node_list({'ns.leaf01': new_node, 'ns.leaf02': added_node},
+                             ['ns.leaf01'])
+    new_node['postq'].assert_not_called()
+    added_node['postq'].assert_called_once()
+    assert service.node_postcall_list['ns.leaf01'] is new_node
+
+    service.scheduler = PollScheduler(jitter=0)
+    service.scheduler.add_nodes(service.name, ['ns.leaf01', 'ns.leaf02'],
+                                15, service._start_poll)
+    service.update_node_list({'ns.leaf01': old_node}, ['ns.leaf01'])
+    # The result of the poll of the old node comes back after the update
+    service.scheduler.reschedule(service.name, 'ns.leaf01', 15,
+                                 service._start_poll)
+    assert sorted(x[3] for x in service.scheduler._heap) == \
+        ['ns.leaf01', 'ns.leaf02']
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from suzieq.poller.worker.services.svcparser import (
+    cons_recs_from_json_stream, cons_recs_from_json_template)
+
+EOS_ROUTES_TMPL = '''vrfs/*:vrf/routes/*:prefix/[
+    "routeType: protocol",
+    "metric: metric?|0",
+    "vias/*/nexthopAddr: nexthopIps?|[]",
+    "vias/*/interface: oifs?|[]"
+    ]'''
+
+NXOS_MACS_TMPL = '''TABLE_mac_address/ROW_mac_address/*?/[
+    "disp_mac_addr: macaddr",
+    "disp_vlan: vlan?|0",
+    "disp_port: oif"
+    ]'''
+
+
+def _eos_routes(nvrfs: int, nroutes: int) -> str:
+    return json.dumps({'vrfs': {
+        f'vrf{v}': {
+            'routerId': '10.0.0.1',
+            'routes': {
+                f'10.{v}.{i}.0/24': {
+                    'routeType': 'ospf', 'metric': i,
+                    'vias': [{'nexthopAddr': '10.0.0.2',
+                              'interface': 'Ethernet1'}]}
+                for i in range(nroutes)}}
+        for v in range(nvrfs)}})
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+@pytest.mark.parametrize('batch_size', [1, 3, 1000])
+def test_json_stream_same_as_template(batch_size):
+    """Test the streamed decoding returns the same records of the full one
+    """
+    data = _eos_routes(3, 10)
+    expected = cons_recs_from_json_template(EOS_ROUTES_TMPL, json.loads(data))
+    result = cons_recs_from_json_stream(EOS_ROUTES_TMPL, data, batch_size)
+    assert len(expected) == 30
+    assert result == expected
+
+    rows = [{'disp_mac_addr': f'00:00:00:00:00:{i:02x}', 'disp_vlan': i,
+             'disp_port': 'Ethernet1/1'} for i in range(10)]
+    data = json.dumps({'TABLE_mac_address': {'ROW_mac_address': rows}})
+    expected = cons_recs_from_json_template(NXOS_MACS_TMPL, json.loads(data))
+    result = cons_recs_from_json_stream(NXOS_MACS_TMPL, data, batch_size)
+    assert result == expected
+
+    # A single element is returned as dict, it is left to the full decoding
+    data = json.dumps({'TABLE_mac_address': {'ROW_mac_address': rows[0]}})
+    assert cons_recs_from_json_stream(NXOS_MACS_TMPL, data, batch_size) \
+        is None
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+@pytest.mark.parametrize('data', [
+    '{"vrfs": {"default": {"routes": {"10.0.0.0/24": {}}}}} garbage',
+    '{"vrfs": {"default": {"routes": {"10.0.0.0/24": {}',
+    '{"vrfs": {"default": {"routerId": "10.0.0.1"}}}',
+    '{"vrfs": null}',
+    'not json',
+])
+def test_json_stream_not_streamable(data):
+    """Test that the streaming gives up on data it cannot handle
+    """
+    assert cons_recs_from_json_stream(EOS_ROUTES_TMPL, data) is None
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+def test_json_stream_not_streamable_template():
+    """Test that templates without a hierarchy are not streamed
+    """
+    assert cons_recs_from_json_stream('[ "vni: vni" ]', '{"vni": 1}') is None
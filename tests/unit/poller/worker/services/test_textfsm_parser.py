@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from suzieq.poller.worker.services.textfsm_parser import (TextFSMParser,
+                                                          get_textfsm_parser)
+
+TEMPLATE = './suzieq/config/textfsm_templates/iosxe_show_mac.tfsm'
+
+MAC_HEADER = 'Vlan    Mac Address       Type        Ports\n' \
+    '----    -----------       --------    -----\n'
+
+
+def _mac_output(vlan: int, nentries: int) -> str:
+    lines = [f' {vlan}    0050.56{i // 65536:02x}.{i % 65536:04x}    '
+             f'DYNAMIC     Gi1/0/{i % 48 + 1}'
+             for i in range(nentries)]
+    return MAC_HEADER + '\n'.join(lines) + '\n'
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+@pytest.mark.textfsm
+def test_textfsm_parser_cache():
+    """Test that the same template returns always the same parser
+    """
+    parser = get_textfsm_parser(TEMPLATE)
+    assert isinstance(parser, TextFSMParser)
+    assert get_textfsm_parser(TEMPLATE) is parser, \
+        'Expected the parser to be cached'
+    assert parser.header == ['macaddr', 'flags', 'vlan', '_ports']
+    assert str(parser) == TEMPLATE
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+@pytest.mark.textfsm
+def test_textfsm_parser_concurrent_parse():
+    """Test that parsing with the same parser from many threads
+    does not mix the results
+    """
+    parser = get_textfsm_parser(TEMPLATE)
+    outputs = {vlan: _mac_output(vlan, 500+vlan) for vlan in range(1, 9)}
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = dict(zip(outputs,
+                           executor.map(parser.parse, outputs.values())))
+
+    for vlan, res in results.items():
+        assert len(res) == 500+vlan, f'Wrong number of entries for {vlan}'
+        assert all(x[2] == str(vlan) for x in res), \
+            f'Entries of other outputs found for {vlan}'
@@ -0,0 +1,80 @@
+"""
+Test the cache of the identity discovered on the nodes
+"""
+# pylint: disable=protected-access
+
+from unittest.mock import AsyncMock
+
+import pytest
+
+from suzieq.poller.worker.inventory.inventory import CommandPacer
+from suzieq.poller.worker.nodes.discovery_cache import DiscoveryCache
+from suzieq.poller.worker.nodes.node import Node
+
+KEY = DiscoveryCache.get_key('ns', '192.168.0.1', 22)
+ENTRY = {'devtype': 'nxos', 'version': '9.3(4)', 'hostname': 'leaf01',
+         'transport': 'ssh', 'bootupTimestamp': 1600000000000}
+
+
+async def _init_node(cache: DiscoveryCache) -> Node:
+    return await Node().initialize(address='192.168.0.1', transport='ssh',
+                                   namespace='ns', discovery_cache=cache,
+                                   cmd_pacer=CommandPacer(0))
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+def test_discovery_cache_persistence(tmp_path):
+    """Test the entries are read back by the other workers and only the own
+    entries are written by each worker
+    """
+    cache = DiscoveryCache(str(tmp_path / 'worker_0.json'))
+    cache.update(KEY, ENTRY)
+    assert (tmp_path / 'worker_0.json').exists()
+
+    other = DiscoveryCache(str(tmp_path / 'worker_1.json'))
+    assert other.get(KEY) == ENTRY
+    other.update('ns/10.0.0.1:22', {**ENTRY, 'hostname': 'leaf02'})
+    assert 'ns/10.0.0.1:22' not in DiscoveryCache(
+        str(tmp_path / 'worker_0.json'))._owned
+    assert KEY not in other._owned
+
+    cache.invalidate(KEY)
+    assert not DiscoveryCache(str(tmp_path / 'worker_0.json'))._owned
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+@pytest.mark.asyncio
+async def test_discovery_cache_warm_start(tmp_path, monkeypatch):
+    """Test a cached node is ready to poll without connecting, and goes back
+    to the discovery if it rebooted
+    """
+    init_ssh = AsyncMock()
+    monkeypatch.setattr(Node, '_init_ssh', init_ssh)
+    cache = DiscoveryCache(str(tmp_path / 'worker_0.json'), save_delay=0)
+    cache.update(KEY, ENTRY)
+
+    node = await _init_node(cache)
+    init_ssh.assert_not_called()
+    assert node.devtype == 'nxos'
+    assert (node.version, node.hostname) == ('9.3(4)', 'leaf01')
+
+    # Device data fetched at the connection are the same
+    await node._check_identity()
+    assert node.devtype == 'nxos'
+    assert cache.get(KEY) == ENTRY
+
+    # The device rebooted
+    node = await _init_node(cache)
+    node.bootupTimestamp = ENTRY['bootupTimestamp'] + 3600*1000
+    await node._check_identity()
+    assert not node.devtype
+    assert type(node) is Node  # pylint: disable=unidiomatic-typecheck
+    assert not cache.get(KEY)
+
+    # Without a cached identity the discovery starts at initialization
+    await _init_node(cache)
+    init_ssh.assert_called_once()
@@ -172,3 +172,55 @@ async def test_node_scheduling(ready_inventory):
     assert len(ready_inventory.running_nodes) == len(sample_inventory)
     # Suppress never awaited alert
     await asyncio.wait(list(ready_inventory.running_nodes.values()))
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+@pytest.mark.poller_inventory
+@pytest.mark.asyncio
+async def test_inventory_update(ready_inventory):
+    """Test the update of the inventory only replaces the nodes changed
+    """
+    run_res = asyncio.Future()
+    run_res.set_result(None)
+    with patch.object(Node, 'run', return_value=run_res):
+        await ready_inventory.schedule_nodes_run()
+    await asyncio.wait(list(ready_inventory.running_nodes.values()))
+    untouched = ready_inventory.nodes['test-namespace.192.168.0.1']
+
+    new_device = {**sample_inventory[1], 'address': '192.168.0.3'}
+    with patch.object(SampleInventory, '_get_device_list',
+                      get_async_task_mock([sample_inventory[0],
+                                           new_device])), \
+            patch.multiple(Node, _init_ssh=get_async_task_mock(),
+                           _fetch_init_dev_data=get_async_task_mock(),
+                           run=get_async_task_mock()):
+        added, removed = await ready_inventory.update_inventory()
+
+    assert list(added) == ['test-namespace.192.168.0.3']
+    assert removed == ['test-namespace.192.168.0.2']
+    assert set(ready_inventory.nodes) == {'test-namespace.192.168.0.1',
+                                          'test-namespace.192.168.0.3'}
+    assert ready_inventory.nodes['test-namespace.192.168.0.1'] is untouched
+    # The new node has been scheduled
+    assert set(ready_inventory.running_nodes) == set(ready_inventory.nodes)
+    ready_inventory.add_task_fn.assert_called_with(
+        [ready_inventory.running_nodes['test-namespace.192.168.0.3']])
+    await asyncio.wait(list(ready_inventory.running_nodes.values()))
+
+    # The password changes, the node keeps its name but is re-created
+    changed_device = {**sample_inventory[0], 'password': 'new-password'}
+    with patch.object(SampleInventory, '_get_device_list',
+                      get_async_task_mock([changed_device, new_device])), \
+            patch.multiple(Node, _init_ssh=get_async_task_mock(),
+                           _fetch_init_dev_data=get_async_task_mock(),
+                           run=get_async_task_mock()):
+        added, removed = await ready_inventory.update_inventory()
+
+    assert list(added) == removed == ['test-namespace.192.168.0.1']
+    assert ready_inventory.nodes['test-namespace.192.168.0.1'] is \
+        not untouched
+    assert ready_inventory.nodes['test-namespace.192.168.0.1'].password == \
+        'new-password'
+    await asyncio.wait(list(ready_inventory.running_nodes.values()))
@@ -0,0 +1,207 @@
+"""
+Test the Node component functionalities
+"""
+# pylint: disable=redefined-outer-name, protected-access
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+import yaml
+
+from suzieq.poller.worker.inventory.inventory import CommandPacer
+from suzieq.poller.worker.nodes.node import Node
+from suzieq.poller.worker.services.service import RsltToken
+
+
+async def _init_node(devtype: str) -> Node:
+    return await Node().initialize(address='192.168.0.1', devtype=devtype,
+                                   transport='ssh', namespace='ns',
+                                   cmd_pacer=CommandPacer(0))
+
+
+def _get_svc_defn(service: str):
+    with open(f'suzieq/config/{service}.yml', 'r') as f:
+        return yaml.safe_load(f.read())['apply']
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+@pytest.mark.asyncio
+async def test_cmd_plan_resolution():
+    """Test the commands are resolved once and only recomputed when the
+    version of the node changes
+    """
+    node = await _init_node('nxos')
+    svc_defn = _get_svc_defn('routes')
+
+    node.version = '9.3(4)'
+    plan = node._get_cmd_plan('routes', svc_defn)
+    assert plan.defined
+    assert plan.cmdlist == [plan.cmd]
+    assert plan.oformat == 'json'
+    assert node._get_cmd_plan('routes', svc_defn) is plan, \
+        'Expected the plan to be reused'
+
+    # Old NXOS versions need a different command
+    node.version = '9.2(1)'
+    old_plan = node._get_cmd_plan('routes', svc_defn)
+    assert old_plan is not plan, 'Expected the plan to be recomputed'
+    assert old_plan.cmd != plan.cmd
+    assert old_plan.oformat == 'text'
+
+    # A devtype without the service definition
+    node = await _init_node('panos')
+    plan = node._get_cmd_plan('evpnVni', _get_svc_defn('evpnVni'))
+    assert not plan.defined
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+@pytest.mark.asyncio
+async def test_cmd_batching():
+    """Test the services posted in the same window are executed in a single
+    call and each of them gets back only its own results
+    """
+    node = await Node().initialize(address='192.168.0.1', devtype='eos',
+                                   transport='https', namespace='ns',
+                                   cmd_pacer=CommandPacer(0))
+    assert node.supports_cmd_batching
+    node.cmd_batch_window = 0
+    node.version = '4.27.0F'
+    calls = []
+
+    async def exec_cmd(service_callback, cmd_list, cb_token, **_):
+        calls.append(cmd_list)
+        # The lldp command fails
+        result = [node._create_result(c, 1002 if 'lldp' in c else 200,
+                                      {'cmd': c}) for c in cmd_list]
+        await service_callback(result, cb_token)
+
+    node._exec_cmd = exec_cmd
+    results = {}
+
+    async def callback(result, cb_token):
+        results.setdefault(cb_token.service, []).append(result)
+
+    services = ['device', 'lldp', 'interfaces']
+    await node._exec_batched_services(
+        [[callback, _get_svc_defn(svc),
+          RsltToken(0, node.hostname, 0, 0, svc, 10)] for svc in services])
+
+    # A single call for all the services, plus the retry of the failed one
+    assert len(calls) == 2
+    lldp_cmds = node._get_cmd_plan('lldp', _get_svc_defn('lldp')).cmdlist
+    assert calls[1] == lldp_cmds
+    for svc in services:
+        assert len(results[svc]) == 1, f'Expected a single result for {svc}'
+        plan = node._get_cmd_plan(svc, _get_svc_defn(svc))
+        assert [r['cmd'] for r in results[svc][0]] == plan.cmdlist
+    assert results['lldp'][0][0]['status'] == 1002
+    assert results['device'][0][0]['status'] == 200
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+@pytest.mark.asyncio
+async def test_cmd_batching_window():
+    """Test the services posted while the batching window is open are
+    executed together, if they have the same timeout
+    """
+    node = await Node().initialize(address='192.168.0.1', devtype='eos',
+                                   transport='https', namespace='ns',
+                                   cmd_pacer=CommandPacer(0))
+    node.cmd_batch_window = 0.2
+    node.version = '4.27.0F'
+    calls = []
+
+    async def exec_cmd(service_callback, cmd_list, cb_token, **kwargs):
+        calls.append((cmd_list, kwargs['timeout']))
+        await service_callback(
+            [node._create_result(c, 200, {'cmd': c}) for c in cmd_list],
+            cb_token)
+
+    node._exec_cmd = exec_cmd
+    node._close_connection = AsyncMock()
+    results = asyncio.Queue()
+
+    async def callback(result, cb_token):
+        results.put_nowait((cb_token.service, result))
+
+    def post(svc, timeout=10):
+        node.post_commands(callback, _get_svc_defn(svc),
+                                 RsltToken(0, node.hostname, 0, 0, svc,
+                                           timeout))
+
+    runner = asyncio.create_task(node.run())
+    try:
+        post('device')
+        await asyncio.sleep(0.05)
+        # Posted while the window is open
+        post('interfaces')
+        post('lldp', timeout=5)
+        for _ in range(3):
+            await asyncio.wait_for(results.get(), 1)
+    finally:
+        runner.cancel()
+        await asyncio.gather(runner, return_exceptions=True)
+
+    plans = {svc: node._get_cmd_plan(svc, _get_svc_defn(svc)).cmdlist
+             for svc in ['device', 'interfaces', 'lldp']}
+    assert sorted(calls) == sorted([
+        (plans['device'] + plans['interfaces'], 10), (plans['lldp'], 5)])
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+@pytest.mark.asyncio
+async def test_ssh_channels():
+    """Test the commands of a service run concurrently on the SSH connection
+    up to the channel limit of the devtype
+    """
+    node = await _init_node('cumulus')
+    running = []
+    max_running = 0
+
+    async def run(cmd):
+        nonlocal max_running
+        running.append(cmd)
+        max_running = max(max_running, len(running))
+        await asyncio.sleep(0.05)
+        running.remove(cmd)
+        if cmd == 'fail':
+            raise ConnectionResetError('reset')
+        return SimpleNamespace(exit_status=0, stdout=cmd)
+
+    node._conn = MagicMock()
+    node._conn.run = run
+    node._close_connection = AsyncMock()
+    results = []
+
+    async def callback(result, _):
+        results.append(result)
+
+    cmds = [f'cmd{i}' for i in range(10)]
+    await node._ssh_gather(callback, cmds, None, 'text', 10, False)
+    assert max_running == node.MAX_SSH_CHANNELS
+    assert [r['data'] for r in results[0]] == cmds, 'Expected ordered results'
+
+    # The results stop at the first failing command
+    await node._ssh_gather(callback, ['cmd0', 'fail', 'cmd2'], None, 'text',
+                           10, False)
+    assert [r['cmd'] for r in results[1]] == ['cmd0', 'fail']
+    assert results[1][1]['status'] != 0
+    node._close_connection.assert_called_once()
+
+    # Slow hosts are sequential, the command pacer limits the rate only
+    node.slow_host = True
+    assert node.ssh_channels == 1
+    node.slow_host = False
+    node._cmd_pacer = CommandPacer(10)
+    assert node.ssh_channels == node.MAX_SSH_CHANNELS
+    assert Node.MAX_SSH_CHANNELS >= node.batch_size
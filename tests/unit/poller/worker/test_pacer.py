@@ -1,3 +1,6 @@
+import asyncio
+import time
+
 import pytest
 
 from suzieq.poller.worker.inventory.inventory import CommandPacer
@@ -12,8 +15,7 @@ def test_pacer_init():
     """
     cp = CommandPacer(0)
     assert cp.max_cmds == 0, 'Not expected command pacer max cmds value'
-    assert cp._cmd_mutex is None, 'Mutex should\'ve been None'
-    assert cp._cmd_semaphore is None, 'Semaphore should\'ve been None'
+    assert not cp._cmd_buckets, 'No bucket expected without limits'
 
     ##
     # 2. Test with a value of maximum number of commands
@@ -21,8 +23,61 @@ def test_pacer_init():
     max_value = 2
     cp = CommandPacer(max_value)
     assert cp.max_cmds == max_value, 'Not expected max cmds value'
-    assert cp._cmd_mutex is not None, 'Mutex shouldn\'t be None'
-    assert cp._cmd_semaphore is not None, 'Semaphore shouldn\'t been None'
-    assert cp._cmd_semaphore._value == max_value, 'Unexpected semaphore value'
-    assert cp._cmd_pacer_sleep == float(1 / max_value), \
-        'Unexpected pacer sleep value'
+    assert cp.burst == max_value, 'Expected the burst to default to max cmds'
+    assert CommandPacer(max_value, 5).burst == 5, 'Unexpected burst value'
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+@pytest.mark.poller_inventory
+@pytest.mark.asyncio
+async def test_pacer_rate_and_burst():
+    """Test the burst is issued at once and the rest paced out
+    """
+    cp = CommandPacer(20, burst=5)
+    issued = []
+
+    async def _cmd(node):
+        async with cp.wait(auth_key='tacacs', node_key=node):
+            issued.append(time.monotonic())
+
+    start = time.monotonic()
+    await asyncio.gather(*[_cmd('n1') for _ in range(10)])
+    # The burst goes through at once, the other 5 at 20 cmds/sec
+    assert issued[4] - start < 0.05
+    assert 0.2 <= issued[-1] - start < 0.5
+
+    stats = cp.wait_stats['tacacs']
+    assert stats.count == 10
+    assert stats.max_wait >= 0.2
+    assert 0 < stats.avg_wait < stats.max_wait
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+@pytest.mark.poller_inventory
+@pytest.mark.asyncio
+async def test_pacer_fairness_and_auth_buckets():
+    """Test the nodes waiting are served in round robin and each auth
+    server has its own budget
+    """
+    cp = CommandPacer(50, burst=1)
+    order = []
+
+    async def _cmd(auth, node):
+        async with cp.wait(auth_key=auth, node_key=node):
+            order.append((auth, node))
+
+    # The busy node posts all its commands before the quiet one
+    tasks = [_cmd('tacacs', 'busy') for _ in range(6)]
+    tasks += [_cmd('tacacs', 'quiet') for _ in range(2)]
+    tasks += [_cmd('jump', 'other')]
+    await asyncio.gather(*tasks)
+
+    tacacs = [node for auth, node in order if auth == 'tacacs']
+    assert tacacs[:5] == ['busy', 'busy', 'quiet', 'busy', 'quiet']
+    # The other auth server did not wait behind the first one
+    assert order.index(('jump', 'other')) < 3
+    assert cp.wait_stats['jump'].count == 1
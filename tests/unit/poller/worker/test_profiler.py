@@ -0,0 +1,28 @@
+"""
+Test the on demand profiling of the worker
+"""
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from suzieq.poller.worker.profiler import WorkerProfiler
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+@pytest.mark.asyncio
+async def test_worker_profile(tmp_path):
+    """Test the profile and the processing times are dumped
+    """
+    svc = SimpleNamespace(name='interfaces',
+                          phase_stats={'eos': {'clean': [1.0, 3.0, 2.0]}})
+    profiler = WorkerProfiler(str(tmp_path), '0', lambda: [svc], duration=0)
+    filename = await profiler.profile()
+
+    assert os.path.isfile(f'{filename}.prof')
+    with open(f'{filename}.txt') as f:
+        summary = f.read()
+    assert 'interfaces eos clean: [1.00, 3.00, 2.00]' in summary
+    assert 'cumulative' in summary
@@ -0,0 +1,60 @@
+"""
+Test the pool of the HTTP connections of the REST nodes
+"""
+# pylint: disable=protected-access
+
+import pytest
+from aiohttp import web
+
+from suzieq.poller.worker.nodes.rest_pool import RestPool
+
+
+async def _start_server() -> web.AppRunner:
+    async def handler(_):
+        return web.json_response({'result': []})
+
+    app = web.Application()
+    app.router.add_post('/command-api', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    return runner
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+@pytest.mark.asyncio
+async def test_rest_pool_reuse():
+    """Test the sessions of the nodes share the connections, kept alive
+    across the requests
+    """
+    runner = await _start_server()
+    port = runner.addresses[0][1]
+    url = f'http://127.0.0.1:{port}/command-api'
+    pool = RestPool(limit_per_host=2)
+    try:
+        sessions = [pool.get_session(), pool.get_session()]
+        for _ in range(3):
+            for session in sessions:
+                async with session.post(url) as response:
+                    assert response.status == 200
+
+        # Closing a session leaves the connections of the pool open
+        await sessions[0].close()
+        assert not pool._connector.closed
+        async with sessions[1].post(url) as response:
+            await response.json()
+
+        stats = pool.stats[f'127.0.0.1:{port}']
+        assert stats.requests == 7
+        assert stats.new_connections == 1
+        assert stats.reused_connections == 6
+        assert stats.reuse_ratio == pytest.approx(6/7)
+
+        await pool.close()
+        assert pool._connector.closed
+    finally:
+        await sessions[1].close()
+        await pool.close()
+        await runner.cleanup()
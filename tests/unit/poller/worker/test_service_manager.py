@@ -55,8 +55,8 @@ def _init_service_manager(add_tasks: Callable = None,
                           schema_dir,
                           queue,
                           run_mode,
-                          interval,
                           cfg,
+                          interval,
                           **other_params)
 
 
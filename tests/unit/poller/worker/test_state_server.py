@@ -0,0 +1,78 @@
+"""
+Test the latest state served by the workers and read by the live DB
+"""
+# pylint: disable=protected-access
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from suzieq.db import get_sqdb_engine
+from suzieq.poller.worker.state_server import StateServer
+
+SCHEMA = pa.schema([('namespace', pa.string()), ('hostname', pa.string()),
+                    ('ifname', pa.string()), ('state', pa.string()),
+                    ('timestamp', pa.int64()), ('active', pa.bool_()),
+                    ('sqvers', pa.string())])
+
+
+def _records(ns: str, hostname: str):
+    return [{'namespace': ns, 'hostname': hostname, 'ifname': ifname,
+             'state': 'up', 'timestamp': 1000, 'active': True,
+             'sqvers': '3.0'}
+            for ifname in ['eth0', 'eth1']]
+
+
+def _read(db, **kwargs):
+    args = {'start_time': '', 'end_time': '', 'view': 'latest',
+            'columns': ['namespace', 'hostname', 'ifname', 'state',
+                        'timestamp'],
+            'key_fields': ['namespace', 'hostname', 'ifname'], **kwargs}
+    return db.read('interfaces', 'pandas', **args)
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+@pytest.mark.asyncio
+async def test_live_read(tmp_path):
+    """Test the latest state is read from the workers, falling back to
+    parquet until all the nodes are polled
+    """
+    svc = SimpleNamespace(
+        name='interfaces', schema=SCHEMA,
+        node_postcall_list={'ns1.leaf01': {}, 'ns2.leaf02': {}},
+        previous_results={'ns1.leaf01': _records('ns1', 'leaf01')})
+    server = StateServer(str(tmp_path / 'worker_0.sock'), lambda: [svc])
+    await server.start()
+
+    db = get_sqdb_engine({'poller': {'state-socket-dir': str(tmp_path)}},
+                         'interfaces', 'live', None)
+    db._parquet.read = Mock(return_value=pd.DataFrame())
+    loop = asyncio.get_running_loop()
+    try:
+        # leaf02 not polled yet
+        await loop.run_in_executor(None, _read, db)
+        db._parquet.read.assert_called_once()
+
+        svc.previous_results['ns2.leaf02'] = _records('ns2', 'leaf02')
+        df = await loop.run_in_executor(None, _read, db)
+        assert len(df) == 4
+        assert db._parquet.read.call_count == 1
+
+        df = await loop.run_in_executor(
+            None, lambda: _read(db, namespace=['!ns1'], ifname=['eth1']))
+        assert df.to_dict('records') == [
+            {'namespace': 'ns2', 'hostname': 'leaf02', 'ifname': 'eth1',
+             'state': 'up', 'timestamp': 1000}]
+
+        # History is read from parquet
+        await loop.run_in_executor(None, lambda: _read(db, view='all'))
+        assert db._parquet.read.call_count == 2
+    finally:
+        await server.stop()
+    assert not (tmp_path / 'worker_0.sock').exists()
@@ -0,0 +1,87 @@
+"""
+Test the pool of the connections to the jump hosts
+"""
+# pylint: disable=protected-access
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from suzieq.poller.worker.nodes.tunnel_pool import TunnelPool
+
+KEY = TunnelPool.get_key('bastion', 22, 'user', None)
+
+
+class _FakeConnector:
+    """Open fake connections to the jump host, keeping the client to be
+    able to simulate a connection lost"""
+
+    def __init__(self, fail: bool = False):
+        self.clients = []
+        self.fail = fail
+
+    async def __call__(self, client_factory):
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise ConnectionRefusedError('refused')
+        conn = MagicMock()
+        conn.wait_closed = AsyncMock()
+        self.clients.append(client_factory())
+        return conn
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+@pytest.mark.asyncio
+async def test_tunnel_pool_sharing():
+    """Test the nodes share the connections up to the channel limit
+    """
+    pool = TunnelPool(max_channels=3)
+    connect = _FakeConnector()
+
+    conns = await asyncio.gather(*[pool.acquire(KEY, connect)
+                                   for _ in range(7)])
+    assert len(connect.clients) == 3, 'Expected 3 connections for 7 nodes'
+    assert len({id(c) for c in conns}) == 3
+    stats = pool.stats[KEY]
+    assert stats.open_tunnels == 3
+    assert stats.active_channels == 7
+    assert stats.connects == 3
+
+    # The connection is closed only when the last node releases it
+    await pool.release(conns[0])
+    conns[0].close.assert_not_called()
+    for c in conns[1:3]:
+        await pool.release(c)
+    conns[0].close.assert_called_once()
+    assert stats.open_tunnels == 2
+    assert stats.active_channels == 4
+
+
+@pytest.mark.poller
+@pytest.mark.poller_unit_tests
+@pytest.mark.poller_worker
+@pytest.mark.asyncio
+async def test_tunnel_pool_reconnect():
+    """Test a connection lost is replaced by a new one
+    """
+    pool = TunnelPool(max_channels=10)
+    connect = _FakeConnector()
+
+    conn = await pool.acquire(KEY, connect)
+    connect.clients[0].connection_lost(ConnectionResetError('reset'))
+    assert pool.stats[KEY].lost == 1
+    assert pool.stats[KEY].open_tunnels == 0
+
+    new_conn = await pool.acquire(KEY, connect)
+    assert new_conn is not conn, 'Expected a new connection'
+    await pool.release(conn)
+    assert pool.stats[KEY].open_tunnels == 1
+    assert pool.stats[KEY].active_channels == 1
+
+    with pytest.raises(ConnectionRefusedError):
+        await pool.acquire(TunnelPool.get_key('other', 22, 'user', None),
+                           _FakeConnector(fail=True))
+    assert pool.stats[('other', 22, 'user', None)].failures == 1
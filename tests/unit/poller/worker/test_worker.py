@@ -58,12 +58,14 @@ async def run_worker_with_mocks(poller: Worker) -> Dict[str, MagicMock]:
     # Create a mock for each method
     mks = {
         'inventory': get_async_task_mock(),
+        'inventory_close': get_async_task_mock(),
         'service_manager': get_async_task_mock(),
         'output_worker_manager': get_async_task_mock()
     }
 
     with patch.multiple(Inventory,
-                        schedule_nodes_run=mks['inventory']), \
+                        schedule_nodes_run=mks['inventory'],
+                        close=mks['inventory_close']), \
         patch.multiple(ServiceManager,
                        schedule_services_run=mks['service_manager']), \
         patch.multiple(OutputWorkerManager,
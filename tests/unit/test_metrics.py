@@ -0,0 +1,42 @@
+from urllib.request import urlopen
+
+from suzieq.shared.metrics import MetricsRegistry, MetricsServer
+
+
+def test_metrics_render():
+    '''Test the metrics are rendered in the Prometheus text format'''
+    registry = MetricsRegistry()
+    polls = registry.counter('polls_total', 'Polls', ['service'])
+    polls.inc(service='bgp')
+    polls.inc(2, service='bgp')
+    assert registry.counter('polls_total', 'Polls') is polls, \
+        'Expected the metric already registered'
+    registry.gauge('queue_size', 'Queue size', ['service'],
+                   collect=lambda: {('bgp',): 3})
+    hist = registry.histogram('poll_seconds', 'Poll time', buckets=[1, 10])
+    for value in [0.5, 1, 5, 20]:
+        hist.observe(value)
+
+    lines = registry.render().splitlines()
+    assert '# TYPE polls_total counter' in lines
+    assert 'polls_total{service="bgp"} 3' in lines
+    assert 'queue_size{service="bgp"} 3' in lines
+    assert 'poll_seconds_bucket{le="1"} 2' in lines
+    assert 'poll_seconds_bucket{le="10"} 3' in lines
+    assert 'poll_seconds_bucket{le="+Inf"} 4' in lines
+    assert 'poll_seconds_count 4' in lines
+    assert 'poll_seconds_sum 26.5' in lines
+
+
+def test_metrics_server():
+    '''Test the metrics can be scraped'''
+    registry = MetricsRegistry()
+    registry.counter('polls_total', 'Polls').inc()
+    server = MetricsServer('127.0.0.1', 0, registry)
+    server.start()
+    try:
+        with urlopen(f'http://127.0.0.1:{server.port}/metrics') as resp:
+            assert resp.status == 200
+            assert 'polls_total 1' in resp.read().decode()
+    finally:
+        server.stop()
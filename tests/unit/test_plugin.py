@@ -1,4 +1,10 @@
+import json
+import os
+import subprocess
+import sys
+
 import pytest
+from suzieq.shared import sq_plugin
 from suzieq.sqobjects.basicobj import SqObject
 from suzieq.engines.base_engine import SqEngineObj
 from suzieq.sqobjects.vlan import VlanObj
@@ -42,3 +48,43 @@ def test_plugin():
 
     with pytest.raises(DBNotFoundError):
         get_sqdb_engine({'db': {'foobar': 'bar'}}, 'foobar', None, None)
+
+
+@pytest.mark.plugin
+def test_plugin_cache(tmp_path, monkeypatch):
+    """Ensure that the plugins are cached and imported only when accessed
+    """
+    cache_file = tmp_path / 'plugins.json'
+    monkeypatch.setenv(sq_plugin.PLUGIN_CACHE_ENV, str(cache_file))
+    monkeypatch.setattr(sq_plugin, '_plugin_cache', None)
+
+    # Looking for a single plugin does not build the cache
+    assert SqObject.get_plugins('vlan')['vlan'] == VlanObj
+    assert not cache_file.exists()
+
+    tables = SqObject.get_plugins()
+    key = 'suzieq.sqobjects.basicobj.SqObject@suzieq.sqobjects'
+    cache = json.loads(cache_file.read_text())
+    assert cache[key]['plugins']['vlan'] == 'suzieq.sqobjects.vlan:VlanObj'
+    assert sorted(cache[key]['plugins']) == sorted(tables)
+
+    # A fresh process imports only the plugins it accesses
+    script = ('import sys\n'
+              'from suzieq.sqobjects import get_sqobject, get_tables\n'
+              'assert "vlan" in get_tables()\n'
+              'assert "suzieq.sqobjects.vlan" not in sys.modules\n'
+              'assert get_sqobject("vlan").__name__ == "VlanObj"\n'
+              'assert "suzieq.sqobjects.vlan" in sys.modules\n'
+              'assert "suzieq.sqobjects.routes" not in sys.modules\n')
+    subprocess.run([sys.executable, '-c', script], check=True,
+                   env={**os.environ,
+                        sq_plugin.PLUGIN_CACHE_ENV: str(cache_file)})
+
+    # A stale cache is rebuilt
+    cache[key]['fingerprint'] = []
+    cache[key]['plugins'] = {}
+    cache_file.write_text(json.dumps(cache))
+    monkeypatch.setattr(sq_plugin, '_plugin_cache', None)
+    assert SqObject.get_plugins()['vlan'] == VlanObj
+    cache = json.loads(cache_file.read_text())
+    assert cache[key]['fingerprint']
@@ -0,0 +1,57 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from suzieq.shared.schema import Schema, SchemaForTable
+
+SCHEMA_DIR = 'suzieq/config/schema'
+
+
+@pytest.mark.schema
+def test_schema_shared():
+    '''Test the schemas are parsed once and their derived values cached'''
+    schemas = Schema(SCHEMA_DIR)
+    other = Schema(SCHEMA_DIR)
+    assert schemas._compiled is other._compiled
+    assert other.get_arrow_schema('routes') is \
+        schemas.get_arrow_schema('routes')
+
+    # The cached lists cannot be modified by the callers
+    fields = schemas.sorted_display_fields_for_table('routes')
+    fields.append('foo')
+    assert 'foo' not in other.sorted_display_fields_for_table('routes')
+
+    # The first definition of a field wins, like before
+    assert schemas.fields_for_table('namespace').count('lastUpdate') == 2
+    assert schemas.field_for_table('namespace', 'lastUpdate') == \
+        next(x for x in schemas.get_raw_schema('namespace')
+             if x['name'] == 'lastUpdate')
+
+    sch = SchemaForTable('interfaces', other)
+    assert sch.key_fields() == ['namespace', 'hostname', 'ifname']
+    assert sch.get_augmented_fields([]) == \
+        SchemaForTable('interfaces', schema_dir=SCHEMA_DIR) \
+        .get_augmented_fields([])
+
+
+@pytest.mark.schema
+def test_schema_changed(tmp_path):
+    '''Test the schemas are parsed again when a schema file changes'''
+    schema_dir = tmp_path / 'schema'
+    shutil.copytree(SCHEMA_DIR, schema_dir)
+    schemas = Schema(str(schema_dir))
+    assert 'foo' not in schemas.fields_for_table('vlan')
+
+    vlan_file = schema_dir / 'vlan.avsc'
+    data = json.loads(vlan_file.read_text())
+    data['fields'].append({'name': 'foo', 'type': 'string', 'display': -1})
+    vlan_file.write_text(json.dumps(data))
+    stat = os.stat(vlan_file)
+    os.utime(vlan_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    schemas = Schema(str(schema_dir))
+    assert 'foo' in schemas.fields_for_table('vlan')
+    assert schemas.sorted_display_fields_for_table('vlan')[0] == 'foo'
+    assert 'foo' in schemas.get_arrow_schema('vlan').names
@@ -0,0 +1,148 @@
+from ipaddress import ip_address, ip_network
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from suzieq.shared.schema import SchemaForTable
+from suzieq.shared.utils import (PrefixIndex, addr_in_subnets,
+                                 addrs_in_subnet, build_query_mask,
+                                 build_query_str, humanize_timestamp,
+                                 ip_to_int_pairs)
+
+
+def test_humanize_timestamp():
+    '''Test the epoch timestamps in ms are converted to the timezone'''
+    field = pd.Series([1650000000123, 1650000000123.9, np.nan],
+                      index=[3, 5, 7])
+    tstamps = humanize_timestamp(field, 'Europe/Rome')
+
+    assert str(tstamps.dtype) == 'datetime64[ns, Europe/Rome]'
+    assert tstamps.index.tolist() == [3, 5, 7]
+    # Like int(), the fractions of millisecond are truncated
+    assert tstamps[3] == tstamps[5] == \
+        pd.Timestamp('2022-04-15 07:20:00.123', tz='Europe/Rome')
+    assert pd.isna(tstamps[7])
+
+    # Columns already converted are left as they are
+    assert humanize_timestamp(tstamps, 'UTC') is tstamps
+    assert humanize_timestamp(pd.Series([], dtype='int64')).empty
+
+
+@pytest.mark.parametrize('filters', [
+    {'hostname': ['leaf01', 'spine01'], 'mtu': ['>1500', '<9216']},
+    {'hostname': ['~leaf.*', '!leaf02'], 'state': '!down'},
+    {'hostname': ['!~spine.*', '!~exit.*'], 'mtu': ['!1500']},
+    {'ifname': ['~eth[0-9]', 'lo'], 'mtu': [1500, '>=9000']},
+    {'vlan': [], 'hostname': 'leaf01'},
+])
+def test_build_query_mask(filters):
+    '''Test the mask selects the same rows of the query string'''
+    schema = SchemaForTable('interfaces', schema_dir='suzieq/config/schema')
+    df = pd.DataFrame({
+        'hostname': ['leaf01', 'leaf02', 'spine01', 'exit01', 'leaf01'],
+        'ifname': ['eth0', 'eth1', 'lo', 'swp1', 'eth10'],
+        'state': ['up', 'down', 'up', 'up', 'notConnected'],
+        'mtu': [1500, 9216, 9000, 1500, 9100],
+    }, index=[10, 11, 12, 13, 14])
+
+    mask = build_query_mask(df, [], schema, ignore_regex=False, **filters)
+    query_str = build_query_str([], schema, ignore_regex=False, **filters)
+    assert df[mask].equals(df.query(query_str))
+
+    # Long lists of values are not a problem, unlike with the query string
+    hosts = [f'host{i}' for i in range(500)] + ['exit01']
+    assert build_query_mask(df, [], schema, hostname=hosts).tolist() == \
+        [False, False, False, True, False]
+
+
+ADDRS = ['10.1.2.3', '10.1.2.3/24', '10.2.0.1/16', '192.168.1.1/32', '',
+         '2001:db8:1::5/64', '2001:db8:2::1', 'fe80::1%eth0', '10.1.256.1',
+         '10.1.2', None, '::ffff:10.1.2.3', '0.0.0.0/0']
+
+
+def test_ip_to_int_pairs():
+    '''Test the addresses are converted into pairs of integers'''
+    hi, lo, is_v6, valid = ip_to_int_pairs(ADDRS)
+    for i, addr in enumerate(ADDRS):
+        try:
+            exp = ip_address(addr.split('/')[0].split('%')[0])
+        except (AttributeError, ValueError):
+            assert not valid[i], addr
+            continue
+        assert valid[i], addr
+        assert is_v6[i] == (exp.version == 6), addr
+        assert (int(hi[i]) << 64) + int(lo[i]) == int(exp), addr
+
+
+@pytest.mark.parametrize('net', ['10.1.0.0/16', '10.1.2.0/24', '0.0.0.0/0',
+                                 '2001:db8:1::/48', 'fe80::/10', '::/0'])
+def test_addrs_in_subnet(net):
+    '''Test the check of the addresses in a subnet'''
+    network = ip_network(net)
+    exp = []
+    for addr in ADDRS:
+        try:
+            exp.append(ip_address(addr.split('/')[0].split('%')[0])
+                       in network)
+        except (AttributeError, ValueError):
+            exp.append(False)
+    addrs = pd.Series(ADDRS, index=range(10, 10+len(ADDRS)))
+    res = addrs_in_subnet(addrs, net)
+    assert res.index.equals(addrs.index)
+    assert res.tolist() == exp
+
+    lists = pd.Series([np.array(ADDRS[:4]), np.array([]),
+                       np.array(ADDRS[5:8])])
+    assert addrs_in_subnet(lists, net).tolist() == \
+        [any(exp[:4]), False, any(exp[5:8])]
+
+
+@pytest.mark.parametrize('addr', ['10.1.2.3', '10.2.9.9', '2001:db8:1::1'])
+def test_addr_in_subnets(addr):
+    '''Test the check of the address in a series of subnets'''
+    exp = []
+    for net in ADDRS:
+        try:
+            exp.append(net != '0.0.0.0/0' and ip_address(addr) in
+                       ip_network(net.split('%')[0], strict=False))
+        except (AttributeError, ValueError):
+            exp.append(False)
+    assert addr_in_subnets(addr, pd.Series(ADDRS)).tolist() == exp
+    assert addr_in_subnets(
+        addr, pd.Series([np.array(ADDRS[:4]), np.array(ADDRS[4:])])) \
+        .tolist() == [any(exp[:4]), any(exp[4:])]
+    with pytest.raises(ValueError):
+        addr_in_subnets('10.1.2', pd.Series(ADDRS))
+
+
+def test_prefix_index():
+    '''Test the longest prefix match of the prefix index'''
+    prefixes = ['0.0.0.0/0', '10.0.0.0/8', '10.1.0.0/16', '10.1.2.0/24',
+                '10.1.2.3/32', '10.1.2.0/24', '10.1.2.5/24', '::/0',
+                '2001:db8::/32', '2001:db8:1::/48', '2001:db8:1::1/128',
+                '10.1.0.0/16', '10.1.2.0/33', 'default', '']
+    tables = np.array([0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 1, 1, 1, 1, 1])
+    index = PrefixIndex(prefixes, tables)
+    assert len(index) == 12
+
+    addrs = ['10.1.2.3', '10.1.9.9', '192.168.1.1', '2001:db8:1::1',
+             '2001:db8:2::1', '10.1.2', '::ffff:10.1.2.3']
+    exp = []
+    for i, addr in enumerate(addrs):
+        for table in [0, 1]:
+            matches = []
+            for j, pfx in enumerate(prefixes):
+                try:
+                    if tables[j] == table and \
+                            ip_address(addr) in ip_network(pfx, strict=False):
+                        matches.append((-int(pfx.split('/')[1]), j))
+                except ValueError:
+                    pass
+            if matches:
+                exp.append((i, min(matches)[1]))
+    addr_pos, rows = index.lookup(addrs)
+    assert list(zip(addr_pos.tolist(), rows.tolist())) == sorted(exp)
+
+    addr_pos, rows = PrefixIndex([]).lookup(addrs)
+    assert addr_pos.size == rows.size == 0
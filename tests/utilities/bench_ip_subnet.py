@@ -0,0 +1,52 @@
+'''Benchmark the IP subnet membership helpers against the per-address
+check with the ipaddress module they replaced.
+
+Usage: python tests/utilities/bench_ip_subnet.py [number of addresses]
+'''
+import sys
+import time
+from ipaddress import ip_address, ip_network
+
+import numpy as np
+import pandas as pd
+
+from suzieq.shared.utils import addr_in_subnets, addrs_in_subnet
+
+
+def _timeit(name: str, func, n: int) -> float:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f'{name:<40} {elapsed:8.3f}s  {elapsed/n*1e6:8.3f}us/addr')
+    return elapsed
+
+
+def main(n: int):
+    '''Run the benchmark with n addresses'''
+    rng = np.random.default_rng(0)
+    v4 = pd.Series([f'10.{a}.{b}.{c}/24' for a, b, c in
+                    rng.integers(0, 256, size=(n, 3))])
+    v6 = pd.Series([f'2001:db8:{a:x}::{b:x}/64' for a, b in
+                    rng.integers(0, 65536, size=(n, 2))])
+    lists = pd.Series([np.array(x) for x in np.array_split(v4.values,
+                                                          n // 4)])
+    net = ip_network('10.1.0.0/16')
+
+    # The per-address check is run on a sample, it takes too long
+    sample = v4.sample(min(n, 100000), random_state=0)
+    elapsed = _timeit('ipaddress (sample)', lambda: sample.apply(
+        lambda a: ip_address(a.split('/')[0]) in net), len(sample))
+    print(f'{"ipaddress (estimated)":<40} {elapsed*n/len(sample):8.3f}s')
+
+    _timeit('addrs_in_subnet (IPv4)',
+            lambda: addrs_in_subnet(v4, str(net)), n)
+    _timeit('addrs_in_subnet (IPv6)',
+            lambda: addrs_in_subnet(v6, '2001:db8:1::/48'), n)
+    _timeit('addrs_in_subnet (IPv4 lists)',
+            lambda: addrs_in_subnet(lists, str(net)), n)
+    _timeit('addr_in_subnets (IPv4)',
+            lambda: addr_in_subnets('10.1.2.3', v4), n)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
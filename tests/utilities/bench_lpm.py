@@ -0,0 +1,120 @@
+'''Benchmark the prefix index used by routes lpm against the per-call
+matching it replaced, on routing tables the size of the Internet ones.
+
+Usage: python tests/utilities/bench_lpm.py [IPv4 prefixes] [IPv6 prefixes]
+'''
+import sys
+import time
+from collections import defaultdict
+from ipaddress import ip_address, ip_network
+
+import numpy as np
+import pandas as pd
+
+from suzieq.shared.utils import PrefixIndex
+
+
+def _timeit(name: str, func, n: int = 1) -> float:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f'{name:<40} {elapsed:8.3f}s  {elapsed/n*1e6:10.3f}us/addr')
+    return elapsed
+
+
+def _routes(n_v4: int, n_v6: int) -> pd.DataFrame:
+    '''Return random routes, with the prefix lengths of the Internet'''
+    rng = np.random.default_rng(0)
+    plen = rng.choice([8, 16, 19, 20, 21, 22, 23, 24], size=n_v4,
+                      p=[0.001, 0.019, 0.03, 0.05, 0.05, 0.1, 0.1, 0.65])
+    nets = rng.integers(1, 2**32, size=n_v4, dtype=np.uint64) & \
+        ((2**32 - 1) << (32 - plen)).astype(np.uint64)
+    v4 = [f'{x >> 24}.{(x >> 16) & 255}.{(x >> 8) & 255}.{x & 255}/{y}'
+          for x, y in zip(nets.tolist(), plen.tolist())]
+    v4[0] = '0.0.0.0/0'
+
+    plen = rng.choice([29, 32, 36, 40, 44, 48], size=n_v6,
+                      p=[0.02, 0.18, 0.1, 0.1, 0.1, 0.5])
+    nets = rng.integers(0x20000000, 0x2fffffff, size=n_v6,
+                        dtype=np.uint64) << np.uint64(16) | \
+        rng.integers(0, 2**16, size=n_v6, dtype=np.uint64)
+    nets &= ((2**48 - 1) << (48 - plen)).astype(np.uint64)
+    v6 = [f'{x >> 32:x}:{(x >> 16) & 0xffff:x}:{x & 0xffff:x}::/{y}'
+          for x, y in zip(nets.tolist(), plen.tolist())]
+
+    df = pd.DataFrame({'prefix': v4 + v6})
+    df['prefixlen'] = df.prefix.str.split('/').str[1].astype(int)
+    df['namespace'] = 'internet'
+    df['hostname'] = 'border01'
+    df['vrf'] = 'default'
+    return df
+
+
+def _old_lpm_v4(df: pd.DataFrame, addr: str) -> pd.DataFrame:
+    '''The IPv4 lpm before the prefix index'''
+    ipaddr = ip_address(addr)
+    df = df[~df.prefix.str.contains(':')]
+    intaddr = df.prefix.str.split('/').str[0] \
+        .map(lambda y: int(''.join(['%02x' % int(x)
+                                    for x in y.split('.')]), 16))
+    netmask = df.prefixlen \
+        .map(lambda x: (0xffffffff << (32 - x)) & 0xffffffff)
+    match = (ipaddr._ip & netmask) == (intaddr & netmask)
+    return df.loc[match.loc[match].index] \
+        .sort_values('prefixlen', ascending=False) \
+        .drop_duplicates(['namespace', 'hostname', 'vrf'])
+
+
+def _old_lpm_v6(df: pd.DataFrame, addr: str) -> dict:
+    '''The IPv6 lpm before the prefix index'''
+    ipaddr = ip_address(addr)
+    selected_entries = {}
+    max_plens = defaultdict(int)
+    for row in df[df.prefix.str.contains(':')].itertuples():
+        rtentry = ip_network(row.prefix)
+        if ipaddr in rtentry:
+            key = f'{row.namespace}-{row.hostname}-{row.vrf}'
+            if rtentry.prefixlen > max_plens[key]:
+                max_plens[key] = rtentry.prefixlen
+                selected_entries[key] = row
+    return selected_entries
+
+
+def main(n_v4: int, n_v6: int):
+    '''Run the benchmark with the given number of prefixes'''
+    df = _routes(n_v4, n_v6)
+    print(f'{n_v4} IPv4 and {n_v6} IPv6 prefixes')
+    v4_addr = df.prefix.iloc[n_v4 // 2].split('/')[0]
+    v6_addr = df.prefix.iloc[n_v4 + n_v6 // 2].split('/')[0]
+
+    _timeit('old lpm, IPv4', lambda: _old_lpm_v4(df, v4_addr))
+    _timeit('old lpm, IPv6', lambda: _old_lpm_v6(df, v6_addr))
+
+    index = None
+
+    def _build():
+        nonlocal index
+        tables = df.groupby(['namespace', 'hostname', 'vrf'], sort=False) \
+            .ngroup().values
+        index = PrefixIndex(df.prefix.values, tables)
+    _timeit('index build', _build)
+
+    _timeit('index lpm, IPv4', lambda: index.lookup([v4_addr]))
+    _timeit('index lpm, IPv6', lambda: index.lookup([v6_addr]))
+
+    rng = np.random.default_rng(1)
+    n = 100000
+    addrs = [f'{a}.{b}.{c}.{d}' for a, b, c, d in
+             rng.integers(0, 256, size=(n, 4)).tolist()]
+    _timeit(f'index lpm, {n} IPv4 addresses',
+            lambda: index.lookup(addrs), n)
+    addrs = df.prefix.iloc[n_v4:].sample(
+        min(n, n_v6), replace=False, random_state=0) \
+        .str.replace('::/', '::1/').str.split('/').str[0].tolist()
+    _timeit(f'index lpm, {len(addrs)} IPv6 addresses',
+            lambda: index.lookup(addrs), len(addrs))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 200000)
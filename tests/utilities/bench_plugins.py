@@ -0,0 +1,56 @@
+'''Benchmark the startup of a process looking up its plugins, without the
+plugin cache, i.e. importing every module of the searched packages, and
+with the cache built by a previous process.
+
+Usage: python tests/utilities/bench_plugins.py [runs]
+'''
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Tuple
+
+# What the CLI does on startup: list the commands and the tables, and get
+# the command and the sqobject of a table. The script prints the time spent
+# looking up the plugins and the number of suzieq modules imported.
+SCRIPT = '''
+import sys
+import time
+from suzieq.cli.sqcmds.command import SqTableCommand
+from suzieq.sqobjects.basicobj import SqObject
+start = time.perf_counter()
+SqTableCommand.get_plugins()['VlanCmd']
+SqObject.get_plugins()['vlan']
+print(time.perf_counter() - start,
+      len([x for x in sys.modules if x.startswith('suzieq.')]))
+'''
+
+
+def _run(cache_file: str) -> Tuple[float, int]:
+    '''Return the time spent looking up the plugins by a new process
+    running the script, and the number of modules it imported'''
+    env = {**os.environ, 'SQ_PLUGIN_CACHE': cache_file}
+    out = subprocess.run([sys.executable, '-c', SCRIPT], check=True,
+                         env=env, capture_output=True, text=True).stdout
+    elapsed, modules = out.split()
+    return float(elapsed), int(modules)
+
+
+def _timeit(name: str, cache_file: str, runs: int) -> float:
+    elapsed, modules = min(_run(cache_file) for _ in range(runs))
+    print(f'{name:<30} {elapsed:8.3f}s  {modules:4} modules imported')
+    return elapsed
+
+
+def main(runs: int):
+    '''Run the benchmark, keeping the best time of the given runs'''
+    no_cache = _timeit('no plugin cache', '', runs)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_file = os.path.join(tmp_dir, 'plugins.json')
+        _timeit('cold plugin cache', cache_file, 1)
+        warm = _timeit('warm plugin cache', cache_file, runs)
+    print(f'{"speedup":<30} {no_cache / warm:8.2f}x')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)